@@ -0,0 +1,335 @@
+"""Async facade over storage: blocking I/O on a bounded thread pool, with write-behind."""
+
+import asyncio
+import functools
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple
+from . import storage
+from .blobstore import get_blob_stats
+from .search import get_search_index
+from .history import get_history_index
+from .config import (
+    STORAGE_BACKEND,
+    STORAGE_IO_WORKERS,
+    STORAGE_WRITE_BEHIND,
+    BLOB_STORE_ENABLED,
+    SEARCH_ENABLED,
+)
+
+_executor = ThreadPoolExecutor(max_workers=STORAGE_IO_WORKERS, thread_name_prefix="storage")
+
+# Writes queued per conversation as (method, args, expected_version, future), and
+# the single task draining each queue; all backend writes for a conversation go
+# through it, so they never run concurrently
+_pending: Dict[str, List[Tuple[str, tuple, Optional[int], Optional[asyncio.Future]]]] = {}
+_flushers: Dict[str, asyncio.Task] = {}
+
+_stats = {"reads": 0, "writes": 0, "batches": 0, "failed_batches": 0, "conflicts": 0}
+
+
+class ConversationLocks:
+    """Per-conversation asyncio locks, created on demand and dropped once unused."""
+
+    def __init__(self):
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, conversation_id: str):
+        lock = self.locks.setdefault(conversation_id, asyncio.Lock())
+        self.users[conversation_id] = self.users.get(conversation_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self.users[conversation_id] -= 1
+            if not self.users[conversation_id]:
+                del self.users[conversation_id]
+                del self.locks[conversation_id]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "locked": sum(1 for lock in self.locks.values() if lock.locked()),
+            "waiting": sum(self.users.values()) - sum(1 for lock in self.locks.values() if lock.locked()),
+        }
+
+
+_locks = ConversationLocks()
+
+
+def conversation_lock(conversation_id: str):
+    """
+    Async context manager serializing read-modify-write sequences on one conversation.
+
+    Usage:
+        async with conversation_lock(conversation_id):
+            conversation = await get_conversation(conversation_id)
+            ...
+            await add_user_message(conversation_id, content, expected_version=conversation["version"])
+    """
+    return _locks.hold(conversation_id)
+
+
+async def _run(fn, *args):
+    """Run a blocking storage call on the storage thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args))
+
+
+async def _write(
+    conversation_id: str,
+    method: str,
+    *args,
+    expected_version: Optional[int] = None,
+    wait: bool = False
+):
+    _stats["writes"] += 1
+
+    # Compare-and-swap writes, writes that must not fail silently, and all
+    # writes without write-behind, wait for their outcome
+    future = None
+    if wait or expected_version is not None or not STORAGE_WRITE_BEHIND:
+        future = asyncio.get_running_loop().create_future()
+
+    _pending.setdefault(conversation_id, []).append((method, args, expected_version, future))
+    if conversation_id not in _flushers:
+        _flushers[conversation_id] = asyncio.create_task(_flush_conversation(conversation_id))
+
+    if future is not None:
+        await future
+
+
+def _split_batches(queued: list) -> List[list]:
+    """Group queued writes into batches; each compare-and-swap write is a batch of its own."""
+    batches: List[list] = []
+    for item in queued:
+        if item[2] is not None or not batches or batches[-1][-1][2] is not None:
+            batches.append([item])
+        else:
+            batches[-1].append(item)
+    return batches
+
+
+async def _flush_conversation(conversation_id: str):
+    """Drain a conversation's queue, applying everything queued so far in as few batches as possible."""
+    try:
+        while _pending.get(conversation_id):
+            for batch in _split_batches(_pending.pop(conversation_id)):
+                _stats["batches"] += 1
+                writes = [(method, args) for method, args, _, _ in batch]
+                futures = [future for _, _, _, future in batch if future is not None]
+                try:
+                    await _run(
+                        storage.get_backend().apply_writes, conversation_id, writes, None, batch[0][2]
+                    )
+                except Exception as e:
+                    if isinstance(e, storage.ConflictError):
+                        _stats["conflicts"] += 1
+                    else:
+                        _stats["failed_batches"] += 1
+                    if len(futures) < len(batch):
+                        print(f"WARNING: Dropped {len(batch)} storage writes for conversation {conversation_id}: {e}")
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(None)
+    finally:
+        del _flushers[conversation_id]
+
+
+async def _barrier(conversation_id: Optional[str] = None):
+    """Wait until queued writes (for one conversation, or all) have been applied."""
+    while True:
+        if conversation_id is None:
+            tasks = list(_flushers.values())
+        else:
+            tasks = [_flushers[conversation_id]] if conversation_id in _flushers else []
+        if not tasks:
+            return
+        await asyncio.gather(*(asyncio.shield(task) for task in tasks))
+
+
+async def create_conversation(conversation_id: str) -> Dict[str, Any]:
+    """Create a new conversation (see storage.create_conversation)."""
+    return await _run(storage.create_conversation, conversation_id)
+
+
+async def get_conversation(conversation_id: str, resolve: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Load a conversation, including any writes still queued for it.
+
+    With resolve=False, large stage texts stay blob references (see storage.get_conversation).
+    """
+    await _barrier(conversation_id)
+    _stats["reads"] += 1
+    return await _run(storage.get_conversation, conversation_id, resolve)
+
+
+async def get_message_page(
+    conversation_id: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None
+) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Load one page of messages (see storage.get_message_page); blob references stay unresolved."""
+    await _barrier(conversation_id)
+    _stats["reads"] += 1
+    return await _run(storage.get_message_page, conversation_id, offset, limit, fields)
+
+
+async def resolve_blobs(value: Any) -> Any:
+    """Expand blob references in `value` on the storage thread pool."""
+    return await _run(storage.resolve_blobs, value)
+
+
+async def search(query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Full-text search (see search.SearchIndex.search), with conversation titles attached.
+
+    Raises:
+        RuntimeError: if search is disabled or unavailable
+    """
+    await flush()
+    _stats["reads"] += 1
+    return await _run(_search, query, offset, limit)
+
+
+def _search(query: str, offset: int, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    backend = storage.get_backend()
+    index = get_search_index() if SEARCH_ENABLED else None
+    if index is None:
+        raise RuntimeError("Search is not available")
+    hits, has_more = index.search(query, offset, limit)
+    for hit in hits:
+        metadata = backend.get_metadata(hit["conversation_id"])
+        hit["title"] = metadata["title"] if metadata else None
+    return hits, has_more
+
+
+async def set_conversation_owner(conversation_id: str, user_id: str):
+    """Attribute a conversation to a user, so its turns appear in their history."""
+    await _run(lambda: get_history_index().set_owner(conversation_id, user_id))
+
+
+async def record_turn(
+    conversation_id: Optional[str],
+    summary: Dict[str, Any],
+    user_id: Optional[str] = None
+) -> Optional[int]:
+    """
+    Add an answered question to a user's history.
+
+    Args:
+        conversation_id: Conversation the turn belongs to
+        summary: question, winner_model, chosen_agent, enhanced_answer, scores and critique
+        user_id: Owner; when omitted, the conversation's recorded owner
+
+    Returns:
+        The turn_id, or None if the conversation has no owner
+    """
+    def record() -> Optional[int]:
+        index = get_history_index()
+        owner = user_id or (index.get_owner(conversation_id) if conversation_id else None)
+        if owner is None:
+            return None
+        return index.record(owner, conversation_id, datetime.utcnow().isoformat(), **summary)
+
+    return await _run(record)
+
+
+async def get_history(user_id: str, limit: int, before: Optional[int] = None) -> List[Dict[str, Any]]:
+    """A page of a user's history, newest first (see history.HistoryIndex.list)."""
+    _stats["reads"] += 1
+    return await _run(lambda: get_history_index().list(user_id, limit, before))
+
+
+async def set_turn_label(turn_id: int, label: Optional[str]) -> bool:
+    """Store human feedback on a history turn; False if the turn does not exist."""
+    return await _run(lambda: get_history_index().set_label(turn_id, label))
+
+
+async def list_conversations(limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+    """List conversation metadata once all queued writes have been applied."""
+    await _barrier()
+    _stats["reads"] += 1
+    return await _run(storage.list_conversations, limit, before)
+
+
+async def add_user_message(conversation_id: str, content: str, expected_version: Optional[int] = None):
+    """
+    Queue a user message for a conversation.
+
+    With STORAGE_WRITE_BEHIND and no expected_version this returns once the
+    write is queued; reads of the same conversation wait for it, and failures
+    are logged. Otherwise it returns once the write is applied.
+
+    Args:
+        conversation_id: Conversation identifier
+        content: User message content
+        expected_version: Only write if the conversation is still at this version
+
+    Raises:
+        ConflictError: if expected_version no longer matches
+        ValueError: if the conversation does not exist (only when waiting)
+    """
+    await _write(conversation_id, "add_user_message", content, expected_version=expected_version)
+
+
+async def add_assistant_message(
+    conversation_id: str,
+    stage1: List[Dict[str, Any]],
+    stage2: List[Dict[str, Any]],
+    stage3: Dict[str, Any],
+    expected_version: Optional[int] = None
+):
+    """
+    Save an assistant message with all 3 stages.
+
+    Unlike the other writes this always returns once the message is applied
+    (still batched with queued writes): it holds the answer of a whole council
+    run, so a failure is raised to the caller instead of only being logged.
+
+    Raises:
+        ConflictError: if expected_version no longer matches
+        ValueError: if the conversation does not exist
+    """
+    await _write(
+        conversation_id, "add_assistant_message", stage1, stage2, stage3,
+        expected_version=expected_version, wait=True
+    )
+
+
+async def update_conversation_title(conversation_id: str, title: str, expected_version: Optional[int] = None):
+    """Queue a title update (see add_user_message)."""
+    await _write(conversation_id, "update_conversation_title", title, expected_version=expected_version)
+
+
+async def flush():
+    """Wait for every queued write to be applied."""
+    await _barrier()
+
+
+async def close():
+    """Flush queued writes and stop the storage thread pool."""
+    await flush()
+    _executor.shutdown(wait=True)
+
+
+def get_storage_stats() -> Dict[str, Any]:
+    """Queue depth and I/O counters for metrics."""
+    return {
+        "backend": STORAGE_BACKEND,
+        "write_behind": STORAGE_WRITE_BEHIND,
+        "io_workers": STORAGE_IO_WORKERS,
+        "pending_writes": sum(len(writes) for writes in _pending.values()),
+        "flushing_conversations": len(_flushers),
+        "locks": _locks.snapshot(),
+        **_stats,
+        "cache": storage.get_storage_cache_stats(),
+        "blobs": get_blob_stats() if BLOB_STORE_ENABLED else None,
+    }
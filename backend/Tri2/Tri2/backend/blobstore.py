@@ -0,0 +1,127 @@
+"""Content-addressed, compressed storage for large stage texts."""
+
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any
+from .config import BLOB_DIR, BLOB_COMPRESSION
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Key of the reference that replaces a stored text inside a stage payload
+BLOB_REF = "$blob"
+
+
+class BlobStore:
+    """
+    Texts stored once per distinct content, keyed by their SHA-256.
+
+    Blobs live in <dir>/<hash[:2]>/<hash>.<zst|gz>; the extension records the
+    codec, so switching BLOB_COMPRESSION keeps older blobs readable. Writing a
+    blob that already exists is a no-op, which deduplicates identical answers
+    across messages and conversations.
+    """
+
+    def __init__(self, directory: str, compression: str = "zstd"):
+        self.directory = Path(directory)
+        if compression == "zstd" and zstandard is None:
+            print("WARNING: zstd blob compression requested but 'zstandard' is not installed, using gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.lock = threading.Lock()
+        self.stats = {"puts": 0, "deduplicated": 0, "gets": 0, "bytes_in": 0, "bytes_stored": 0}
+
+    def _path(self, digest: str, extension: str) -> Path:
+        return self.directory / digest[:2] / f"{digest}.{extension}"
+
+    def _find(self, digest: str) -> Path:
+        for extension in ("zst", "gz"):
+            path = self._path(digest, extension)
+            if path.exists():
+                return path
+        raise KeyError(digest)
+
+    def put(self, text: str) -> str:
+        """
+        Store a text if it is not stored yet.
+
+        Returns:
+            The text's SHA-256 hex digest, used to read it back
+        """
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            self.stats["puts"] += 1
+            self.stats["bytes_in"] += len(data)
+        try:
+            self._find(digest)
+            with self.lock:
+                self.stats["deduplicated"] += 1
+            return digest
+        except KeyError:
+            pass
+
+        if self.compression == "zstd":
+            path, payload = self._path(digest, "zst"), zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            path, payload = self._path(digest, "gz"), gzip.compress(data, compresslevel=6)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.stats["bytes_stored"] += len(payload)
+        return digest
+
+    def get(self, digest: str) -> str:
+        """
+        Read a stored text.
+
+        Raises:
+            KeyError: if no blob with this digest exists
+        """
+        path = self._find(digest)
+        with open(path, 'rb') as f:
+            payload = f.read()
+        with self.lock:
+            self.stats["gets"] += 1
+        if path.suffix == ".zst":
+            if zstandard is None:
+                raise RuntimeError(f"Blob {digest} is zstd-compressed but 'zstandard' is not installed")
+            return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+        return gzip.decompress(payload).decode("utf-8")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "compression": self.compression,
+            **self.stats,
+            "compression_ratio": (
+                round(self.stats["bytes_stored"] / self.stats["bytes_in"], 4) if self.stats["bytes_in"] else 0.0
+            ),
+        }
+
+
+blob_store = BlobStore(BLOB_DIR, BLOB_COMPRESSION)
+
+
+def resolve_blobs(value: Any) -> Any:
+    """Return `value` with every blob reference replaced by the text it points to."""
+    if isinstance(value, dict):
+        if len(value) == 1 and BLOB_REF in value:
+            return blob_store.get(value[BLOB_REF])
+        return {key: resolve_blobs(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_blobs(item) for item in value]
+    return value
+
+
+def get_blob_stats() -> Dict[str, Any]:
+    """Blob store counters for metrics."""
+    return blob_store.snapshot()
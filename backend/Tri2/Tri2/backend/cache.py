@@ -0,0 +1,154 @@
+"""Exact-match cache for LLM responses (in-memory LRU with TTL plus optional disk tier)."""
+
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from .config import (
+    CACHE_ENABLED,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL_SECONDS,
+    CACHE_DISK_DIR,
+    CACHE_EXCLUDE_MODELS,
+)
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    """
+    Canonical hash of a request.
+
+    Args:
+        model: Model identifier
+        messages: List of message dicts with 'role' and 'content'
+        params: Generation parameters that affect the output (e.g. max_tokens)
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL memory cache backed by an optional directory of JSON files."""
+
+    def __init__(self, max_entries: int, ttl: float, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def _disk_path(self, key: str) -> Path:
+        # Shard by prefix so no single directory grows unbounded
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]):
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record["expires_at"] <= time.time():
+            self.stats["expirations"] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record["expires_at"], record["value"]
+
+    def _write_disk(self, key: str, expires_at: float, value: Dict[str, Any]):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"expires_at": expires_at, "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"WARNING: Could not write response cache entry: {e}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached value, or None on a miss."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del self.entries[key]
+            self.stats["expirations"] += 1
+            entry = None
+
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.stats["memory_hits"] += 1
+        else:
+            entry = self._read_disk(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._remember(key, *entry)
+            self.stats["disk_hits"] += 1
+
+        self.stats["hits"] += 1
+        return copy.deepcopy(entry[1])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store a value in memory and, if configured, on disk."""
+        expires_at = time.time() + self.ttl
+        value = copy.deepcopy(value)
+        self._remember(key, expires_at, value)
+        self._write_disk(key, expires_at, value)
+        self.stats["stores"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "enabled": CACHE_ENABLED,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, CACHE_DISK_DIR)
+
+
+def is_cacheable(model: str) -> bool:
+    """Whether responses from `model` may be cached."""
+    return CACHE_ENABLED and model not in CACHE_EXCLUDE_MODELS
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and sizes for metrics."""
+    return response_cache.snapshot()
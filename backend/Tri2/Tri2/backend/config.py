@@ -71,5 +71,133 @@ else:
 # OpenRouter API endpoint
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# Default completion budget for OpenRouter calls (Gemini is uncapped unless set per call)
+MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1000"))
+
+# Shared HTTP client pool for provider calls (one client per process)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30.0"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Process-wide provider limits, applied per (provider, model).
+# rpm/tpm are requests/tokens per minute (0 disables that bucket);
+# concurrency is the starting AIMD limit.
+PROVIDER_LIMITS = {
+    "openrouter": {
+        "rpm": int(os.getenv("OPENROUTER_RPM", "60")),
+        "tpm": int(os.getenv("OPENROUTER_TPM", "0")),
+        "concurrency": int(os.getenv("OPENROUTER_CONCURRENCY", "8")),
+    },
+    "gemini": {
+        "rpm": int(os.getenv("GEMINI_RPM", "15")),
+        "tpm": int(os.getenv("GEMINI_TPM", "1000000")),
+        "concurrency": int(os.getenv("GEMINI_CONCURRENCY", "4")),
+    },
+}
+LIMITER_MIN_CONCURRENCY = int(os.getenv("LIMITER_MIN_CONCURRENCY", "1"))
+LIMITER_MAX_CONCURRENCY = int(os.getenv("LIMITER_MAX_CONCURRENCY", "32"))
+LIMITER_BACKOFF_RATIO = float(os.getenv("LIMITER_BACKOFF_RATIO", "0.5"))
+LIMITER_LATENCY_TOLERANCE = float(os.getenv("LIMITER_LATENCY_TOLERANCE", "2.0"))
+
+# Retry policy shared by all provider calls (decorrelated jitter, honors Retry-After)
+RETRY_MAX_RETRIES = int(os.getenv("RETRY_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "20.0"))
+# Retries may not exceed this fraction of requests per provider within the window
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_RETRIES = int(os.getenv("RETRY_BUDGET_MIN_RETRIES", "3"))
+RETRY_BUDGET_WINDOW = float(os.getenv("RETRY_BUDGET_WINDOW", "60.0"))
+
+# Per-model circuit breaker
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30.0"))
+
+# Stage 1 quorum: proceed once this many council models answered (0 = wait for all).
+# After STAGE1_QUORUM_TIMEOUT seconds (0 = no deadline) whatever has arrived is used.
+STAGE1_QUORUM = int(os.getenv("STAGE1_QUORUM", "0"))
+STAGE1_QUORUM_TIMEOUT = float(os.getenv("STAGE1_QUORUM_TIMEOUT", "0"))
+
+# Hedged requests for the chairman (stage 3) and title calls: if the primary has not
+# answered within its tracked latency percentile, race HEDGE_BACKUP_MODEL against it
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_BACKUP_MODEL = os.getenv("HEDGE_BACKUP_MODEL", "")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+
+# Exact-match response cache inside query_model (memory LRU + TTL, optional disk tier)
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+CACHE_DISK_DIR = os.getenv("CACHE_DISK_DIR", "")  # e.g. "data/cache"; empty disables the disk tier
+CACHE_EXCLUDE_MODELS = {m.strip() for m in os.getenv("CACHE_EXCLUDE_MODELS", "").split(",") if m.strip()}
+
+# Coalesce identical in-flight requests (query_model calls and whole council runs)
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Semantic answer cache in front of run_full_council (local hashed TF-IDF vectors)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "5000"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "data/semantic_cache")  # empty disables snapshots
+SEMANTIC_CACHE_SNAPSHOT_EVERY = int(os.getenv("SEMANTIC_CACHE_SNAPSHOT_EVERY", "50"))
+
 # Data directory for conversation storage
-DATA_DIR = "data/conversations"
\ No newline at end of file
+DATA_DIR = "data/conversations"
+
+# Conversation storage backend: "sqlite" (default), "json" (one file per conversation in DATA_DIR)
+# or "jsonl" (one append-only log per conversation in JSONL_DATA_DIR)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").lower()
+JSONL_DATA_DIR = os.getenv("JSONL_DATA_DIR", "data/conversation_logs")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/conversations.db")
+
+# Storage I/O runs on a bounded thread pool; with write-behind, writes are queued
+# per conversation and applied in batches while the request continues (except a
+# run's final answer, which is always awaited so a failure is reported)
+STORAGE_IO_WORKERS = int(os.getenv("STORAGE_IO_WORKERS", "4"))
+STORAGE_WRITE_BEHIND = os.getenv("STORAGE_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+
+# Write-through LRU of parsed conversations in front of the storage backend (0 disables)
+STORAGE_CACHE_MAX_BYTES = int(os.getenv("STORAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+STORAGE_CACHE_MAX_ENTRIES = int(os.getenv("STORAGE_CACHE_MAX_ENTRIES", "256"))
+
+# Large stage texts are stored once per distinct content, compressed ("zstd" or "gzip"),
+# and referenced from conversations
+BLOB_STORE_ENABLED = os.getenv("BLOB_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+BLOB_DIR = os.getenv("BLOB_DIR", "data/blobs")
+BLOB_MIN_BYTES = int(os.getenv("BLOB_MIN_BYTES", "512"))
+BLOB_COMPRESSION = os.getenv("BLOB_COMPRESSION", "zstd").lower()
+
+# Full-text search over questions and final answers (SQLite FTS5)
+SEARCH_ENABLED = os.getenv("SEARCH_ENABLED", "true").lower() in ("1", "true", "yes")
+SEARCH_DB_PATH = os.getenv("SEARCH_DB_PATH", "data/search.db")
+
+# Per-user history index behind /api/history
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "data/history.db")
+HISTORY_EXCERPT_CHARS = int(os.getenv("HISTORY_EXCERPT_CHARS", "600"))
+
+# Event bus between council runs and their streams: "memory" (single process)
+# or "sqlite" (shared by all uvicorn workers)
+EVENT_BUS = os.getenv("EVENT_BUS", "memory")
+EVENT_BUS_PATH = os.getenv("EVENT_BUS_PATH", "data/events.db")
+EVENT_BUS_POLL_INTERVAL = float(os.getenv("EVENT_BUS_POLL_INTERVAL", "0.05"))
+
+# Replay buffer per run: newest events kept for Last-Event-ID resume, and how
+# long (seconds) a finished run stays replayable
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "4096"))
+EVENT_BUFFER_TTL = float(os.getenv("EVENT_BUFFER_TTL", "300"))
+
+# WebSocket council sessions (/api/ws): events buffered per connection before
+# deltas are dropped, and open connections allowed per worker
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "1000"))
+
+# Council scheduler: concurrent runs per worker process, waiting requests before
+# new ones are refused (batch requests are refused from SCHEDULER_BATCH_QUEUE_SIZE
+# on), and the longest a request may wait (seconds)
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "8"))
+SCHEDULER_QUEUE_SIZE = int(os.getenv("SCHEDULER_QUEUE_SIZE", "32"))
+SCHEDULER_BATCH_QUEUE_SIZE = int(os.getenv("SCHEDULER_BATCH_QUEUE_SIZE", "8"))
+SCHEDULER_MAX_WAIT = float(os.getenv("SCHEDULER_MAX_WAIT", "30"))
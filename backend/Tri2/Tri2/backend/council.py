@@ -1,24 +1,171 @@
 """3-stage LLM Council orchestration."""
 
-from typing import List, Dict, Any, Tuple
-from .openrouter import query_models_parallel, query_model
-from .config import COUNCIL_MODELS, CHAIRMAN_MODEL
+import asyncio
+import hashlib
+import json
+from typing import List, Dict, Any, Tuple, Optional, Callable, Awaitable
+from .openrouter import query_models_parallel, query_model, query_model_stream
+from .hedging import query_model_hedged, collect_model_stream_hedged
+from .singleflight import SingleFlight
+from .semantic_cache import semantic_cache
+from .config import (
+    COUNCIL_MODELS,
+    CHAIRMAN_MODEL,
+    STAGE1_QUORUM,
+    STAGE1_QUORUM_TIMEOUT,
+    SINGLEFLIGHT_ENABLED,
+    SEMANTIC_CACHE_ENABLED,
+)
+
+# Concurrent identical questions attach to one in-flight council run
+_inflight_councils = SingleFlight("run_full_council")
+
+
+async def collect_model_stream(
+    model: str,
+    messages: List[Dict[str, str]],
+    on_delta: Callable[[str], Awaitable[None]],
+    timeout: float = 120.0
+) -> Optional[Dict[str, Any]]:
+    """
+    Stream a model response, forwarding each text delta as it arrives.
+
+    Args:
+        model: Model identifier
+        messages: List of message dicts to send
+        on_delta: Async callback receiving each text fragment
+        timeout: Request timeout in seconds
+
+    Returns:
+        Response dict with 'content' (like query_model), or None if failed
+    """
+    stream = query_model_stream(model, messages, timeout)
+    try:
+        async for record in stream:
+            if record["type"] == "delta":
+                await on_delta(record["content"])
+            elif record["type"] == "done":
+                return {
+                    'content': record["content"],
+                    'finish_reason': record.get("finish_reason"),
+                    'usage': record.get("usage")
+                }
+            else:
+                return None
+        return None
+    finally:
+        await stream.aclose()
+
+
+async def wait_for_quorum(
+    tasks: Dict[str, "asyncio.Task"],
+    quorum: int,
+    timeout: float
+) -> Tuple[Dict[str, Optional[Dict[str, Any]]], List[str]]:
+    """
+    Wait until `quorum` tasks produced a response, then cancel the rest.
+
+    Once `timeout` seconds have passed, whatever has arrived is used as long as
+    it contains at least one response; otherwise we keep waiting for the first one.
+
+    Args:
+        tasks: Dict mapping model to a task resolving to a response dict or None
+        quorum: Number of successful responses to wait for
+        timeout: Seconds before settling for fewer responses (0 waits indefinitely)
 
+    Returns:
+        Tuple of (dict mapping model to response or None, list of dropped models)
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+    pending = set(tasks.values())
+    successes = 0
+
+    def succeeded(task):
+        return not task.cancelled() and task.exception() is None and task.result() is not None
+
+    try:
+        while pending and successes < quorum:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    if successes:
+                        break
+                    # Nothing usable yet: hold out for the first answer
+                    remaining = None
+
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            successes += sum(1 for task in done if succeeded(task))
+    finally:
+        # Cancel stragglers (also when we are cancelled ourselves)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    responses = {
+        model: task.result() if task not in pending and succeeded(task) else None
+        for model, task in tasks.items()
+    }
+    dropped = [model for model, task in tasks.items() if task in pending]
+    return responses, dropped
 
-async def stage1_collect_responses(user_query: str) -> List[Dict[str, Any]]:
+
+async def stage1_collect_responses(
+    user_query: str,
+    on_delta: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
     """
-    Stage 1: Collect individual responses from all council models.
+    Stage 1: Collect individual responses from the council models.
+
+    With STAGE1_QUORUM set, stage 1 finishes as soon as that many models have
+    answered (or STAGE1_QUORUM_TIMEOUT expires) and the remaining calls are cancelled.
 
     Args:
         user_query: The user's question
+        on_delta: Optional async callback (model, text) - when given, every model
+            is streamed concurrently and its deltas are forwarded as they arrive
+        metadata: Optional run metadata dict; receives 'stage1_dropped' (models
+            cancelled by the quorum) and 'stage1_failed' (models that errored)
 
     Returns:
         List of dicts with 'model' and 'response' keys
     """
     messages = [{"role": "user", "content": user_query}]
+    models = list(dict.fromkeys(COUNCIL_MODELS))
 
-    # Query all models in parallel
-    responses = await query_models_parallel(COUNCIL_MODELS, messages)
+    if on_delta is None:
+        # Query all models in parallel
+        tasks = {
+            model: asyncio.create_task(query_model(model, messages))
+            for model in models
+        }
+    else:
+        # Stream all models in parallel; deltas interleave through on_delta
+        def forward(model):
+            return lambda text: on_delta(model, text)
+
+        tasks = {
+            model: asyncio.create_task(collect_model_stream(model, messages, forward(model)))
+            for model in models
+        }
+
+    quorum = min(STAGE1_QUORUM, len(models)) if STAGE1_QUORUM > 0 else len(models)
+    responses, dropped = await wait_for_quorum(tasks, quorum, STAGE1_QUORUM_TIMEOUT)
+
+    if dropped:
+        print(f"DEBUG: Stage 1 quorum reached, dropped seats: {dropped}")
+
+    if metadata is not None:
+        metadata["stage1_dropped"] = dropped
+        metadata["stage1_failed"] = [
+            model for model, response in responses.items()
+            if response is None and model not in dropped
+        ]
 
     # Format results
     stage1_results = []
@@ -115,7 +262,8 @@ Now provide your evaluation and ranking:"""
 async def stage3_synthesize_final(
     user_query: str,
     stage1_results: List[Dict[str, Any]],
-    stage2_results: List[Dict[str, Any]]
+    stage2_results: List[Dict[str, Any]],
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None
 ) -> Dict[str, Any]:
     """
     Stage 3: Chairman synthesizes final response.
@@ -124,6 +272,8 @@ async def stage3_synthesize_final(
         user_query: The original user query
         stage1_results: Individual model responses from Stage 1
         stage2_results: Rankings from Stage 2
+        on_delta: Optional async callback - when given, the chairman response
+            is streamed and each text delta is forwarded as it arrives
 
     Returns:
         Dict with 'model' and 'response' keys
@@ -173,8 +323,11 @@ Provide a clear, well-reasoned final answer that represents the council's collec
 
     messages = [{"role": "user", "content": chairman_prompt}]
 
-    # Query the chairman model
-    response = await query_model(CHAIRMAN_MODEL, messages)
+    # Query the chairman model (hedged to a backup model if it is unusually slow)
+    if on_delta is None:
+        response = await query_model_hedged(CHAIRMAN_MODEL, messages, kind="synthesis")
+    else:
+        response = await collect_model_stream_hedged(CHAIRMAN_MODEL, messages, on_delta)
 
     if response is None:
         # Fallback if chairman fails
@@ -184,7 +337,7 @@ Provide a clear, well-reasoned final answer that represents the council's collec
         }
 
     return {
-        "model": CHAIRMAN_MODEL,
+        "model": response.get('model', CHAIRMAN_MODEL),
         "response": response.get('content', '')
     }
 
@@ -291,7 +444,7 @@ Title:"""
 
     # Use the chairman model for title generation (fast and free)
     from .config import CHAIRMAN_MODEL
-    response = await query_model(CHAIRMAN_MODEL, messages, timeout=30.0)
+    response = await query_model_hedged(CHAIRMAN_MODEL, messages, timeout=30.0, kind="title")
 
     if response is None:
         # Fallback to a generic title
@@ -309,25 +462,78 @@ Title:"""
     return title
 
 
+def council_run_key(user_query: str) -> str:
+    """
+    Identity of a council run: the normalized question plus the council configuration.
+
+    Args:
+        user_query: The user's question
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    normalized = " ".join(user_query.split()).casefold()
+    canonical = json.dumps({
+        "question": normalized,
+        "council_models": COUNCIL_MODELS,
+        "chairman_model": CHAIRMAN_MODEL,
+        "stage1_quorum": [STAGE1_QUORUM, STAGE1_QUORUM_TIMEOUT],
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_council_singleflight_stats() -> Dict[str, Any]:
+    """Coalescing counters for whole council runs."""
+    return _inflight_councils.snapshot()
+
+
 async def run_full_council(user_query: str) -> Tuple[List, List, Dict, Dict]:
     """
     Run the complete 3-stage council process.
 
+    Questions semantically close to a previously answered one are served from
+    the semantic cache (metadata then carries 'semantic_cache'). Concurrent calls
+    for the same (normalized) question share a single run; each caller receives
+    its own copy of the result.
+
     Args:
         user_query: The user's question
 
     Returns:
         Tuple of (stage1_results, stage2_results, stage3_result, metadata)
     """
+    if SEMANTIC_CACHE_ENABLED:
+        match = semantic_cache.lookup(user_query)
+        if match is not None:
+            entry, similarity = match
+            stage1_results, stage2_results, stage3_result, metadata = entry["result"]
+            metadata["semantic_cache"] = {
+                "hit": True,
+                "similarity": round(similarity, 4),
+                "matched_question": entry["question"],
+            }
+            return stage1_results, stage2_results, stage3_result, metadata
+
+    if not SINGLEFLIGHT_ENABLED:
+        return await _run_full_council(user_query)
+    return await _inflight_councils.do(
+        council_run_key(user_query),
+        lambda: _run_full_council(user_query)
+    )
+
+
+async def _run_full_council(user_query: str) -> Tuple[List, List, Dict, Dict]:
+    """Run the 3 stages for one question (see run_full_council)."""
     # Stage 1: Collect individual responses
-    stage1_results = await stage1_collect_responses(user_query)
+    stage1_metadata = {}
+    stage1_results = await stage1_collect_responses(user_query, metadata=stage1_metadata)
 
     # If no models responded successfully, return error
     if not stage1_results:
         return [], [], {
             "model": "error",
             "response": "All models failed to respond. This may be due to API key issues, model availability, or network connectivity problems. Please check your OpenRouter API key and try again."
-        }, {}
+        }, stage1_metadata
 
     # Stage 2: Collect rankings
     stage2_results, label_to_model = await stage2_collect_rankings(user_query, stage1_results)
@@ -345,7 +551,12 @@ async def run_full_council(user_query: str) -> Tuple[List, List, Dict, Dict]:
     # Prepare metadata
     metadata = {
         "label_to_model": label_to_model,
-        "aggregate_rankings": aggregate_rankings
+        "aggregate_rankings": aggregate_rankings,
+        **stage1_metadata
     }
 
+    # Remember complete answers for near-duplicate questions
+    if SEMANTIC_CACHE_ENABLED and not stage3_result["response"].startswith("Error:"):
+        semantic_cache.store(user_query, [stage1_results, stage2_results, stage3_result, metadata])
+
     return stage1_results, stage2_results, stage3_result, metadata
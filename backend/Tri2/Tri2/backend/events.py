@@ -0,0 +1,357 @@
+"""Job registry and event bus connecting council runs to their SSE streams."""
+
+import asyncio
+import itertools
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+from .config import EVENT_BUS, EVENT_BUS_PATH, EVENT_BUS_POLL_INTERVAL, EVENT_BUFFER_SIZE, EVENT_BUFFER_TTL
+
+# Event types that end a run's stream
+TERMINAL_EVENTS = ("complete", "error")
+
+
+class EventBus:
+    """
+    Interface implemented by every event bus.
+
+    A job (keyed by conversation id) can have several runs (one per council
+    run); start() returns a new run id, which the run uses to publish events
+    and to finish, so overlapping runs of a job never mix their events.
+    Subscribers follow one run: the one they name, or the job's latest.
+    Every event gets a sequence number, increasing across all runs, that
+    clients use as their SSE event id. Each run keeps its latest events (at
+    most EVENT_BUFFER_SIZE) until EVENT_BUFFER_TTL seconds after it
+    finishes, so any number of subscribers can replay and follow it, and a
+    reconnecting client resumes after its Last-Event-ID.
+    """
+
+    async def start(self, job_id: str) -> str:
+        """Register a new run of a job; returns its run id."""
+        raise NotImplementedError
+
+    async def publish(self, run_id: str, event: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def finish(self, run_id: str):
+        raise NotImplementedError
+
+    async def has_job(self, job_id: str) -> bool:
+        """Whether the job has a run that is running, or finished with its events still buffered."""
+        raise NotImplementedError
+
+    def subscribe(
+        self,
+        job_id: str,
+        after: int = 0,
+        run_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Follow a run's events.
+
+        Args:
+            job_id: Job to follow
+            after: Only events with a higher sequence number (the client's Last-Event-ID)
+            run_id: Run to follow; defaults to the job's latest run
+
+        Returns:
+            Async iterator of (sequence number, event), ending after a terminal
+            event. Events that already fell out of the buffer are skipped.
+        """
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class RunBuffer:
+    """Ring buffer of one run's numbered events, shared by all its subscribers."""
+
+    def __init__(self, size: int):
+        self.events: deque = deque(maxlen=size)
+        self.changed = asyncio.Condition()
+        self.finished = False
+        self.subscribers = 0
+
+    def since(self, after: int) -> list:
+        return [(seq, event) for seq, event in self.events if seq > after]
+
+    @property
+    def last_seq(self) -> int:
+        return self.events[-1][0] if self.events else 0
+
+
+class InProcessEventBus(EventBus):
+    """
+    Events held in a ring buffer per run, in this process.
+
+    Only works when the run and its stream are served by the same process.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE, ttl: float = EVENT_BUFFER_TTL):
+        self.buffer_size = buffer_size
+        self.ttl = ttl
+        self.runs: Dict[str, RunBuffer] = {}
+        # Latest run id of each job
+        self.latest: Dict[str, str] = {}
+        self.sequence = itertools.count(1)
+        self.stats = {"jobs_started": 0, "events_published": 0, "events_overwritten": 0, "buffers_evicted": 0}
+
+    async def start(self, job_id: str) -> str:
+        run_id = uuid.uuid4().hex
+        self.runs[run_id] = RunBuffer(self.buffer_size)
+        self.latest[job_id] = run_id
+        self.stats["jobs_started"] += 1
+        return run_id
+
+    async def publish(self, run_id: str, event: Dict[str, Any]):
+        buffer = self.runs.get(run_id)
+        if buffer is None:
+            return
+        if len(buffer.events) == buffer.events.maxlen:
+            self.stats["events_overwritten"] += 1
+        buffer.events.append((next(self.sequence), event))
+        self.stats["events_published"] += 1
+        async with buffer.changed:
+            buffer.changed.notify_all()
+
+    async def finish(self, run_id: str):
+        buffer = self.runs.get(run_id)
+        if buffer is None:
+            return
+        buffer.finished = True
+        async with buffer.changed:
+            buffer.changed.notify_all()
+        asyncio.get_running_loop().call_later(self.ttl, self._evict, run_id)
+
+    def _evict(self, run_id: str):
+        if self.runs.pop(run_id, None) is not None:
+            self.stats["buffers_evicted"] += 1
+        for job_id in [job_id for job_id, latest in self.latest.items() if latest == run_id]:
+            del self.latest[job_id]
+
+    async def has_job(self, job_id: str) -> bool:
+        return self.latest.get(job_id) in self.runs
+
+    def subscribe(
+        self,
+        job_id: str,
+        after: int = 0,
+        run_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        # Take the buffer now; it may be evicted before the stream is first read
+        return self._follow(self.runs.get(run_id or self.latest.get(job_id, "")), after)
+
+    async def _follow(self, buffer: Optional[RunBuffer], after: int) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        if buffer is None:
+            return
+        buffer.subscribers += 1
+        try:
+            while True:
+                for seq, event in buffer.since(after):
+                    after = seq
+                    yield seq, event
+                    if event["type"] in TERMINAL_EVENTS:
+                        return
+                if buffer.finished:
+                    return
+                async with buffer.changed:
+                    await buffer.changed.wait_for(lambda: buffer.finished or buffer.last_seq > after)
+        finally:
+            buffer.subscribers -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "memory",
+            "buffers": len(self.runs),
+            "running_jobs": sum(1 for buffer in self.runs.values() if not buffer.finished),
+            "subscribers": sum(buffer.subscribers for buffer in self.runs.values()),
+            "buffered_events": sum(len(buffer.events) for buffer in self.runs.values()),
+            **self.stats,
+        }
+
+
+class SQLiteEventBus(EventBus):
+    """
+    Runs and events in a SQLite database shared by every worker process.
+
+    A run can be started on one uvicorn worker and streamed from another:
+    publishers append numbered rows (trimming the run's oldest beyond the
+    buffer size), subscribers poll for rows past the last one they saw.
+    Finished runs are pruned once their TTL has passed.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        job_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        started_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS runs_by_job ON runs (job_id, started_at);
+    CREATE TABLE IF NOT EXISTS run_events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id TEXT NOT NULL,
+        payload TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS run_events_by_run ON run_events (run_id, seq);
+    """
+
+    def __init__(
+        self,
+        path: str = EVENT_BUS_PATH,
+        poll_interval: float = EVENT_BUS_POLL_INTERVAL,
+        buffer_size: int = EVENT_BUFFER_SIZE,
+        ttl: float = EVENT_BUFFER_TTL
+    ):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.ttl = ttl
+        self.local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(self.SCHEMA)
+        self.stats = {"jobs_started": 0, "events_published": 0, "polls": 0, "subscribers": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _start(self, job_id: str) -> str:
+        run_id = uuid.uuid4().hex
+        conn = self._connect()
+        with conn:
+            expired = time.time() - self.ttl
+            conn.execute(
+                "DELETE FROM run_events WHERE run_id IN "
+                "(SELECT run_id FROM runs WHERE status = 'finished' AND updated_at < ?)",
+                (expired,),
+            )
+            conn.execute("DELETE FROM runs WHERE status = 'finished' AND updated_at < ?", (expired,))
+            now = time.time()
+            conn.execute(
+                "INSERT INTO runs (run_id, job_id, status, started_at, updated_at) VALUES (?, ?, 'running', ?, ?)",
+                (run_id, job_id, now, now),
+            )
+        return run_id
+
+    def _publish(self, run_id: str, event: Dict[str, Any]):
+        conn = self._connect()
+        with conn:
+            seq = conn.execute(
+                "INSERT INTO run_events (run_id, payload) VALUES (?, ?)", (run_id, json.dumps(event))
+            ).lastrowid
+            # Keep only the newest buffer_size events of the run
+            conn.execute(
+                "DELETE FROM run_events WHERE run_id = ? AND seq <= ("
+                "SELECT seq FROM run_events WHERE run_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                (run_id, run_id, self.buffer_size),
+            )
+        return seq
+
+    def _finish(self, run_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE runs SET status = 'finished', updated_at = ? WHERE run_id = ?", (time.time(), run_id)
+            )
+
+    def _latest_run(self, job_id: str) -> Optional[str]:
+        # Finished runs past their TTL count as gone even before they are pruned
+        row = self._connect().execute(
+            "SELECT run_id FROM runs WHERE job_id = ? AND (status = 'running' OR updated_at >= ?) "
+            "ORDER BY started_at DESC LIMIT 1",
+            (job_id, time.time() - self.ttl),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _status(self, run_id: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT status FROM runs WHERE run_id = ? AND (status = 'running' OR updated_at >= ?)",
+            (run_id, time.time() - self.ttl),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _read(self, run_id: str, after: int):
+        # Status first: a run seen as finished has all its events written, while
+        # rows read first could miss a terminal event published just before finish()
+        status = self._status(run_id)
+        rows = self._connect().execute(
+            "SELECT seq, payload FROM run_events WHERE run_id = ? AND seq > ? ORDER BY seq", (run_id, after)
+        ).fetchall()
+        return rows, status
+
+    async def start(self, job_id: str) -> str:
+        run_id = await asyncio.to_thread(self._start, job_id)
+        self.stats["jobs_started"] += 1
+        return run_id
+
+    async def publish(self, run_id: str, event: Dict[str, Any]):
+        await asyncio.to_thread(self._publish, run_id, event)
+        self.stats["events_published"] += 1
+
+    async def finish(self, run_id: str):
+        await asyncio.to_thread(self._finish, run_id)
+
+    async def has_job(self, job_id: str) -> bool:
+        return await asyncio.to_thread(self._latest_run, job_id) is not None
+
+    async def subscribe(
+        self,
+        job_id: str,
+        after: int = 0,
+        run_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        if run_id is None:
+            run_id = await asyncio.to_thread(self._latest_run, job_id)
+            if run_id is None:
+                return
+        self.stats["subscribers"] += 1
+        try:
+            while True:
+                self.stats["polls"] += 1
+                rows, status = await asyncio.to_thread(self._read, run_id, after)
+                for seq, payload in rows:
+                    after = seq
+                    event = json.loads(payload)
+                    yield seq, event
+                    if event["type"] in TERMINAL_EVENTS:
+                        return
+                # A finished (or removed) run with nothing left to read ends the stream
+                if not rows and status != "running":
+                    return
+                if not rows:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            self.stats["subscribers"] -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "sqlite", **self.stats}
+
+
+def create_event_bus() -> EventBus:
+    """Create the event bus selected by EVENT_BUS."""
+    if EVENT_BUS == "memory":
+        return InProcessEventBus()
+    if EVENT_BUS == "sqlite":
+        return SQLiteEventBus()
+    raise ValueError(f"Unknown EVENT_BUS: {EVENT_BUS}")
+
+
+event_bus = create_event_bus()
+
+
+def get_event_bus_stats() -> Dict[str, Any]:
+    """Event bus counters for metrics."""
+    return event_bus.snapshot()
@@ -0,0 +1,248 @@
+"""Hedged requests: race a backup model when the primary is slower than usual."""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from .openrouter import query_model, query_model_stream
+from .config import (
+    HEDGE_ENABLED,
+    HEDGE_BACKUP_MODEL,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WINDOW,
+)
+
+
+class LatencyTracker:
+    """Rolling window of latency samples per key."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.samples: Dict[str, deque] = {}
+
+    def record(self, key: str, seconds: float):
+        if key not in self.samples:
+            self.samples[key] = deque(maxlen=self.window)
+        self.samples[key].append(seconds)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """
+        Nearest-rank percentile of the recorded samples.
+
+        Returns:
+            Latency in seconds, or None until HEDGE_MIN_SAMPLES samples exist
+        """
+        samples = self.samples.get(key)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+
+_latencies = LatencyTracker(HEDGE_WINDOW)
+
+_hedge_stats = {
+    "calls": 0,
+    "hedged": 0,
+    "primary_wins": 0,
+    "hedge_wins": 0,
+    "failed": 0,
+}
+
+
+def _hedge_delay(key: str, backup_model: Optional[str], model: str) -> Optional[float]:
+    """Seconds to wait before hedging, or None when hedging does not apply."""
+    if not HEDGE_ENABLED or not backup_model or backup_model == model:
+        return None
+    return _latencies.percentile(key, HEDGE_PERCENTILE)
+
+
+def _answered(task: asyncio.Task) -> bool:
+    """Whether a finished call produced a response (failures may return None or raise)."""
+    return not task.cancelled() and task.exception() is None and task.result() is not None
+
+
+def _record_outcome(winner: Optional[str], model: str, hedged: bool):
+    if hedged:
+        _hedge_stats["hedged"] += 1
+    if winner is None:
+        _hedge_stats["failed"] += 1
+    elif winner == model:
+        _hedge_stats["primary_wins"] += 1
+    else:
+        _hedge_stats["hedge_wins"] += 1
+
+
+async def query_model_hedged(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: float = 120.0,
+    backup_model: Optional[str] = HEDGE_BACKUP_MODEL,
+    kind: str = "query"
+) -> Optional[Dict[str, Any]]:
+    """
+    Query a model, duplicating the request to `backup_model` if the primary has
+    not answered within its tracked HEDGE_PERCENTILE latency (or has already failed).
+
+    The first successful answer wins and the other call is cancelled. Without
+    HEDGE_ENABLED, a backup model, or enough latency samples this is query_model.
+
+    Args:
+        model: Primary model identifier
+        messages: List of message dicts with 'role' and 'content'
+        timeout: Request timeout in seconds
+        backup_model: Model to hedge to
+        kind: Kind of call (e.g. "synthesis", "title"); latencies are tracked per
+            model and kind, so short calls do not skew the delay of long ones
+
+    Returns:
+        Response dict with 'content' and 'model' (the model that answered), or None if both failed
+    """
+    _hedge_stats["calls"] += 1
+    delay = _hedge_delay(f"{model}:{kind}", backup_model, model)
+    started = time.monotonic()
+
+    primary = asyncio.create_task(query_model(model, messages, timeout))
+    contenders = {primary: model}
+    started_at = {primary: started}
+    hedged = False
+
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay if delay is not None else None)
+        pending = {primary} - done
+
+        if not (primary in done and _answered(primary)) and delay is not None:
+            hedged = True
+            print(f"DEBUG: Hedging {model} to {backup_model} after {time.monotonic() - started:.1f}s")
+            backup = asyncio.create_task(query_model(backup_model, messages, timeout))
+            contenders[backup] = backup_model
+            started_at[backup] = time.monotonic()
+            pending.add(backup)
+
+        # First successful answer wins
+        while True:
+            for task in done:
+                if _answered(task):
+                    winner = contenders[task]
+                    _latencies.record(f"{winner}:{kind}", time.monotonic() - started_at[task])
+                    _record_outcome(winner, model, hedged)
+                    return {**task.result(), "model": winner}
+            if not pending:
+                _record_outcome(None, model, hedged)
+                return None
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task, name in contenders.items():
+            if not task.done():
+                task.cancel()
+                # The loser took at least this long; keep it in the distribution
+                _latencies.record(f"{name}:{kind}", time.monotonic() - started_at[task])
+
+
+async def collect_model_stream_hedged(
+    model: str,
+    messages: List[Dict[str, str]],
+    on_delta: Callable[[str], Awaitable[None]],
+    timeout: float = 120.0,
+    backup_model: Optional[str] = HEDGE_BACKUP_MODEL
+) -> Optional[Dict[str, Any]]:
+    """
+    Streaming counterpart of query_model_hedged, hedging on time-to-first-token.
+
+    If the primary has not produced its first delta within its tracked
+    HEDGE_PERCENTILE time-to-first-token, a backup stream is started. The first
+    stream to produce a delta wins: only its deltas are forwarded and the other
+    stream is cancelled.
+
+    Args:
+        model: Primary model identifier
+        messages: List of message dicts to send
+        on_delta: Async callback receiving each text fragment of the winning stream
+        timeout: Request timeout in seconds
+        backup_model: Model to hedge to
+
+    Returns:
+        Response dict with 'content' and 'model' (the model that answered), or None if failed
+    """
+    _hedge_stats["calls"] += 1
+    delay = _hedge_delay(f"{model}:ttft", backup_model, model)
+    started = time.monotonic()
+    contenders: Dict[asyncio.Task, str] = {}
+    winner: Optional[str] = None
+
+    async def run(name: str) -> Optional[Dict[str, Any]]:
+        nonlocal winner
+        run_started = time.monotonic()
+        stream = query_model_stream(name, messages, timeout)
+        try:
+            async for record in stream:
+                if record["type"] == "delta":
+                    if winner is None:
+                        winner = name
+                        _latencies.record(f"{name}:ttft", time.monotonic() - run_started)
+                        for task, other in contenders.items():
+                            if other != name:
+                                task.cancel()
+                    elif winner != name:
+                        # Lost the race; the cancellation is on its way
+                        return None
+                    await on_delta(record["content"])
+                elif record["type"] == "done":
+                    return {
+                        'content': record["content"],
+                        'model': name,
+                        'finish_reason': record.get("finish_reason"),
+                        'usage': record.get("usage")
+                    }
+                else:
+                    return None
+            return None
+        except asyncio.CancelledError:
+            if winner != name:
+                # The loser took at least this long to its first token; keep it in the distribution
+                _latencies.record(f"{name}:ttft", time.monotonic() - run_started)
+            raise
+        finally:
+            await stream.aclose()
+
+    primary = asyncio.create_task(run(model))
+    contenders[primary] = model
+    hedged = False
+
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay if delay is not None else None)
+
+        if primary not in done and winner is None and delay is not None:
+            hedged = True
+        elif primary in done and not _answered(primary) and winner is None and delay is not None:
+            # Primary failed before producing anything; fail over right away
+            hedged = True
+
+        if hedged:
+            print(f"DEBUG: Hedging stream {model} to {backup_model} after {time.monotonic() - started:.1f}s")
+            contenders[asyncio.create_task(run(backup_model))] = backup_model
+
+        results = await asyncio.gather(*contenders, return_exceptions=True)
+        response = next((r for r in results if isinstance(r, dict)), None)
+        _record_outcome(response["model"] if response else None, model, hedged)
+        return response
+    finally:
+        for task in contenders:
+            if not task.done():
+                task.cancel()
+
+
+def get_hedge_stats() -> Dict[str, Any]:
+    """Hedging counters plus derived hedge rate and hedge win rate."""
+    calls = _hedge_stats["calls"]
+    hedged = _hedge_stats["hedged"]
+    return {
+        "enabled": HEDGE_ENABLED,
+        "backup_model": HEDGE_BACKUP_MODEL or None,
+        **_hedge_stats,
+        "hedge_rate": round(hedged / calls, 4) if calls else 0.0,
+        "hedge_win_rate": round(_hedge_stats["hedge_wins"] / hedged, 4) if hedged else 0.0,
+    }
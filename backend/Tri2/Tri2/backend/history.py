@@ -0,0 +1,193 @@
+"""Per-user history index: one summary row per answered question (SQLite)."""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from .config import HISTORY_DB_PATH, HISTORY_EXCERPT_CHARS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    turn_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    conversation_id TEXT,
+    created_at TEXT NOT NULL,
+    question TEXT NOT NULL,
+    winner_model TEXT,
+    chosen_agent TEXT NOT NULL,
+    enhanced_answer TEXT NOT NULL,
+    scores TEXT NOT NULL,
+    critique TEXT NOT NULL,
+    human_label TEXT
+);
+CREATE INDEX IF NOT EXISTS history_by_user ON history (user_id, turn_id DESC);
+CREATE TABLE IF NOT EXISTS owners (
+    conversation_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL
+);
+"""
+
+COLUMNS = (
+    "turn_id, conversation_id, created_at, question, winner_model, chosen_agent, "
+    "enhanced_answer, scores, critique, human_label"
+)
+
+
+def excerpt(text: Optional[str], limit: int = HISTORY_EXCERPT_CHARS) -> str:
+    """Shorten a text to at most `limit` characters, cutting at a word boundary."""
+    text = (text or "").strip()
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(None, 1)[0] if " " in text[:limit] else text[:limit]
+    return cut + "…"
+
+
+class HistoryIndex:
+    """
+    Secondary index of council turns by user, newest first.
+
+    Rows hold only the summary the history view needs (question, winner,
+    scores and excerpts of the final answer and critique), so listing a
+    user's history is a single index range scan instead of loading and
+    scanning every conversation. Conversations created on behalf of a user
+    are recorded in `owners`, so turns answered through the conversation
+    endpoints land in the same history.
+    """
+
+    def __init__(self, path: str = HISTORY_DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(SCHEMA)
+        self.stats = {"turns_recorded": 0, "queries": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def set_owner(self, conversation_id: str, user_id: str):
+        """Record the user a conversation belongs to."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO owners (conversation_id, user_id) VALUES (?, ?)",
+                (conversation_id, user_id),
+            )
+
+    def get_owner(self, conversation_id: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT user_id FROM owners WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return row["user_id"] if row else None
+
+    def record(
+        self,
+        user_id: str,
+        conversation_id: Optional[str],
+        created_at: str,
+        question: str,
+        winner_model: Optional[str],
+        chosen_agent: str,
+        enhanced_answer: str,
+        scores: Dict[str, float],
+        critique: str
+    ) -> int:
+        """
+        Add a turn to a user's history.
+
+        Returns:
+            The new turn_id
+        """
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO history (user_id, conversation_id, created_at, question, winner_model, "
+                "chosen_agent, enhanced_answer, scores, critique) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    user_id, conversation_id, created_at, question, winner_model, chosen_agent,
+                    excerpt(enhanced_answer), json.dumps(scores), excerpt(critique),
+                ),
+            )
+        self.stats["turns_recorded"] += 1
+        return cursor.lastrowid
+
+    def set_label(self, turn_id: int, label: Optional[str]) -> bool:
+        """
+        Store human feedback on a turn.
+
+        Returns:
+            False if the turn does not exist
+        """
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("UPDATE history SET human_label = ? WHERE turn_id = ?", (label, turn_id))
+        return cursor.rowcount > 0
+
+    def list(self, user_id: str, limit: int, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        A page of a user's history, newest first.
+
+        Args:
+            user_id: User whose turns to list
+            limit: Maximum number of turns
+            before: Only return turns older than this turn_id (the page cursor)
+
+        Returns:
+            History items in the shape of the frontend's HistoryItem
+        """
+        self.stats["queries"] += 1
+        query = f"SELECT {COLUMNS} FROM history WHERE user_id = ?"
+        params: list = [user_id]
+        if before is not None:
+            query += " AND turn_id < ?"
+            params.append(before)
+        query += " ORDER BY turn_id DESC LIMIT ?"
+        params.append(limit)
+
+        items = []
+        for row in self._connect().execute(query, params):
+            scores = json.loads(row["scores"])
+            items.append({
+                "turn_id": row["turn_id"],
+                "conversation_id": row["conversation_id"],
+                "question": row["question"],
+                "winner_model": row["winner_model"],
+                "chosen_agent": row["chosen_agent"],
+                "enhanced_answer": row["enhanced_answer"],
+                "referee": {
+                    "scores": scores,
+                    "critique": row["critique"],
+                    "chosen_agent": row["chosen_agent"],
+                },
+                "created_at": row["created_at"],
+                "human_label": row["human_label"],
+            })
+        return items
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+_index: Optional[HistoryIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_history_index() -> HistoryIndex:
+    """Get the history index, opening it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = HistoryIndex()
+        return _index
+
+
+def get_history_stats() -> Optional[Dict[str, Any]]:
+    """History index counters for metrics, or None before first use."""
+    return _index.snapshot() if _index is not None else None
@@ -1,18 +1,48 @@
 """FastAPI backend for LLM Council."""
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator, Literal
 import uuid
 import json
 import asyncio
 
-from . import storage
-from .council import run_full_council, generate_conversation_title, stage1_collect_responses, stage2_collect_rankings, stage3_synthesize_final, calculate_aggregate_rankings
+from . import async_storage, sessions
+from .async_storage import get_storage_stats
+from .storage import ConflictError
+from .search import get_search_stats
+from .history import get_history_stats, excerpt
+from .events import event_bus, get_event_bus_stats, TERMINAL_EVENTS
+from .scheduler import scheduler, get_scheduler_stats, Overloaded, PRIORITIES
+from .openrouter import init_http_client, close_http_client, get_pool_stats, get_singleflight_stats
+from .ratelimit import get_limiter_stats
+from .resilience import get_resilience_stats
+from .hedging import get_hedge_stats
+from .cache import get_cache_stats
+from .semantic_cache import semantic_cache, get_semantic_cache_stats
+from .council import run_full_council, get_council_singleflight_stats, generate_conversation_title, stage1_collect_responses, stage2_collect_rankings, stage3_synthesize_final, calculate_aggregate_rankings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the shared provider HTTP client and restore the semantic cache on
+    startup; on shutdown close the client, flush storage and snapshot the cache.
+    """
+    await init_http_client()
+    semantic_cache.load()
+    try:
+        yield
+    finally:
+        await close_http_client()
+        await async_storage.close()
+        await semantic_cache.flush()
+
 
-app = FastAPI(title="LLM Council API")
+app = FastAPI(title="LLM Council API", lifespan=lifespan)
 
 # Enable CORS for local development
 app.add_middleware(
@@ -22,25 +52,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Store ongoing processes in memory (in production, you'd use Redis or similar)
-ongoing_processes = {}
+ALL_MODELS_FAILED = "All council models failed to respond. Check your API key or model availability."
+
+# Attempts at adding a user message while other writes keep changing the conversation
+CONFLICT_RETRIES = 3
 
 
 class CreateConversationRequest(BaseModel):
     """Request to create a new conversation."""
-    pass
+    user_id: Optional[str] = None
 
 
 class SendMessageRequest(BaseModel):
     """Request to send a message in a conversation."""
     content: str
+    priority: Literal["interactive", "batch"] = "interactive"
 
 
 class AskRequest(BaseModel):
     """Simplified single-turn ask request used by the React frontend."""
     question: str
+    user_id: Optional[str] = None
+    priority: Literal["interactive", "batch"] = "interactive"
 
 
 class FeedbackRequest(BaseModel):
@@ -63,6 +99,67 @@ class Conversation(BaseModel):
     created_at: str
     title: str
     messages: List[Dict[str, Any]]
+    version: int = 0
+
+
+def _clean_text(text: str) -> str:
+    # Strip common stop tokens that some models return (</s>, [/s>, etc.)
+    if not isinstance(text, str):
+        return ""
+    return text.replace("</s>", "").replace("[/s>", "").strip()
+
+
+def _score_for_model(aggregate_rankings: List[Dict[str, Any]], model_name: str) -> float:
+    # Lightweight scoring derived from ranking position (not absolute accuracy)
+    entry = next((item for item in aggregate_rankings if item["model"] == model_name), None)
+    if not entry:
+        return 8.0
+    # Map average rank to a 1-10 scale: rank 1 -> 9.5, rank 2 -> 8, rank 3 -> 6.5, etc.
+    return max(1.0, 10.5 - (entry["average_rank"] * 1.5))
+
+
+def _referee_scores(aggregate_rankings: List[Dict[str, Any]], winner_model: str) -> Dict[str, float]:
+    score = _score_for_model(aggregate_rankings, winner_model)
+    return {
+        "correctness": round(score, 1),
+        "clarity": round(score - 0.5, 1),
+        "usefulness": round(score - 0.2, 1),
+    }
+
+
+def _turn_summary(
+    question: str,
+    stage2_results: List[Dict[str, Any]],
+    stage3_result: Dict[str, Any],
+    aggregate_rankings: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """History summary of a turn answered through the conversation endpoints."""
+    # The top-ranked model is the winner, shown as agent A like in /api/ask
+    winner_model = aggregate_rankings[0]["model"] if aggregate_rankings else None
+    return {
+        "question": question,
+        "winner_model": winner_model,
+        "chosen_agent": "agent_a",
+        "enhanced_answer": _clean_text(stage3_result.get("response", "")),
+        "scores": _referee_scores(aggregate_rankings, winner_model),
+        "critique": _clean_text(stage2_results[0]["ranking"] if stage2_results else ""),
+    }
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Refuse overloaded requests quickly, telling clients when to retry."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(ConflictError)
+async def conflict_handler(request: Request, exc: ConflictError):
+    """The conversation kept changing under a compare-and-swap write; the client may retry."""
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
 
 
 @app.get("/")
@@ -71,27 +168,144 @@ async def root():
     return {"status": "ok", "service": "LLM Council API"}
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Runtime statistics used for capacity planning."""
+    return {
+        "http_pool": get_pool_stats(),
+        "rate_limits": get_limiter_stats(),
+        "resilience": get_resilience_stats(),
+        "hedging": get_hedge_stats(),
+        "response_cache": get_cache_stats(),
+        "semantic_cache": get_semantic_cache_stats(),
+        "storage": get_storage_stats(),
+        "search": get_search_stats(),
+        "history": get_history_stats(),
+        "event_bus": get_event_bus_stats(),
+        "websockets": sessions.get_session_stats(),
+        "scheduler": get_scheduler_stats(),
+        "singleflight": {
+            "query_model": get_singleflight_stats(),
+            "council": get_council_singleflight_stats(),
+        },
+    }
+
+
 @app.get("/api/conversations", response_model=List[ConversationMetadata])
-async def list_conversations():
-    """List all conversations (metadata only)."""
-    return storage.list_conversations()
+async def list_conversations(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    before: Optional[str] = None
+):
+    """
+    List conversations (metadata only), newest first.
+
+    With `limit`, returns one page; when more remain, the X-Next-Cursor header
+    holds the value to pass as `before` for the next page.
+    """
+    try:
+        conversations = await async_storage.list_conversations(limit + 1 if limit else None, before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if limit and len(conversations) > limit:
+        conversations = conversations[:limit]
+        response.headers["X-Next-Cursor"] = conversations[-1]["id"]
+    return conversations
+
+
+@app.get("/api/search")
+async def search_conversations(
+    q: str = Query(..., min_length=1),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Full-text search over past questions and final answers.
+
+    Hits are ranked by relevance (bm25) and carry a snippet with matches
+    wrapped in <mark>; use `offset`/`limit` to page while `has_more` is true.
+    """
+    try:
+        page = await async_storage.search(q, offset, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    hits, has_more = page
+    return {"query": q, "offset": offset, "limit": limit, "has_more": has_more, "results": hits}
 
 
 @app.post("/api/conversations", response_model=Conversation)
 async def create_conversation(request: CreateConversationRequest):
     """Create a new conversation."""
     conversation_id = str(uuid.uuid4())
-    conversation = storage.create_conversation(conversation_id)
+    conversation = await async_storage.create_conversation(conversation_id)
+    if request.user_id:
+        await async_storage.set_conversation_owner(conversation_id, request.user_id)
     return conversation
 
 
+@app.get("/api/history")
+async def get_history(
+    response: Response,
+    user_id: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[int] = None
+):
+    """
+    A user's answered questions, newest first, as summaries (question, winner,
+    referee scores, and excerpts of the final answer and critique).
+
+    When more turns remain, the X-Next-Cursor header holds the value to pass
+    as `before` for the next page.
+    """
+    items = await async_storage.get_history(user_id, limit + 1, before)
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers["X-Next-Cursor"] = str(items[-1]["turn_id"])
+    return items
+
+
 @app.get("/api/conversations/{conversation_id}", response_model=Conversation)
-async def get_conversation(conversation_id: str):
-    """Get a specific conversation with all its messages."""
-    conversation = storage.get_conversation(conversation_id)
-    if conversation is None:
+async def get_conversation(
+    conversation_id: str,
+    offset: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    fields: Optional[str] = None
+):
+    """
+    Get a specific conversation with all its messages.
+
+    With `offset`, `limit` or `fields`, returns a page instead: the conversation
+    metadata plus `messages` newest first (offset counts from the newest), each
+    tagged with its chronological `index` and projected to the comma-separated
+    `fields` (content, stage1, stage2, stage3). The page is encoded as a
+    stream, and stage texts are only decompressed for the fields requested.
+    """
+    if offset is None and limit is None and fields is None:
+        conversation = await async_storage.get_conversation(conversation_id)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        return conversation
+
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields is not None else None
+    try:
+        page = await async_storage.get_message_page(conversation_id, offset or 0, limit, field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return conversation
+    metadata, messages = page
+
+    async def page_generator():
+        header = {**metadata, "offset": offset or 0, "limit": limit}
+        # Open the object and its messages array, then emit one message at a time
+        yield json.dumps(header)[:-1] + ', "messages": ['
+        for i, message in enumerate(messages):
+            message = await async_storage.resolve_blobs(message)
+            yield ("," if i else "") + json.dumps(message)
+        yield "]}"
+
+    return StreamingResponse(page_generator(), media_type="application/json")
 
 
 @app.post("/api/conversations/{conversation_id}/message")
@@ -100,42 +314,44 @@ async def send_message(conversation_id: str, request: SendMessageRequest):
     Send a message and run the 3-stage council process.
     Returns the complete response with all stages.
     """
-    # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
-    if conversation is None:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-
-    # Check if this is the first message
-    is_first_message = len(conversation["messages"]) == 0
-
-    # Add user message
-    storage.add_user_message(conversation_id, request.content)
-
-    # If this is the first message, generate a title
-    if is_first_message:
-        title = await generate_conversation_title(request.content)
-        storage.update_conversation_title(conversation_id, title)
+    # Wait for a council worker before touching the conversation, so a refused
+    # request leaves no unanswered message behind
+    async with scheduler.slot(PRIORITIES[request.priority]):
+        # Check the conversation and add the user message atomically, so two quick
+        # messages cannot both be taken for the first one
+        is_first_message = await _add_user_message(conversation_id, request.content)
+        if is_first_message is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+        # If this is the first message, generate a title
+        if is_first_message:
+            title = await generate_conversation_title(request.content)
+            await async_storage.update_conversation_title(conversation_id, title)
 
-    # Run the 3-stage council process
-    stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
-        request.content
-    )
+        # Run the 3-stage council process
+        stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
+            request.content
+        )
 
-    # Add assistant message with all stages
-    storage.add_assistant_message(
-        conversation_id,
-        stage1_results,
-        stage2_results,
-        stage3_result
-    )
+        # Add assistant message with all stages
+        await async_storage.add_assistant_message(
+            conversation_id,
+            stage1_results,
+            stage2_results,
+            stage3_result
+        )
+        await async_storage.record_turn(
+            conversation_id,
+            _turn_summary(request.content, stage2_results, stage3_result, metadata.get("aggregate_rankings", []))
+        )
 
-    # Return the complete response with metadata
-    return {
-        "stage1": stage1_results,
-        "stage2": stage2_results,
-        "stage3": stage3_result,
-        "metadata": metadata
-    }
+        # Return the complete response with metadata
+        return {
+            "stage1": stage1_results,
+            "stage2": stage2_results,
+            "stage3": stage3_result,
+            "metadata": metadata
+        }
 
 @app.post("/api/ask")
 async def ask_question(request: AskRequest):
@@ -143,23 +359,26 @@ async def ask_question(request: AskRequest):
     Convenience endpoint for the React app.
     Runs a single-turn council and returns a UI-friendly payload.
     """
-    stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
-        request.question
-    )
+    async with scheduler.slot(PRIORITIES[request.priority]):
+        stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
+            request.question
+        )
 
     if not stage1_results:
-        raise HTTPException(
-            status_code=503,
-            detail="All council models failed to respond. Check your API key or model availability.",
-        )
+        raise HTTPException(status_code=503, detail=ALL_MODELS_FAILED)
 
-    aggregate_rankings = metadata.get("aggregate_rankings", [])
+    return await _ask_payload(request, stage1_results, stage2_results, stage3_result, metadata)
 
-    def _clean_text(text: str) -> str:
-        # Strip common stop tokens that some models return (</s>, [/s>, etc.)
-        if not isinstance(text, str):
-            return ""
-        return text.replace("</s>", "").replace("[/s>", "").strip()
+
+async def _ask_payload(
+    request: AskRequest,
+    stage1_results: List[Dict[str, Any]],
+    stage2_results: List[Dict[str, Any]],
+    stage3_result: Dict[str, Any],
+    metadata: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Turn a council run into the /api/ask payload, saving it for signed-in users."""
+    aggregate_rankings = metadata.get("aggregate_rankings", [])
 
     # Prefer the order of stage1_results (what actually returned), keep unique
     ordered_models = []
@@ -172,8 +391,12 @@ async def ask_question(request: AskRequest):
     ranked_models = [item["model"] for item in aggregate_rankings if item.get("model")]
     top_two = ranked_models[:2] if len(ranked_models) >= 2 else ordered_models[:2]
 
+    # Agents are built from a copy that may be padded for display; the saved
+    # conversation keeps only the responses that actually came back
+    shown_results = list(stage1_results)
+
     def build_agent(model_name: str) -> Dict[str, Any]:
-        stage1_entry = next((r for r in stage1_results if r["model"] == model_name), {})
+        stage1_entry = next((r for r in shown_results if r["model"] == model_name), {})
         resp = _clean_text(stage1_entry.get("response", ""))
         return {
             "model": model_name,
@@ -201,7 +424,7 @@ async def ask_question(request: AskRequest):
         top_two.append(missing_model)
         
         # Add a placeholder result for the missing model
-        stage1_results.append({
+        shown_results.append({
             "model": missing_model,
             "response": f"⚠️ Error: Agent {missing_model} failed to respond (likely due to API rate limits or connection issues). Please try again."
         })
@@ -216,19 +439,7 @@ async def ask_question(request: AskRequest):
     winner_model = aggregate_rankings[0]["model"] if aggregate_rankings else agent_a_model
     chosen_agent = "agent_a" if winner_model == agent_a_model else "agent_b"
 
-    # Lightweight scoring derived from ranking position (not absolute accuracy)
-    def score_for_model(model_name: str) -> float:
-        entry = next((item for item in aggregate_rankings if item["model"] == model_name), None)
-        if not entry:
-            return 8.0
-        # Map average rank to a 1-10 scale: rank 1 -> 9.5, rank 2 -> 8, rank 3 -> 6.5, etc.
-        return max(1.0, 10.5 - (entry["average_rank"] * 1.5))
-
-    referee_scores = {
-        "correctness": round(score_for_model(winner_model), 1),
-        "clarity": round(score_for_model(winner_model) - 0.5, 1),
-        "usefulness": round(score_for_model(winner_model) - 0.2, 1),
-    }
+    referee_scores = _referee_scores(aggregate_rankings, winner_model)
 
     referee_critique = _clean_text(
         stage2_results[0]["ranking"]
@@ -242,8 +453,30 @@ async def ask_question(request: AskRequest):
         final_answer = agent_a["answer"] if chosen_agent == "agent_a" else agent_b["answer"]
     final_answer = _clean_text(final_answer)
 
+    # Signed-in users get the turn saved as a conversation and in their history
+    turn_id = 0
+    if request.user_id:
+        conversation_id = str(uuid.uuid4())
+        await async_storage.create_conversation(conversation_id)
+        await async_storage.set_conversation_owner(conversation_id, request.user_id)
+        await async_storage.add_user_message(conversation_id, request.question)
+        await async_storage.update_conversation_title(conversation_id, excerpt(request.question, 50))
+        await async_storage.add_assistant_message(conversation_id, stage1_results, stage2_results, stage3_result)
+        turn_id = await async_storage.record_turn(
+            conversation_id,
+            {
+                "question": request.question,
+                "winner_model": winner_model,
+                "chosen_agent": chosen_agent,
+                "enhanced_answer": final_answer,
+                "scores": referee_scores,
+                "critique": referee_critique,
+            },
+            user_id=request.user_id
+        )
+
     response_payload = {
-        "turn_id": 0,
+        "turn_id": turn_id,
         "question": request.question,
         "agent_a": agent_a,
         "agent_b": agent_b,
@@ -266,8 +499,9 @@ async def ask_question(request: AskRequest):
 @app.post("/api/feedback")
 async def submit_feedback(request: FeedbackRequest):
     """
-    Accept user feedback on a turn. For now we just acknowledge receipt.
+    Accept user feedback on a turn, recording it in the history index.
     """
+    await async_storage.set_turn_label(request.turn_id, request.label)
     return {
         "status": "received",
         "turn_id": request.turn_id,
@@ -275,125 +509,372 @@ async def submit_feedback(request: FeedbackRequest):
     }
 
 @app.post("/api/conversations/{conversation_id}/message/stream")
-async def send_message_stream(conversation_id: str, request: SendMessageRequest):
+async def send_message_stream(
+    conversation_id: str,
+    request: SendMessageRequest,
+    accept: Optional[str] = Header(None)
+):
     """
     Send a message and start the 3-stage council process.
-    Returns immediately with a 202 Accepted status.
-    Client should then connect to the GET streaming endpoint.
+
+    With `Accept: text/event-stream`, the response is the event stream itself,
+    so the client starts receiving events without a second request.
+    Otherwise returns immediately with a 202 Accepted status, and the client
+    should then connect to the GET streaming endpoint.
+
+    Either way, the run holds a council worker until it completes; when none
+    is available soon enough the request is refused with 503 or 429.
     """
-    # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
-    if conversation is None:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    started = await scheduler.acquire(PRIORITIES[request.priority])
 
-    # Store this process in our ongoing processes dict
-    process_queue = asyncio.Queue()
-    ongoing_processes[conversation_id] = process_queue
+    # Until the run owns the worker, any failure (or the client going away)
+    # must hand it back
+    try:
+        if accept and "text/event-stream" in accept:
+            # Add the user message up front: this is the only storage read, and a
+            # missing conversation is still a plain 404
+            is_first_message = await _add_user_message(conversation_id, request.content)
+            if is_first_message is None:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+
+            # Register the run and subscribe before it starts, so no event can be missed
+            run_id = await event_bus.start(conversation_id)
+            events = event_bus.subscribe(conversation_id, run_id=run_id)
+        else:
+            # Check if conversation exists
+            conversation = await async_storage.get_conversation(conversation_id, resolve=False)
+            if conversation is None:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+
+            # Register the run, so any worker can stream it
+            is_first_message = None
+            run_id = await event_bus.start(conversation_id)
+            events = None
+    except BaseException:
+        scheduler.release(started, completed=False)
+        raise
 
     # Start the process in the background
-    asyncio.create_task(run_council_process(conversation_id, request.content, process_queue))
+    asyncio.create_task(scheduler.run_in_slot(
+        started, run_council_process(conversation_id, run_id, request.content, is_first_message)
+    ))
+    if events is not None:
+        return _sse_response(events)
 
     # Return immediately with 202 Accepted
     return {"status": "processing", "message": "Process started"}
 
-async def run_council_process(conversation_id: str, content: str, process_queue: asyncio.Queue):
-    """Run the council process and put events in the queue."""
+
+@app.post("/api/ask/stream")
+async def ask_question_stream(request: AskRequest):
+    """
+    Streaming variant of /api/ask.
+
+    Returns a text/event-stream with the same stage events as the conversation
+    stream, ending with a `complete` event whose `data` is the /api/ask payload
+    (or an `error` event). Refused with 503 or 429 when no council worker is
+    available soon enough.
+    """
+    started = await scheduler.acquire(PRIORITIES[request.priority])
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            stage1_results, stage2_results, stage3_result, metadata = await _run_council_stages(
+                request.question, queue.put
+            )
+            if not stage1_results:
+                await queue.put({"type": "error", "message": ALL_MODELS_FAILED})
+                return
+            # The council is done: a client leaving now must not cut the save in half
+            payload = await asyncio.shield(
+                _ask_payload(request, stage1_results, stage2_results, stage3_result, metadata)
+            )
+            await queue.put({"type": "complete", "data": payload})
+        except Exception as e:
+            await queue.put({"type": "error", "message": str(e)})
+
+    # Start right away, so the worker is released even if the stream is never read
+    task = asyncio.create_task(scheduler.run_in_slot(started, run()))
+
+    async def events():
+        try:
+            seq = 0
+            while True:
+                item = await queue.get()
+                seq += 1
+                yield seq, item
+                if item["type"] in TERMINAL_EVENTS:
+                    break
+        finally:
+            # Nothing is saved until the end, so a disconnected client's run can stop
+            task.cancel()
+
+    return _sse_response(events())
+
+
+@app.websocket("/api/ws")
+async def council_session(websocket: WebSocket):
+    """
+    Long-lived council session for interactive clients.
+
+    Client messages (JSON):
+        {"type": "ask", "question": ..., "user_id": ..., "id": ..., "priority": ...}  start a council run
+        {"type": "cancel", "id": ...}                                  cancel a run
+        {"type": "feedback", "turn_id": ..., "label": ...}             label a history turn
+        {"type": "ping"}
+
+    The server pushes the same stage events as /api/ask/stream, each tagged
+    with the run's `id` (chosen by the client or generated), ending with
+    `complete` (data: the /api/ask payload), `error` or `cancelled`. Several
+    runs may be in flight at once. A client that falls behind may miss
+    delta events, never the others.
+    """
+    session = sessions.open_session(websocket)
+    if session is None:
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+    sender = asyncio.create_task(session.pump())
+
+    async def run(run_id: str, request: AskRequest):
+        async def emit(event: Dict[str, Any]):
+            await session.send({**event, "id": run_id})
+
+        started = None
+        try:
+            started = await scheduler.acquire(PRIORITIES[request.priority])
+            stage1_results, stage2_results, stage3_result, metadata = await _run_council_stages(
+                request.question, emit
+            )
+            if not stage1_results:
+                await emit({"type": "error", "message": ALL_MODELS_FAILED})
+                return
+            # The council is done: a cancel or disconnect now must not cut the save in half
+            payload = await asyncio.shield(
+                _ask_payload(request, stage1_results, stage2_results, stage3_result, metadata)
+            )
+            await emit({"type": "complete", "data": payload})
+        except Overloaded as e:
+            await emit({"type": "error", "message": str(e), "retry_after": e.retry_after})
+        except asyncio.CancelledError:
+            # The sender may be gone already: never wait for room in the outbox
+            session.offer({"type": "cancelled", "id": run_id})
+        except Exception as e:
+            await emit({"type": "error", "message": str(e)})
+        finally:
+            # Also reached when an emit above is cancelled
+            if started is not None:
+                scheduler.release(started)
+
     try:
-        # Check if conversation exists
-        conversation = storage.get_conversation(conversation_id)
-        if conversation is None:
-            await process_queue.put({"type": "error", "message": "Conversation not found"})
-            return
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await session.send({"type": "error", "message": "Messages must be JSON objects"})
+                continue
+            sessions.message_received()
+            kind = message.get("type") if isinstance(message, dict) else None
+
+            if kind == "ask":
+                run_id = str(message.get("id") or uuid.uuid4())
+                try:
+                    request = AskRequest(
+                        question=message.get("question"),
+                        user_id=message.get("user_id"),
+                        priority=message.get("priority") or "interactive"
+                    )
+                except ValidationError as e:
+                    await session.send({"type": "error", "id": run_id, "message": str(e)})
+                    continue
+                if run_id in session.runs:
+                    await session.send({"type": "error", "id": run_id, "message": "A run with this id is in progress"})
+                    continue
+                session.start_run(run_id, run(run_id, request))
+                await session.send({"type": "accepted", "id": run_id})
+            elif kind == "cancel":
+                if not session.cancel_run(str(message.get("id"))):
+                    await session.send({"type": "error", "id": message.get("id"), "message": "No such run"})
+            elif kind == "feedback":
+                try:
+                    feedback = FeedbackRequest(turn_id=message.get("turn_id"), label=message.get("label"))
+                except ValidationError as e:
+                    await session.send({"type": "error", "message": str(e)})
+                    continue
+                found = await async_storage.set_turn_label(feedback.turn_id, feedback.label)
+                await session.send({"type": "feedback_received", "turn_id": feedback.turn_id, "found": found})
+            elif kind == "ping":
+                await session.send({"type": "pong"})
+            else:
+                await session.send({"type": "error", "message": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sessions.close_session(session)
+        sender.cancel()
+
+
+async def _add_user_message(conversation_id: str, content: str) -> Optional[bool]:
+    """
+    Add a user message, checking the conversation atomically.
+
+    Writes that do not take the conversation lock (e.g. the title or answer of
+    a run that is finishing) can still land between the read and the write;
+    the read-check-write is then retried on the new version.
+
+    Returns:
+        Whether it was the conversation's first message, or None if the
+        conversation does not exist
+
+    Raises:
+        ConflictError: if the conversation changed on every attempt
+    """
+    async with async_storage.conversation_lock(conversation_id):
+        for attempt in range(CONFLICT_RETRIES):
+            conversation = await async_storage.get_conversation(conversation_id, resolve=False)
+            if conversation is None:
+                return None
+
+            # Check if this is the first message
+            is_first_message = len(conversation["messages"]) == 0
+
+            # Add user message
+            try:
+                await async_storage.add_user_message(
+                    conversation_id, content, expected_version=conversation["version"]
+                )
+            except ConflictError as e:
+                if attempt == CONFLICT_RETRIES - 1:
+                    raise
+                print(f"DEBUG: Retrying user message for conversation {conversation_id}: {e}")
+                continue
+            return is_first_message
+
+
+async def _run_council_stages(
+    content: str,
+    emit: Callable[[Dict[str, Any]], Awaitable[None]]
+) -> Tuple[List, List, Dict, Dict]:
+    """
+    Run the 3 stages for one question, emitting start/delta/complete events for each.
+
+    Returns:
+        Tuple of (stage1_results, stage2_results, stage3_result, metadata), like run_full_council
+    """
+    # Stage 1: Collect responses, streaming each model's tokens as they arrive
+    async def on_stage1_delta(model: str, text: str):
+        await emit({"type": "stage1_delta", "model": model, "delta": text})
+
+    stage1_metadata = {}
+    await emit({"type": "stage1_start"})
+    stage1_results = await stage1_collect_responses(
+        content, on_delta=on_stage1_delta, metadata=stage1_metadata
+    )
+    await emit({"type": "stage1_complete", "data": stage1_results, "metadata": stage1_metadata})
+
+    # Nothing to rank or synthesize if no model responded
+    if not stage1_results:
+        return [], [], {"model": "error", "response": ALL_MODELS_FAILED}, {"aggregate_rankings": [], **stage1_metadata}
+
+    # Stage 2: Collect rankings
+    await emit({"type": "stage2_start"})
+    stage2_results, label_to_model = await stage2_collect_rankings(content, stage1_results)
+    aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
+    await emit({
+        "type": "stage2_complete",
+        "data": stage2_results,
+        "metadata": {
+            "label_to_model": label_to_model,
+            "aggregate_rankings": aggregate_rankings
+        }
+    })
 
-        # Check if this is the first message
-        is_first_message = len(conversation["messages"]) == 0
+    # Stage 3: Synthesize final answer, streaming the chairman's tokens
+    async def on_stage3_delta(text: str):
+        await emit({"type": "stage3_delta", "delta": text})
 
-        # Add user message
-        storage.add_user_message(conversation_id, content)
+    await emit({"type": "stage3_start"})
+    stage3_result = await stage3_synthesize_final(
+        content, stage1_results, stage2_results, on_delta=on_stage3_delta
+    )
+    await emit({"type": "stage3_complete", "data": stage3_result})
+
+    metadata = {
+        "label_to_model": label_to_model,
+        "aggregate_rankings": aggregate_rankings,
+        **stage1_metadata
+    }
+    return stage1_results, stage2_results, stage3_result, metadata
+
+
+async def run_council_process(
+    conversation_id: str,
+    run_id: str,
+    content: str,
+    is_first_message: Optional[bool] = None
+):
+    """
+    Run the council process and publish its events on the event bus, as run `run_id`.
+
+    Adds the user message first, unless the caller already did and passes
+    is_first_message.
+    """
+    async def emit(event: Dict[str, Any]):
+        await event_bus.publish(run_id, event)
+
+    try:
+        if is_first_message is None:
+            is_first_message = await _add_user_message(conversation_id, content)
+            if is_first_message is None:
+                await emit({"type": "error", "message": "Conversation not found"})
+                return
 
         # Start title generation in parallel (don't await yet)
         title_task = None
         if is_first_message:
             title_task = asyncio.create_task(generate_conversation_title(content))
 
-        # Stage 1: Collect responses
-        await process_queue.put({"type": "stage1_start"})
-        stage1_results = await stage1_collect_responses(content)
-        await process_queue.put({"type": "stage1_complete", "data": stage1_results})
-
-        # Stage 2: Collect rankings
-        await process_queue.put({"type": "stage2_start"})
-        stage2_results, label_to_model = await stage2_collect_rankings(content, stage1_results)
-        aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
-        await process_queue.put({
-            "type": "stage2_complete", 
-            "data": stage2_results, 
-            "metadata": {
-                "label_to_model": label_to_model, 
-                "aggregate_rankings": aggregate_rankings
-            }
-        })
-
-        # Stage 3: Synthesize final answer
-        await process_queue.put({"type": "stage3_start"})
-        stage3_result = await stage3_synthesize_final(content, stage1_results, stage2_results)
-        await process_queue.put({"type": "stage3_complete", "data": stage3_result})
+        stage1_results, stage2_results, stage3_result, metadata = await _run_council_stages(content, emit)
 
         # Wait for title generation if it was started
         if title_task:
             title = await title_task
-            storage.update_conversation_title(conversation_id, title)
-            await process_queue.put({"type": "title_complete", "data": {"title": title}})
+            await async_storage.update_conversation_title(conversation_id, title)
+            await emit({"type": "title_complete", "data": {"title": title}})
 
         # Save complete assistant message
-        storage.add_assistant_message(
+        await async_storage.add_assistant_message(
             conversation_id,
             stage1_results,
             stage2_results,
             stage3_result
         )
+        await async_storage.record_turn(
+            conversation_id,
+            _turn_summary(content, stage2_results, stage3_result, metadata["aggregate_rankings"])
+        )
 
         # Send completion event
-        await process_queue.put({"type": "complete"})
+        await emit({"type": "complete"})
 
     except Exception as e:
         # Send error event
-        await process_queue.put({"type": "error", "message": str(e)})
+        await emit({"type": "error", "message": str(e)})
     finally:
-        # Clean up the process queue
-        if conversation_id in ongoing_processes:
-            del ongoing_processes[conversation_id]
-
-@app.get("/api/conversations/{conversation_id}/stream")
-async def stream_conversation_events(conversation_id: str):
-    """
-    Stream events for an ongoing conversation process.
-    """
-    # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
-    if conversation is None:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-
-    # Check if there's an ongoing process
-    if conversation_id not in ongoing_processes:
-        # No ongoing process, return empty stream
-        async def empty_generator():
-            yield f"data: {json.dumps({'type': 'info', 'message': 'No ongoing process'})}\n\n"
-        return StreamingResponse(empty_generator(), media_type="text/event-stream")
+        # Mark the run finished
+        await event_bus.finish(run_id)
 
-    # Get the process queue
-    process_queue = ongoing_processes[conversation_id]
 
+def _sse_response(events: AsyncIterator[Tuple[int, Dict[str, Any]]]) -> StreamingResponse:
+    """Encode (sequence number, event) pairs as a text/event-stream response."""
     async def event_generator():
         try:
-            while True:
-                # Wait for an item from the queue
-                item = await process_queue.get()
-                yield f"data: {json.dumps(item)}\n\n"
-                
-                # If this is the completion or error event, stop streaming
-                if item["type"] in ["complete", "error"]:
-                    break
+            # The events end after the completion or error event
+            async for seq, item in events:
+                yield f"id: {seq}\ndata: {json.dumps(item)}\n\n"
         except asyncio.CancelledError:
             # Client disconnected
             pass
@@ -401,7 +882,7 @@ async def stream_conversation_events(conversation_id: str):
             yield f"data: {json.dumps({'type': 'error', 'message': f'Streaming error: {str(e)}'})}\n\n"
 
     response = StreamingResponse(event_generator(), media_type="text/event-stream")
-    
+
     # Add CORS headers manually since middleware doesn't always work with StreamingResponse
     response.headers["Access-Control-Allow-Origin"] = "*"
     response.headers["Access-Control-Allow-Credentials"] = "true"
@@ -409,9 +890,38 @@ async def stream_conversation_events(conversation_id: str):
     response.headers["Access-Control-Allow-Headers"] = "*"
     response.headers["Cache-Control"] = "no-cache"
     response.headers["Connection"] = "keep-alive"
-    
+
     return response
 
+
+@app.get("/api/conversations/{conversation_id}/stream")
+async def stream_conversation_events(
+    conversation_id: str,
+    last_event_id: Optional[int] = Header(None),
+    after: Optional[int] = Query(None, ge=0)
+):
+    """
+    Stream events for an ongoing (or just finished) conversation process.
+
+    Every event carries an SSE `id:`. Any number of clients can stream the same
+    run; a reconnecting client gets only the events after its Last-Event-ID
+    header (or the `after` query parameter).
+    """
+    # Check if there's an ongoing process; storage is only read when there is none
+    if not await event_bus.has_job(conversation_id):
+        # Check if conversation exists
+        conversation = await async_storage.get_conversation(conversation_id, resolve=False)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+        # No ongoing process, return empty stream
+        async def empty_generator():
+            yield f"data: {json.dumps({'type': 'info', 'message': 'No ongoing process'})}\n\n"
+        return StreamingResponse(empty_generator(), media_type="text/event-stream")
+
+    # Subscribe now, before the run can finish
+    return _sse_response(event_bus.subscribe(conversation_id, last_event_id or after or 0))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
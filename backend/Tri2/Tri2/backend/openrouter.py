@@ -1,174 +1,701 @@
 """API client for both Google Gemini and OpenRouter."""
 
+import asyncio
+import json
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import google.generativeai as genai
-from .config import OPENROUTER_API_KEY, OPENROUTER_API_URL, GOOGLE_API_KEY, USE_GEMINI
+from google.api_core import exceptions as google_exceptions
+from google.auth import exceptions as google_auth_exceptions
+from .config import (
+    OPENROUTER_API_KEY,
+    OPENROUTER_API_URL,
+    GOOGLE_API_KEY,
+    USE_GEMINI,
+    MAX_TOKENS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+    SINGLEFLIGHT_ENABLED,
+)
+from .ratelimit import get_limiter, estimate_tokens
+from .resilience import (
+    ProviderError,
+    CircuitOpenError,
+    parse_retry_after,
+    call_with_retries,
+    start_call,
+    backoff_or_raise,
+    record_success,
+    record_failure,
+    get_breaker,
+)
+from .cache import response_cache, cache_key, is_cacheable
+from .singleflight import SingleFlight
 
 # Configure Gemini if available
 if GOOGLE_API_KEY:
     genai.configure(api_key=GOOGLE_API_KEY)
 
+# Gemini exceptions without an HTTP status that are still worth retrying
+GEMINI_TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    TimeoutError,
+    ConnectionError,
+    httpx.TransportError,
+    google_exceptions.RetryError,
+    google_auth_exceptions.TransportError,
+)
+
+# Shared HTTP client, created on app startup and reused by every OpenRouter call
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Identical concurrent queries share one provider call
+_inflight_queries = SingleFlight("query_model")
+
+# Request counters used for pool sizing
+_http_stats = {
+    "requests_total": 0,
+    "requests_in_flight": 0,
+    "peak_in_flight": 0,
+}
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """
+    Create the shared HTTP client if it does not exist yet.
+
+    Returns:
+        The process-wide httpx.AsyncClient
+    """
+    global _http_client
+
+    if _http_client is not None and not _http_client.is_closed:
+        return _http_client
+
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("WARNING: HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+    _http_client = httpx.AsyncClient(limits=limits, http2=http2)
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client and release its pooled connections."""
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client, creating it lazily outside the app lifecycle
+    (e.g. when the council is run from a script).
+    """
+    if _http_client is None or _http_client.is_closed:
+        return await init_http_client()
+    return _http_client
+
+
+def _track_request_start():
+    """Count a request against the shared pool statistics."""
+    _http_stats["requests_total"] += 1
+    _http_stats["requests_in_flight"] += 1
+    _http_stats["peak_in_flight"] = max(_http_stats["peak_in_flight"], _http_stats["requests_in_flight"])
+
+
+def _track_request_end():
+    """Release a request from the shared pool statistics."""
+    _http_stats["requests_in_flight"] -= 1
+
+
+def get_singleflight_stats() -> Dict[str, Any]:
+    """Coalescing counters for query_model."""
+    return _inflight_queries.snapshot()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Report connection pool statistics for the shared HTTP client.
+
+    Returns:
+        Dict with pool limits, connection states and request counters
+    """
+    stats = {
+        "initialized": _http_client is not None and not _http_client.is_closed,
+        "http2_enabled": HTTP2_ENABLED,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY,
+        **_http_stats,
+    }
+
+    if not stats["initialized"]:
+        return stats
+
+    # httpx has no public pool API: per-connection figures come from httpcore
+    # internals, and are left out if those are not shaped as expected
+    pool = getattr(getattr(_http_client, "_transport", None), "_pool", None)
+    try:
+        connections = list(pool.connections)
+        stats.update({
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "active_connections": sum(1 for c in connections if not c.is_idle() and not c.is_closed()),
+            "http2_connections": sum(1 for c in connections if "HTTP/2" in c.info()),
+            "queued_requests": len(getattr(pool, "_requests", [])),
+        })
+    except (AttributeError, TypeError):
+        pass
+    return stats
+
+
+def _openrouter_headers() -> Dict[str, str]:
+    """Request headers for the OpenRouter API."""
+    return {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
+
+def _describe_http_error(response: httpx.Response) -> str:
+    """Extract a readable error message from a failed OpenRouter response."""
+    try:
+        if response.headers.get('content-type', '').startswith('application/json'):
+            error_json = response.json()
+            return error_json.get('error', {}).get('message', str(error_json))
+        return response.text[:500]
+    except Exception:
+        return f"status {response.status_code}"
+
+
+def _build_gemini_prompt(messages: List[Dict[str, str]]) -> str:
+    """Convert chat messages into a single Gemini prompt with formatting instructions."""
+    user_messages = [m for m in messages if m['role'] == 'user']
+    if user_messages:
+        # Add formatting instructions to ensure well-structured output
+        original_content = user_messages[-1]['content']
+        return f"""{original_content}
+
+ Please provide a well-structured response with:
+ - Clear paragraphs separated by blank lines
+ - Proper headings using markdown (## for main sections)
+ - Bullet points or numbered lists where appropriate
+ - Code blocks with ``` if showing code
+ - Proper spacing for readability
+
+ Format your response in clean, readable markdown."""
+
+    return "\n".join([f"{m['role']}: {m['content']}" for m in messages])
+
+
+def _gemini_total_tokens(response) -> Optional[int]:
+    """Total token count reported by a Gemini response, if any."""
+    usage_metadata = getattr(response, "usage_metadata", None)
+    return getattr(usage_metadata, "total_token_count", None) if usage_metadata else None
+
+
+def _gemini_generation_config(max_tokens: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Gemini generation config; output is uncapped unless max_tokens is given."""
+    if max_tokens is None:
+        return None
+    return {"max_output_tokens": max_tokens}
+
+
+def _provider_for_model(model: str) -> str:
+    """
+    Determine which API serves a model.
+
+    Route to Gemini API only if model name starts with "gemini-";
+    route to OpenRouter for all other models (including llama, mistral, etc.)
+    """
+    return "gemini" if model.startswith("gemini-") else "openrouter"
+
+
+def _gemini_error(error: Exception) -> ProviderError:
+    """Normalize a google.generativeai exception into a ProviderError."""
+    if isinstance(error, ProviderError):
+        return error
+
+    # google.api_core exceptions carry the HTTP status as `code` (e.g. ResourceExhausted -> 429)
+    status_code = getattr(error, "code", None)
+    if not isinstance(status_code, int):
+        status_code = None
+
+    # Without a status, only transport errors, timeouts and exhausted api_core
+    # retries are worth retrying; anything else (bad arguments, blocked prompts,
+    # SDK bugs) would fail the same way again and says nothing about the model
+    transient = None
+    if status_code is None and not isinstance(error, GEMINI_TRANSIENT_ERRORS):
+        transient = False
+
+    # Rate-limit errors may carry a RetryInfo detail with the suggested delay
+    retry_after = None
+    for detail in getattr(error, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            retry_after = retry_delay.seconds + retry_delay.nanos / 1e9
+            break
+
+    return ProviderError(str(error), status_code=status_code, retry_after=retry_after, transient=transient)
+
+
+def _openrouter_http_error(response: httpx.Response) -> ProviderError:
+    """Build a ProviderError from a failed OpenRouter response."""
+    return ProviderError(
+        f"{response.status_code} - {_describe_http_error(response)}",
+        status_code=response.status_code,
+        retry_after=parse_retry_after(response.headers.get("retry-after")),
+    )
+
 
 async def query_gemini_model(
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float = 120.0
-) -> Optional[Dict[str, Any]]:
+    timeout: float = 120.0,
+    max_tokens: Optional[int] = None
+) -> Dict[str, Any]:
     """
-    Query a Google Gemini model.
+    Query a Google Gemini model (single attempt, see query_model for retries).
     
     Args:
         model: Gemini model identifier (e.g., "gemini-1.5-flash")
         messages: List of message dicts with 'role' and 'content'
         timeout: Request timeout in seconds
+        max_tokens: Optional cap on generated tokens
     
     Returns:
-        Response dict with 'content', or None if failed
+        Response dict with 'content'
+
+    Raises:
+        ProviderError: if the call failed
     """
     print(f"DEBUG: Querying Gemini model {model} with {len(messages)} messages")
-    
-    import asyncio
-    
-    retries = 3
-    base_delay = 2
-    
-    for attempt in range(retries + 1):
+
+    limiter = get_limiter("gemini", model)
+
+    async with limiter.acquire(estimate_tokens(messages, max_tokens or MAX_TOKENS)) as permit:
         try:
             # Initialize the model
             gemini_model = genai.GenerativeModel(model)
             
             # Convert messages to Gemini format with formatting instructions
-            user_messages = [m for m in messages if m['role'] == 'user']
-            if user_messages:
-                # Add formatting instructions to ensure well-structured output
-                original_content = user_messages[-1]['content']
-                enhanced_prompt = f"""{original_content}
-
- Please provide a well-structured response with:
- - Clear paragraphs separated by blank lines
- - Proper headings using markdown (## for main sections)
- - Bullet points or numbered lists where appropriate
- - Code blocks with ``` if showing code
- - Proper spacing for readability
-
- Format your response in clean, readable markdown."""
-                
-                prompt = enhanced_prompt
-            else:
-                prompt = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
+            prompt = _build_gemini_prompt(messages)
             
             # Generate response
-            response = await gemini_model.generate_content_async(prompt)
-            
+            response = await gemini_model.generate_content_async(
+                prompt,
+                generation_config=_gemini_generation_config(max_tokens),
+                request_options={"timeout": timeout}
+            )
+
             # Extract text from response - preserve all formatting
             response_text = response.text if hasattr(response, 'text') else str(response)
-            
-            return {
-                'content': response_text,
-                'model': model
-            }
-            
         except Exception as e:
-            error_str = str(e)
-            if "429" in error_str and attempt < retries:
-                delay = base_delay * (2 ** attempt)
-                print(f"⚠️ Gemini Rate Limit (429). Retrying in {delay}s... (Attempt {attempt+1}/{retries})")
-                await asyncio.sleep(delay)
-                continue
-            
+            error = _gemini_error(e)
+            permit.rate_limited = error.rate_limited
             print(f"Error querying Gemini model {model}: {e}")
-            return None
+            raise error from e
+
+        permit.tokens_used = _gemini_total_tokens(response)
+
+    return {
+        'content': response_text,
+        'model': model
+    }
 
 
 async def query_openrouter_model(
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float = 120.0
-) -> Optional[Dict[str, Any]]:
+    timeout: float = 120.0,
+    max_tokens: Optional[int] = None
+) -> Dict[str, Any]:
     """
-    Query a single model via OpenRouter API.
+    Query a single model via OpenRouter API (single attempt, see query_model for retries).
     
     Args:
         model: OpenRouter model identifier (e.g., "openai/gpt-4o")
         messages: List of message dicts with 'role' and 'content'
         timeout: Request timeout in seconds
+        max_tokens: Cap on generated tokens (defaults to MAX_TOKENS)
     
     Returns:
-        Response dict with 'content' and optional 'reasoning_details', or None if failed
+        Response dict with 'content' and optional 'reasoning_details'
+
+    Raises:
+        ProviderError: if the call failed
     """
     print(f"DEBUG: Querying OpenRouter model {model} with {len(messages)} messages")
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    headers = _openrouter_headers()
 
     payload = {
         "model": model,
         "messages": messages,
-        "max_tokens": 1000,
+        "max_tokens": max_tokens or MAX_TOKENS,
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
+    client = await get_http_client()
+    limiter = get_limiter("openrouter", model)
+
+    async with limiter.acquire(estimate_tokens(messages, payload["max_tokens"])) as permit:
+        _track_request_start()
+        try:
             response = await client.post(
                 OPENROUTER_API_URL,
                 headers=headers,
-                json=payload
+                json=payload,
+                timeout=timeout
             )
-            response.raise_for_status()
+        except httpx.RequestError as e:
+            print(f"Network error querying model {model}: {e}")
+            raise ProviderError(f"Network error: {e}") from e
+        finally:
+            _track_request_end()
+
+        if response.is_error:
+            error = _openrouter_http_error(response)
+            permit.rate_limited = error.rate_limited
+            print(f"HTTP error querying model {model}: {error}")
+            raise error
 
+        try:
             data = response.json()
             message = data['choices'][0]['message']
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            print(f"Unexpected response from model {model}: {e}")
+            raise ProviderError(f"Malformed response: {e}") from e
 
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
+        permit.tokens_used = (data.get('usage') or {}).get('total_tokens')
 
-    except httpx.HTTPStatusError as e:
-        try:
-            error_text = e.response.text
-            error_json = e.response.json() if e.response.headers.get('content-type', '').startswith('application/json') else None
-            if error_json:
-                error_msg = error_json.get('error', {}).get('message', str(error_json))
-                print(f"HTTP error querying model {model}: {e.response.status_code} - {error_msg}")
-            else:
-                print(f"HTTP error querying model {model}: {e.response.status_code} - {error_text[:500]}")
-        except:
-            print(f"HTTP error querying model {model}: {e.response.status_code} - {str(e)}")
-        return None
-    except httpx.RequestError as e:
-        print(f"Network error querying model {model}: {e}")
-        return None
-    except Exception as e:
-        print(f"Unexpected error querying model {model}: {e}")
-        return None
+    return {
+        'content': message.get('content'),
+        'reasoning_details': message.get('reasoning_details')
+    }
 
 
 async def query_model(
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float = 120.0
+    timeout: float = 120.0,
+    max_tokens: Optional[int] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Query a model (automatically routes to Gemini or OpenRouter based on model name).
+
+    Identical requests are answered from the response cache, and identical
+    requests already in flight share a single provider call. Failed attempts are
+    retried with jittered backoff under the provider's retry budget; calls to a
+    model whose circuit breaker is open fail fast.
     
     Args:
         model: Model identifier
         messages: List of message dicts with 'role' and 'content'
-        timeout: Request timeout in seconds
+        timeout: Request timeout in seconds (per attempt)
+        max_tokens: Optional cap on generated tokens
     
     Returns:
         Response dict with 'content', or None if failed
     """
-    # Determine if this is a Gemini model based on the model name
-    # Route to Gemini API only if model name starts with "gemini-"
-    # Route to OpenRouter for all other models (including llama, mistral, etc.)
-    if model.startswith("gemini-"):
-        return await query_gemini_model(model, messages, timeout)
-    else:
-        return await query_openrouter_model(model, messages, timeout)
+    key = cache_key(model, messages, {"max_tokens": max_tokens})
+    cacheable = is_cacheable(model)
+    if cacheable:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    provider = _provider_for_model(model)
+    query_fn = query_gemini_model if provider == "gemini" else query_openrouter_model
+
+    async def call_provider() -> Optional[Dict[str, Any]]:
+        try:
+            response = await call_with_retries(
+                provider,
+                model,
+                lambda: query_fn(model, messages, timeout, max_tokens)
+            )
+        except CircuitOpenError as e:
+            print(f"Skipping model {model}: {e}")
+            return None
+        except ProviderError as e:
+            print(f"Giving up on model {model}: {e}")
+            return None
+        if cacheable:
+            response_cache.set(key, response)
+        return response
+
+    if not SINGLEFLIGHT_ENABLED:
+        return await call_provider()
+    return await _inflight_queries.do(key, call_provider)
+
+
+async def stream_gemini_model(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: float = 120.0,
+    max_tokens: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a completion from a Google Gemini model (single attempt).
+
+    Args:
+        model: Gemini model identifier
+        messages: List of message dicts with 'role' and 'content'
+        timeout: Request timeout in seconds
+        max_tokens: Optional cap on generated tokens
+
+    Yields:
+        Delta records followed by the final done record (see query_model_stream)
+
+    Raises:
+        ProviderError: if the call failed
+    """
+    print(f"DEBUG: Streaming Gemini model {model} with {len(messages)} messages")
+
+    chunks = []
+    finish_reason = None
+    limiter = get_limiter("gemini", model)
+
+    async with limiter.acquire(estimate_tokens(messages, max_tokens or MAX_TOKENS)) as permit:
+        try:
+            gemini_model = genai.GenerativeModel(model)
+            response = await gemini_model.generate_content_async(
+                _build_gemini_prompt(messages),
+                generation_config=_gemini_generation_config(max_tokens),
+                stream=True,
+                request_options={"timeout": timeout}
+            )
+
+            async for chunk in response:
+                if chunk.candidates and chunk.candidates[0].finish_reason:
+                    finish_reason = chunk.candidates[0].finish_reason.name.lower()
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety stops) carry no delta
+                    continue
+                if text:
+                    chunks.append(text)
+                    yield {"type": "delta", "content": text}
+        except Exception as e:
+            error = _gemini_error(e)
+            permit.rate_limited = error.rate_limited
+            print(f"Error streaming Gemini model {model}: {e}")
+            raise error from e
+
+        permit.tokens_used = _gemini_total_tokens(response)
+
+    usage = None
+    usage_metadata = getattr(response, "usage_metadata", None)
+    if usage_metadata is not None:
+        usage = {
+            "prompt_tokens": usage_metadata.prompt_token_count,
+            "completion_tokens": usage_metadata.candidates_token_count,
+            "total_tokens": usage_metadata.total_token_count,
+        }
+
+    yield {
+        "type": "done",
+        "model": model,
+        "content": "".join(chunks),
+        "finish_reason": finish_reason,
+        "usage": usage,
+    }
+
+
+async def stream_openrouter_model(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: float = 120.0,
+    max_tokens: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a completion from OpenRouter using server-sent events (single attempt).
+
+    Args:
+        model: OpenRouter model identifier
+        messages: List of message dicts with 'role' and 'content'
+        timeout: Request timeout in seconds
+        max_tokens: Cap on generated tokens (defaults to MAX_TOKENS)
+
+    Yields:
+        Delta records followed by the final done record (see query_model_stream)
+
+    Raises:
+        ProviderError: if the call failed
+    """
+    print(f"DEBUG: Streaming OpenRouter model {model} with {len(messages)} messages")
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens or MAX_TOKENS,
+        "stream": True,
+        "usage": {"include": True},
+    }
+
+    client = await get_http_client()
+    limiter = get_limiter("openrouter", model)
+
+    chunks = []
+    finish_reason = None
+    usage = None
+
+    async with limiter.acquire(estimate_tokens(messages, payload["max_tokens"])) as permit:
+        _track_request_start()
+        try:
+            async with client.stream(
+                "POST",
+                OPENROUTER_API_URL,
+                headers=_openrouter_headers(),
+                json=payload,
+                timeout=timeout
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                    error = _openrouter_http_error(response)
+                    permit.rate_limited = error.rate_limited
+                    print(f"HTTP error streaming model {model}: {error}")
+                    raise error
+
+                async for line in response.aiter_lines():
+                    # SSE comments (": OPENROUTER PROCESSING") and blank separators carry no data
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+
+                    event = json.loads(data)
+                    if "error" in event:
+                        message = event["error"].get("message", str(event["error"]))
+                        print(f"Stream error from model {model}: {message}")
+                        raise ProviderError(message, status_code=event["error"].get("code"))
+
+                    if event.get("usage"):
+                        usage = event["usage"]
+                        permit.tokens_used = usage.get("total_tokens")
+
+                    for choice in event.get("choices", []):
+                        if choice.get("finish_reason"):
+                            finish_reason = choice["finish_reason"]
+                        text = (choice.get("delta") or {}).get("content")
+                        if text:
+                            chunks.append(text)
+                            yield {"type": "delta", "content": text}
+
+        except httpx.RequestError as e:
+            print(f"Network error streaming model {model}: {e}")
+            raise ProviderError(f"Network error: {e}") from e
+        except ValueError as e:
+            print(f"Malformed stream from model {model}: {e}")
+            raise ProviderError(f"Malformed stream: {e}") from e
+        finally:
+            _track_request_end()
+
+    yield {
+        "type": "done",
+        "model": model,
+        "content": "".join(chunks),
+        "finish_reason": finish_reason,
+        "usage": usage,
+    }
+
+
+async def query_model_stream(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: float = 120.0,
+    max_tokens: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a model completion as it is generated (routes like query_model).
+
+    Failures before the first delta are retried like query_model; once text
+    has been yielded the stream cannot be replayed, so a later failure ends it.
+
+    Args:
+        model: Model identifier
+        messages: List of message dicts with 'role' and 'content'
+        timeout: Request timeout in seconds (per attempt)
+        max_tokens: Optional cap on generated tokens
+
+    Yields:
+        {"type": "delta", "content": str} for each text fragment, then exactly one
+        final record: {"type": "done", "model", "content", "finish_reason", "usage"}
+        with the full text, or {"type": "error", "model", "error"} if the call failed
+    """
+    key = cache_key(model, messages, {"max_tokens": max_tokens}) if is_cacheable(model) else None
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            # Replay a cached answer as a single delta
+            content = cached.get('content') or ''
+            if content:
+                yield {"type": "delta", "content": content}
+            yield {
+                "type": "done",
+                "model": model,
+                "content": content,
+                "finish_reason": "cached",
+                "usage": None,
+            }
+            return
+
+    provider = _provider_for_model(model)
+    stream_fn = stream_gemini_model if provider == "gemini" else stream_openrouter_model
+
+    try:
+        state = start_call(provider, model)
+    except CircuitOpenError as e:
+        print(f"Skipping model {model}: {e}")
+        yield {"type": "error", "model": model, "error": str(e)}
+        return
+
+    succeeded = False
+    while True:
+        started = False
+        try:
+            async for record in stream_fn(model, messages, timeout, max_tokens):
+                started = started or record["type"] == "delta"
+                if record["type"] == "done":
+                    # Record before yielding: consumers stop at the final record
+                    # and may never resume the generator
+                    succeeded = True
+                    record_success(model)
+                    if key is not None:
+                        response_cache.set(key, {'content': record["content"]})
+                yield record
+            return
+        except ProviderError as e:
+            if started:
+                record_failure(model)
+                yield {"type": "error", "model": model, "error": str(e)}
+                return
+            try:
+                await backoff_or_raise(model, state, e)
+            except ProviderError:
+                print(f"Giving up on model {model}: {e}")
+                yield {"type": "error", "model": model, "error": str(e)}
+                return
+        except (asyncio.CancelledError, GeneratorExit):
+            if not succeeded:
+                get_breaker(model).abandon()
+            raise
 
 
 async def query_models_parallel(
@@ -185,8 +712,6 @@ async def query_models_parallel(
     Returns:
         Dict mapping model identifier to response dict (or None if failed)
     """
-    import asyncio
-
     # Create tasks for all models
     tasks = [query_model(model, messages) for model in models]
 
@@ -0,0 +1,250 @@
+"""Process-wide rate and concurrency limiting for provider calls."""
+
+import asyncio
+import time
+from typing import Dict, Any, Optional, Tuple
+from .config import (
+    PROVIDER_LIMITS,
+    LIMITER_MIN_CONCURRENCY,
+    LIMITER_MAX_CONCURRENCY,
+    LIMITER_BACKOFF_RATIO,
+    LIMITER_LATENCY_TOLERANCE,
+)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`.
+
+    The balance may go negative when a reservation is later corrected upwards
+    (e.g. actual token usage exceeded the estimate); callers then wait longer.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """
+        Wait until `amount` tokens are available and take them.
+
+        Returns:
+            Seconds spent waiting
+        """
+        # A single request larger than the bucket could never be admitted
+        amount = min(amount, self.capacity)
+        waited = 0.0
+
+        # Serialize waiters so large requests are not starved by small ones
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def adjust(self, amount: float):
+        """Debit (positive) or refund (negative) tokens after the fact."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit.
+
+    The limit grows by roughly one slot per round of successful calls and is cut
+    multiplicatively on a 429 or when latency exceeds LIMITER_LATENCY_TOLERANCE
+    times its smoothed baseline.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free slot.
+
+        Returns:
+            Seconds spent waiting
+        """
+        started = time.monotonic()
+        async with self._condition:
+            while self.in_flight >= int(self.limit):
+                await self._condition.wait()
+            self.in_flight += 1
+        return time.monotonic() - started
+
+    async def release(self, latency: float, rate_limited: bool, failed: bool):
+        """Free a slot and adapt the limit from the call outcome."""
+        async with self._condition:
+            self.in_flight -= 1
+
+            if rate_limited:
+                self._decrease()
+            elif not failed:
+                if self.baseline_latency is None:
+                    self.baseline_latency = latency
+                if latency > self.baseline_latency * LIMITER_LATENCY_TOLERANCE:
+                    self._decrease()
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                # Slow-moving average so one outlier does not shift the baseline
+                self.baseline_latency = 0.9 * self.baseline_latency + 0.1 * latency
+
+            self._condition.notify_all()
+
+    def release_nowait(self):
+        """Free a slot without adapting the limit (the call was abandoned)."""
+        self.in_flight -= 1
+        # Wake waiters from a separate task since we may be unwinding a cancellation
+        asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    def _decrease(self):
+        self.limit = max(self.min_limit, self.limit * LIMITER_BACKOFF_RATIO)
+
+
+class Permit:
+    """A granted call slot; set `rate_limited`, `failed` or `tokens_used` before it is released."""
+
+    def __init__(self, limiter: "ProviderLimiter", estimated_tokens: int):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.rate_limited = False
+        self.failed = False
+        self.tokens_used: Optional[int] = None
+        self.started_at = 0.0
+
+    async def __aenter__(self) -> "Permit":
+        await self.limiter._admit(self)
+        self.started_at = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            # Abandoned calls (quorum, hedging, disconnects) say nothing about provider health
+            self.limiter._cancel(self)
+            return False
+        failed = exc_type is not None
+        await self.limiter._release(self, time.monotonic() - self.started_at, failed)
+        return False
+
+
+class ProviderLimiter:
+    """Request/token buckets plus adaptive concurrency for one (provider, model)."""
+
+    def __init__(self, provider: str, model: str):
+        limits = PROVIDER_LIMITS.get(provider, {})
+        self.provider = provider
+        self.model = model
+        rpm = limits.get("rpm", 0)
+        tpm = limits.get("tpm", 0)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial=limits.get("concurrency", LIMITER_MIN_CONCURRENCY),
+            min_limit=LIMITER_MIN_CONCURRENCY,
+            max_limit=LIMITER_MAX_CONCURRENCY,
+        )
+        self.stats = {
+            "admitted": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def acquire(self, estimated_tokens: int = 0) -> Permit:
+        """
+        Reserve capacity for one call.
+
+        Usage:
+            async with limiter.acquire(estimated_tokens) as permit:
+                ...
+                permit.rate_limited = True  # if the provider answered 429
+        """
+        return Permit(self, estimated_tokens)
+
+    async def _admit(self, permit: Permit):
+        waited = 0.0
+        if self.requests is not None:
+            waited += await self.requests.acquire(1)
+        if self.tokens is not None and permit.estimated_tokens:
+            waited += await self.tokens.acquire(permit.estimated_tokens)
+        waited += await self.concurrency.acquire()
+        self.stats["admitted"] += 1
+        self.stats["wait_seconds"] += waited
+
+    def _cancel(self, permit: Permit):
+        self.stats["cancelled"] += 1
+        self.concurrency.release_nowait()
+
+    async def _release(self, permit: Permit, latency: float, failed: bool):
+        failed = failed or permit.failed or permit.rate_limited
+        if permit.rate_limited:
+            self.stats["rate_limited"] += 1
+        elif failed:
+            self.stats["failed"] += 1
+
+        if self.tokens is not None and permit.tokens_used is not None:
+            self.tokens.adjust(permit.tokens_used - permit.estimated_tokens)
+
+        await self.concurrency.release(latency, permit.rate_limited, failed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current limiter state for metrics."""
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "request_tokens": round(self.requests.tokens, 2) if self.requests else None,
+            "token_budget": round(self.tokens.tokens) if self.tokens else None,
+            **self.stats,
+        }
+
+
+# Process-wide registry keyed by (provider, model)
+_limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+
+
+def get_limiter(provider: str, model: str) -> ProviderLimiter:
+    """Get (or create) the limiter for a provider/model pair."""
+    key = (provider, model)
+    if key not in _limiters:
+        _limiters[key] = ProviderLimiter(provider, model)
+    return _limiters[key]
+
+
+def get_limiter_stats() -> Dict[str, Any]:
+    """Snapshot of every limiter, keyed by 'provider:model'."""
+    return {
+        f"{provider}:{model}": limiter.snapshot()
+        for (provider, model), limiter in _limiters.items()
+    }
+
+
+def estimate_tokens(messages, max_tokens: int) -> int:
+    """Rough token estimate for a call: ~4 characters per prompt token plus the completion budget."""
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // 4 + max_tokens
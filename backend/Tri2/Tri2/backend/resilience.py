@@ -0,0 +1,318 @@
+"""Shared retry policy and circuit breakers for provider calls."""
+
+import asyncio
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+from .config import (
+    RETRY_MAX_RETRIES,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_BUDGET_RATIO,
+    RETRY_BUDGET_MIN_RETRIES,
+    RETRY_BUDGET_WINDOW,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+
+T = TypeVar("T")
+
+# Statuses worth retrying; anything else (bad request, auth, unknown model) fails immediately
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Non-retryable statuses that still mean the model is unusable (auth, credits, unknown model);
+# other client errors such as 400 are specific to one request and leave the breaker alone
+UNAVAILABLE_STATUSES = {401, 402, 403, 404}
+
+
+class ProviderError(Exception):
+    """
+    A failed provider call, normalized across OpenRouter and Gemini.
+
+    Without a status code the failure is taken for a network error or timeout
+    (retryable), unless `transient=False` says it is not: such errors fail at
+    once and leave the circuit breaker alone.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        transient: Optional[bool] = None
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.transient = transient
+
+    @property
+    def retryable(self) -> bool:
+        if self.transient is not None:
+            return self.transient
+        # No status means a network error or timeout
+        return self.status_code is None or self.status_code in RETRYABLE_STATUSES
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.status_code == 429
+
+    @property
+    def model_unhealthy(self) -> bool:
+        """Whether this failure should count against the model's circuit breaker."""
+        return self.retryable or self.status_code in UNAVAILABLE_STATUSES
+
+
+class CircuitOpenError(ProviderError):
+    """Raised without calling the provider while a model's circuit is open."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date).
+
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent requests so retries cannot amplify an outage.
+
+    Within a sliding window, retries are allowed while they stay below
+    max(min_retries, ratio * requests).
+    """
+
+    def __init__(self, ratio: float, min_retries: int, window: float):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self.requests = deque()
+        self.retries = deque()
+
+    def _trim(self, now: float):
+        for events in (self.requests, self.retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        self.requests.append(time.monotonic())
+
+    def try_withdraw(self) -> bool:
+        """Take one retry from the budget if any is left."""
+        now = time.monotonic()
+        self._trim(now)
+        if len(self.retries) >= max(self.min_retries, self.ratio * len(self.requests)):
+            return False
+        self.retries.append(now)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker.
+
+    After CIRCUIT_FAILURE_THRESHOLD consecutive failures the circuit opens and
+    calls fail fast for CIRCUIT_RESET_TIMEOUT seconds. Then one probe call is
+    let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, model: str):
+        self.model = model
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted right now."""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= CIRCUIT_RESET_TIMEOUT:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self):
+        self.stats["successes"] += 1
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        self.state = self.CLOSED
+
+    def abandon(self):
+        """Release a half-open probe whose call was cancelled before it finished."""
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.stats["failures"] += 1
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+            if self.state != self.OPEN:
+                self.stats["opened"] += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            **self.stats,
+        }
+
+
+class RetryState:
+    """Backoff bookkeeping for one logical call (decorrelated jitter)."""
+
+    def __init__(self, budget: RetryBudget):
+        self.budget = budget
+        self.retries = 0
+        self.last_delay = RETRY_BASE_DELAY
+
+    def next_delay(self, error: ProviderError) -> Optional[float]:
+        """
+        Decide whether to retry after `error`.
+
+        Returns:
+            Seconds to sleep before the next attempt, or None to give up
+        """
+        if not error.retryable or self.retries >= RETRY_MAX_RETRIES:
+            return None
+        # A server asking us to wait longer than we are willing to is not worth retrying
+        if error.retry_after is not None and error.retry_after > RETRY_MAX_DELAY:
+            return None
+        if not self.budget.try_withdraw():
+            return None
+
+        self.retries += 1
+        self.last_delay = min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, self.last_delay * 3))
+        if error.retry_after is not None:
+            return max(self.last_delay, error.retry_after)
+        return self.last_delay
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_budgets: Dict[str, RetryBudget] = {}
+_retry_stats = {"retries": 0, "gave_up": 0, "fast_failed": 0}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """Get (or create) the circuit breaker for a model."""
+    if model not in _breakers:
+        _breakers[model] = CircuitBreaker(model)
+    return _breakers[model]
+
+
+def get_budget(provider: str) -> RetryBudget:
+    """Get (or create) the retry budget shared by all models of a provider."""
+    if provider not in _budgets:
+        _budgets[provider] = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_RETRIES, RETRY_BUDGET_WINDOW)
+    return _budgets[provider]
+
+
+def start_call(provider: str, model: str) -> RetryState:
+    """
+    Admit a logical call through the model's circuit breaker.
+
+    Raises:
+        CircuitOpenError: if the model is currently considered down
+    """
+    if not get_breaker(model).allow():
+        _retry_stats["fast_failed"] += 1
+        raise CircuitOpenError(f"Circuit open for model {model}")
+    budget = get_budget(provider)
+    budget.record_request()
+    return RetryState(budget)
+
+
+async def backoff_or_raise(model: str, state: RetryState, error: ProviderError):
+    """
+    Record a failed attempt and sleep before the next one.
+
+    Raises:
+        ProviderError: the original error when no retry is allowed
+    """
+    delay = state.next_delay(error)
+    if delay is None:
+        _retry_stats["gave_up"] += 1
+        if error.model_unhealthy:
+            get_breaker(model).record_failure()
+        else:
+            get_breaker(model).abandon()
+        raise error
+
+    _retry_stats["retries"] += 1
+    print(f"⚠️ {model} failed ({error.status_code or 'network'}). Retrying in {delay:.1f}s... (Retry {state.retries}/{RETRY_MAX_RETRIES})")
+    await asyncio.sleep(delay)
+
+
+def record_success(model: str):
+    """Mark a logical call as successful for the model's breaker."""
+    get_breaker(model).record_success()
+
+
+def record_failure(model: str):
+    """Mark a logical call as failed for the model's breaker (no retry possible)."""
+    get_breaker(model).record_failure()
+
+
+async def call_with_retries(
+    provider: str,
+    model: str,
+    attempt: Callable[[], Awaitable[T]]
+) -> T:
+    """
+    Run `attempt` under the circuit breaker, retrying retryable ProviderErrors
+    with decorrelated jitter, Retry-After and the provider's retry budget.
+
+    Raises:
+        ProviderError: if the call ultimately failed (CircuitOpenError if never tried)
+    """
+    state = start_call(provider, model)
+    while True:
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            get_breaker(model).abandon()
+            raise
+        except ProviderError as e:
+            await backoff_or_raise(model, state, e)
+            continue
+        record_success(model)
+        return result
+
+
+def get_resilience_stats() -> Dict[str, Any]:
+    """Retry counters and breaker states for metrics."""
+    return {
+        **_retry_stats,
+        "breakers": {model: breaker.snapshot() for model, breaker in _breakers.items()},
+    }
@@ -0,0 +1,188 @@
+"""Admission control for council runs: bounded workers, a bounded priority queue, load shedding."""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Awaitable, List
+from .config import SCHEDULER_WORKERS, SCHEDULER_QUEUE_SIZE, SCHEDULER_BATCH_QUEUE_SIZE, SCHEDULER_MAX_WAIT
+
+# Priority classes; lower runs first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITIES = {"interactive": INTERACTIVE, "batch": BATCH}
+
+# Assumed council duration (seconds) until one has been measured
+INITIAL_RUN_SECONDS = 20.0
+
+
+class Overloaded(Exception):
+    """
+    A council run was refused or waited too long for a worker.
+
+    Attributes:
+        status_code: 503 when the queue is full or the wait timed out, 429 when
+            batch work is shed to keep room for interactive requests
+        retry_after: Suggested seconds before retrying
+    """
+
+    def __init__(self, status_code: int, message: str, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CouncilScheduler:
+    """
+    Runs at most `workers` councils at once; the rest wait in a priority queue.
+
+    Interactive requests are served before batch ones. When the queue holds
+    `queue_size` waiters, new requests are refused at once instead of piling
+    up; batch requests are refused earlier, once `batch_queue_size` are
+    waiting. A waiter that gets no worker within `max_wait` seconds is
+    refused too. Refusals carry a Retry-After estimated from the queue depth
+    and the average run time.
+    """
+
+    def __init__(
+        self,
+        workers: int = SCHEDULER_WORKERS,
+        queue_size: int = SCHEDULER_QUEUE_SIZE,
+        batch_queue_size: int = SCHEDULER_BATCH_QUEUE_SIZE,
+        max_wait: float = SCHEDULER_MAX_WAIT
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_queue_size = batch_queue_size
+        self.max_wait = max_wait
+        self.running = 0
+        # Heap of [priority, sequence, future]; futures of abandoned waiters are
+        # cancelled and skipped when the heap is popped
+        self.waiters: List[list] = []
+        self.queued = {INTERACTIVE: 0, BATCH: 0}
+        self.sequence = itertools.count()
+        self.avg_run_seconds = INITIAL_RUN_SECONDS
+        self.stats = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_batch_shed": 0,
+            "rejected_wait_timeout": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until a worker is likely to be free for a new request."""
+        depth = sum(self.queued.values())
+        return max(1, math.ceil(self.avg_run_seconds * (depth // self.workers + 1)))
+
+    def _reject(self, status_code: int, reason: str, message: str):
+        self.stats[f"rejected_{reason}"] += 1
+        raise Overloaded(status_code, message, self.retry_after())
+
+    async def acquire(self, priority: int = INTERACTIVE) -> float:
+        """
+        Wait for a worker.
+
+        Returns:
+            The run's start time, to pass to release()
+
+        Raises:
+            Overloaded: if the request is refused or waits longer than max_wait
+        """
+        enqueued = time.monotonic()
+        if self.running < self.workers and not any(self.queued.values()):
+            self.running += 1
+            return self._admitted(enqueued)
+
+        depth = sum(self.queued.values())
+        if depth >= self.queue_size:
+            self._reject(503, "queue_full", "Council queue is full, try again later")
+        if priority == BATCH and depth >= self.batch_queue_size:
+            self._reject(429, "batch_shed", "Batch council runs are being shed, try again later")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, [priority, next(self.sequence), future])
+        self.queued[priority] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted just as we gave up: pass the worker on
+                self._hand_off()
+            else:
+                future.cancel()
+                self.queued[priority] -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject(503, "wait_timeout", "Timed out waiting for a council worker, try again later")
+            raise
+        return self._admitted(enqueued)
+
+    def _admitted(self, enqueued: float) -> float:
+        started = time.monotonic()
+        wait = started - enqueued
+        self.stats["admitted"] += 1
+        self.stats["total_wait_seconds"] += wait
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], wait)
+        return started
+
+    def release(self, started: float, completed: bool = True):
+        """
+        Free the worker of a run that started at `started`, handing it to the next waiter.
+
+        Pass completed=False when the run never happened (e.g. the request was
+        invalid), so it does not count towards the average run time.
+        """
+        if completed:
+            self.avg_run_seconds = 0.8 * self.avg_run_seconds + 0.2 * (time.monotonic() - started)
+        self._hand_off()
+
+    def _hand_off(self):
+        while self.waiters:
+            priority, _, future = heapq.heappop(self.waiters)
+            if future.done():
+                continue
+            self.queued[priority] -= 1
+            future.set_result(None)
+            return
+        self.running -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE):
+        """Hold a worker for the duration of the block."""
+        started = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    async def run_in_slot(self, started: float, run: Awaitable[Any]) -> Any:
+        """Await `run` on an already acquired worker, releasing it afterwards."""
+        try:
+            return await run
+        finally:
+            self.release(started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        admitted = self.stats["admitted"]
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queue_size": self.queue_size,
+            "queued_interactive": self.queued[INTERACTIVE],
+            "queued_batch": self.queued[BATCH],
+            "avg_run_seconds": round(self.avg_run_seconds, 3),
+            "avg_wait_seconds": round(self.stats["total_wait_seconds"] / admitted, 4) if admitted else 0.0,
+            "retry_after": self.retry_after(),
+            **{key: (round(value, 4) if isinstance(value, float) else value) for key, value in self.stats.items()},
+        }
+
+
+scheduler = CouncilScheduler()
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    """Queue depth, wait times and rejections for metrics."""
+    return scheduler.snapshot()
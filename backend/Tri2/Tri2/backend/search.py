@@ -0,0 +1,260 @@
+"""Full-text search over conversation history (SQLite FTS5)."""
+
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from .config import SEARCH_DB_PATH
+from .storage import StorageBackend
+from .blobstore import resolve_blobs
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    body,
+    conversation_id UNINDEXED,
+    kind UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+"""
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query matching all of its words.
+
+    Each word is quoted so user input can never be parsed as FTS5 syntax; the
+    last word also matches as a prefix, for search-as-you-type.
+
+    Returns:
+        The MATCH expression, or None if the query has no words
+    """
+    words = _TOKEN_RE.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    Inverted index of user questions and final (stage 3) answers.
+
+    Lives in its own SQLite database so it works with every storage backend.
+    Rows are ranked with bm25 and returned with highlighted snippets.
+    """
+
+    def __init__(self, path: str = SEARCH_DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.is_new = not os.path.exists(path)
+        self._connect().executescript(SCHEMA)
+        self.stats = {"indexed": 0, "queries": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def add(self, conversation_id: str, entries: List[Tuple[str, str]]):
+        """
+        Index texts of one conversation.
+
+        Args:
+            conversation_id: Conversation identifier
+            entries: (kind, text) pairs, kind being 'question' or 'answer'
+        """
+        entries = [(kind, text) for kind, text in entries if isinstance(text, str) and text.strip()]
+        if not entries:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO search_index (body, conversation_id, kind) VALUES (?, ?, ?)",
+                [(text, conversation_id, kind) for kind, text in entries],
+            )
+        self.stats["indexed"] += len(entries)
+
+    def remove(self, conversation_id: str):
+        """Drop every indexed text of a conversation."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM search_index WHERE conversation_id = ?", (conversation_id,))
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Find messages matching all words of `query`, best matches first.
+
+        Returns:
+            Tuple of (hits with conversation_id, kind, snippet and score, whether more hits exist)
+        """
+        self.stats["queries"] += 1
+        match = build_match_query(query)
+        if match is None:
+            return [], False
+
+        rows = self._connect().execute(
+            "SELECT conversation_id, kind, "
+            "snippet(search_index, 0, '<mark>', '</mark>', '…', 16) AS snippet, "
+            "bm25(search_index) AS score "
+            "FROM search_index WHERE search_index MATCH ? "
+            "ORDER BY score LIMIT ? OFFSET ?",
+            (match, limit + 1, offset),
+        ).fetchall()
+
+        hits = [
+            {
+                "conversation_id": row["conversation_id"],
+                "kind": row["kind"],
+                "snippet": row["snippet"],
+                # bm25 is lower-is-better; flip it so higher means more relevant
+                "score": round(-row["score"], 4),
+            }
+            for row in rows[:limit]
+        ]
+        return hits, len(rows) > limit
+
+    def rebuild(self, backend: StorageBackend) -> int:
+        """
+        Re-index every conversation in a storage backend.
+
+        Returns:
+            Number of conversations indexed
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM search_index")
+        count = 0
+        for metadata in backend.list_conversations():
+            self.add(metadata["id"], list(message_texts(backend.iter_messages(metadata["id"]))))
+            count += 1
+        return count
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+def message_texts(messages: Iterator[Dict[str, Any]]) -> Iterator[Tuple[str, str]]:
+    """The searchable (kind, text) pairs of a sequence of messages."""
+    for message in messages:
+        if message.get("role") == "user":
+            yield "question", message.get("content")
+        elif message.get("role") == "assistant":
+            stage3 = message.get("stage3") or {}
+            # Stored answers may be blob references
+            yield "answer", resolve_blobs(stage3.get("response"))
+
+
+class SearchIndexedStorage(StorageBackend):
+    """
+    Keeps a SearchIndex current as messages are written to another backend.
+
+    Must sit above BlobStorage, so it sees the full stage 3 texts.
+    """
+
+    def __init__(self, inner: StorageBackend, index: SearchIndex):
+        self.inner = inner
+        self.index = index
+
+    def create_conversation(self, conversation_id: str) -> Dict[str, Any]:
+        return self.inner.create_conversation(conversation_id)
+
+    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return self.inner.get_conversation(conversation_id)
+
+    def save_conversation(self, conversation: Dict[str, Any]):
+        self.inner.save_conversation(conversation)
+        self.index.remove(conversation["id"])
+        self.index.add(conversation["id"], list(message_texts(iter(conversation["messages"]))))
+
+    def list_conversations(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.inner.list_conversations(limit, before)
+
+    def iter_messages(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        return self.inner.iter_messages(conversation_id)
+
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return self.inner.get_metadata(conversation_id)
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        start: int,
+        stop: int,
+        stages: Tuple[int, ...] = (1, 2, 3)
+    ) -> List[Dict[str, Any]]:
+        return self.inner.get_messages(conversation_id, start, stop, stages)
+
+    def apply_writes(
+        self,
+        conversation_id: str,
+        writes: List[Tuple[str, tuple]],
+        updated: Optional[Dict[str, Any]] = None,
+        expected_version: Optional[int] = None
+    ):
+        self.inner.apply_writes(conversation_id, writes, updated, expected_version)
+
+        entries = []
+        for method, args in writes:
+            if method == "add_user_message":
+                entries.append(("question", args[0]))
+            elif method == "add_assistant_message":
+                entries.extend(message_texts(iter([{"role": "assistant", "stage3": args[2]}])))
+        try:
+            self.index.add(conversation_id, entries)
+        except sqlite3.Error as e:
+            # The write itself succeeded; a stale index only affects search
+            print(f"WARNING: Could not index conversation {conversation_id}: {e}")
+
+    def add_user_message(self, conversation_id: str, content: str):
+        self.apply_writes(conversation_id, [("add_user_message", (content,))])
+
+    def add_assistant_message(
+        self,
+        conversation_id: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any]
+    ):
+        self.apply_writes(conversation_id, [("add_assistant_message", (stage1, stage2, stage3))])
+
+    def update_conversation_title(self, conversation_id: str, title: str):
+        self.apply_writes(conversation_id, [("update_conversation_title", (title,))])
+
+
+_index: Optional[SearchIndex] = None
+_index_unavailable = False
+
+
+def get_search_index() -> Optional[SearchIndex]:
+    """Get (or open) the search index, or None if this SQLite build lacks FTS5."""
+    global _index, _index_unavailable
+    if _index is None and not _index_unavailable:
+        try:
+            _index = SearchIndex()
+        except sqlite3.OperationalError as e:
+            print(f"WARNING: Full-text search disabled: {e}")
+            _index_unavailable = True
+    return _index
+
+
+def get_search_stats() -> Optional[Dict[str, Any]]:
+    """Search counters for metrics, or None when search is unavailable."""
+    return _index.snapshot() if _index is not None else None
+
+
+if __name__ == "__main__":
+    # Usage: python -m backend.search  (rebuilds the index from the configured storage)
+    from .storage import get_backend
+    count = SearchIndex().rebuild(get_backend())
+    print(f"Indexed {count} conversations into {SEARCH_DB_PATH}")
@@ -0,0 +1,319 @@
+"""Semantic answer cache: reuse council results for near-duplicate questions."""
+
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from .config import (
+    COUNCIL_MODELS,
+    CHAIRMAN_MODEL,
+    STAGE1_QUORUM,
+    STAGE1_QUORUM_TIMEOUT,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_CAPACITY,
+    SEMANTIC_CACHE_DIM,
+    SEMANTIC_CACHE_PATH,
+    SEMANTIC_CACHE_SNAPSHOT_EVERY,
+)
+
+# Function words only: content words, even generic ones such as "explain",
+# tell questions apart and must count towards their similarity
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "to", "in", "on", "for",
+    "and", "or", "with", "about", "what", "whats", "which", "how", "why", "when", "who",
+    "do", "does", "can", "could", "would", "should", "i", "me", "my", "you", "your",
+    "it", "its", "this", "that", "s",
+}
+
+# Bump when tokenization changes, so vectors in older snapshots are not reused
+TOKENIZER_VERSION = 2
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def _tokens(text: str) -> List[str]:
+    """Lowercased content words with a crude plural strip, plus adjacent bigrams."""
+    words = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _bucket(token: str, dim: int) -> Tuple[int, float]:
+    """Hash a token to a column and a sign (signed hashing reduces collision bias)."""
+    digest = hashlib.md5(token.encode("utf-8")).digest()
+    value = int.from_bytes(digest[:8], "little")
+    return value % dim, (1.0 if digest[8] & 1 else -1.0)
+
+
+def vectorize(text: str, dim: int) -> np.ndarray:
+    """
+    Hashed term-frequency vector with sublinear scaling (1 + log tf).
+
+    IDF weighting is applied at query time so stored vectors stay valid as the
+    corpus grows.
+    """
+    counts: Dict[int, float] = {}
+    signs: Dict[int, float] = {}
+    for token in _tokens(text):
+        column, sign = _bucket(token, dim)
+        counts[column] = counts.get(column, 0.0) + 1.0
+        signs[column] = sign
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for column, count in counts.items():
+        vector[column] = signs[column] * (1.0 + np.log(count))
+    return vector
+
+
+def config_fingerprint() -> str:
+    """
+    Identity of what produced the cached answers: the council configuration
+    (as in council_run_key) and the tokenizer.
+
+    Snapshot entries with another fingerprint are ignored on load, so a
+    changed council never serves answers of the previous one.
+    """
+    canonical = json.dumps({
+        "council_models": COUNCIL_MODELS,
+        "chairman_model": CHAIRMAN_MODEL,
+        "stage1_quorum": [STAGE1_QUORUM, STAGE1_QUORUM_TIMEOUT],
+        "tokenizer": TOKENIZER_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticCache:
+    """
+    Bounded in-memory index of past questions and their council results.
+
+    Rows of `matrix` are hashed TF vectors; lookups weight them by IDF from the
+    per-column document frequencies and return the best cosine match above the
+    threshold. When full, the least recently used row is overwritten. Entries
+    are stamped with the configuration fingerprint they were produced under.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        dim: int,
+        threshold: float,
+        path: Optional[str] = None,
+        fingerprint: Optional[str] = None
+    ):
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.path = Path(path) if path else None
+        self.fingerprint = fingerprint or config_fingerprint()
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.doc_freq = np.zeros(dim, dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.rows_by_question: Dict[str, int] = {}
+        self.size = 0
+        self.inserts_since_snapshot = 0
+        # Snapshot being written by a worker thread, if any
+        self.saving: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        return " ".join(question.split()).casefold()
+
+    def _idf(self) -> np.ndarray:
+        return np.log((self.size + 1.0) / (self.doc_freq + 1.0)) + 1.0
+
+    def lookup(self, question: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Find a stored result for a semantically similar question.
+
+        Returns:
+            Tuple of (entry dict with 'question' and 'result', similarity), or None
+        """
+        if self.size == 0:
+            self.stats["misses"] += 1
+            return None
+
+        idf = self._idf()
+        query = vectorize(question, self.dim) * idf
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            self.stats["misses"] += 1
+            return None
+
+        weighted = self.matrix[:self.size] * idf
+        norms = np.linalg.norm(weighted, axis=1)
+        norms[norms == 0] = np.inf
+        similarities = (weighted @ query) / (norms * query_norm)
+
+        row = int(np.argmax(similarities))
+        similarity = float(similarities[row])
+        if similarity < self.threshold:
+            self.stats["misses"] += 1
+            return None
+
+        self.last_used[row] = time.time()
+        self.stats["hits"] += 1
+        return copy.deepcopy(self.entries[row]), similarity
+
+    def store(self, question: str, result: Any):
+        """Index a question and its council result, evicting the LRU row when full."""
+        normalized = self._normalize(question)
+        vector = vectorize(question, self.dim)
+
+        row = self.rows_by_question.get(normalized)
+        if row is None:
+            if self.size < self.capacity:
+                row = self.size
+                self.size += 1
+            else:
+                row = int(np.argmin(self.last_used))
+                self._remove(row)
+                self.stats["evictions"] += 1
+        else:
+            self._remove(row)
+
+        self.matrix[row] = vector
+        self.doc_freq += (vector != 0)
+        self.last_used[row] = time.time()
+        self.entries[row] = {
+            "question": question,
+            "result": copy.deepcopy(result),
+            "created_at": time.time(),
+            "fingerprint": self.fingerprint,
+        }
+        self.rows_by_question[normalized] = row
+        self.stats["stores"] += 1
+
+        self.inserts_since_snapshot += 1
+        if SEMANTIC_CACHE_SNAPSHOT_EVERY and self.inserts_since_snapshot >= SEMANTIC_CACHE_SNAPSHOT_EVERY:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                self.save()
+            else:
+                self.save_in_background()
+
+    def _remove(self, row: int):
+        self.doc_freq -= (self.matrix[row] != 0)
+        entry = self.entries[row]
+        if entry is not None:
+            self.rows_by_question.pop(self._normalize(entry["question"]), None)
+        self.entries[row] = None
+
+    def _capture(self) -> Tuple[np.ndarray, np.ndarray, List[Optional[Dict[str, Any]]]]:
+        """Copy what a snapshot needs, so it can be written while the index keeps changing."""
+        self.inserts_since_snapshot = 0
+        # Entries are replaced, never modified, so a shallow copy is enough
+        return self.matrix[:self.size].copy(), self.last_used[:self.size].copy(), self.entries[:self.size]
+
+    def _write(self, matrix: np.ndarray, last_used: np.ndarray, entries: List[Optional[Dict[str, Any]]]):
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(self.path / "index.tmp.npz", matrix=matrix, last_used=last_used)
+            with open(self.path / "entries.tmp.json", 'w') as f:
+                json.dump({"dim": self.dim, "entries": entries}, f)
+            os.replace(self.path / "index.tmp.npz", self.path / "index.npz")
+            os.replace(self.path / "entries.tmp.json", self.path / "entries.json")
+        except OSError as e:
+            print(f"WARNING: Could not write semantic cache snapshot: {e}")
+
+    def save(self):
+        """Write an index snapshot (matrix as .npz, entries as JSON)."""
+        if self.path is None:
+            return
+        self._write(*self._capture())
+
+    def save_in_background(self):
+        """Write a snapshot from a worker thread, unless one is already being written."""
+        if self.path is None or (self.saving is not None and not self.saving.done()):
+            return
+        self.saving = asyncio.create_task(asyncio.to_thread(self._write, *self._capture()))
+
+    async def flush(self):
+        """Wait for any snapshot in progress, then write a final one off the event loop."""
+        if self.saving is not None:
+            await self.saving
+        if self.path is not None:
+            await asyncio.to_thread(self._write, *self._capture())
+
+    def load(self):
+        """
+        Restore the index from its snapshot, if one exists and matches the current
+        dimensions, keeping only the entries produced under the current fingerprint.
+        """
+        if self.path is None or not (self.path / "index.npz").exists():
+            return
+        try:
+            with open(self.path / "entries.json", 'r') as f:
+                saved = json.load(f)
+            arrays = np.load(self.path / "index.npz")
+            matrix = arrays["matrix"]
+            last_used = arrays["last_used"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"WARNING: Could not load semantic cache snapshot: {e}")
+            return
+
+        if saved.get("dim") != self.dim or matrix.shape[1] != self.dim:
+            print("WARNING: Semantic cache snapshot has different dimensions, ignoring it")
+            return
+
+        # Keep the most recently used rows if the snapshot is larger than the capacity
+        keep = np.argsort(-last_used)[:self.capacity]
+        self.size = 0
+        self.rows_by_question = {}
+        self.doc_freq[:] = 0
+        stale = 0
+        for source in keep:
+            entry = saved["entries"][int(source)]
+            if entry is None:
+                continue
+            if entry.get("fingerprint") != self.fingerprint:
+                stale += 1
+                continue
+            row = self.size
+            self.matrix[row] = matrix[source]
+            self.last_used[row] = last_used[source]
+            self.entries[row] = entry
+            self.doc_freq += (matrix[source] != 0)
+            self.rows_by_question[self._normalize(entry["question"])] = row
+            self.size += 1
+        if stale:
+            print(f"DEBUG: Ignored {stale} semantic cache entries from another council configuration")
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "enabled": SEMANTIC_CACHE_ENABLED,
+            "entries": self.size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "index_bytes": int(self.matrix.nbytes),
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+semantic_cache = SemanticCache(
+    SEMANTIC_CACHE_CAPACITY,
+    SEMANTIC_CACHE_DIM,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_PATH,
+)
+
+
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and index size for metrics."""
+    return semantic_cache.snapshot()
@@ -0,0 +1,128 @@
+"""WebSocket council sessions: bounded per-connection send queues and connection accounting."""
+
+import asyncio
+from typing import Dict, Any, Awaitable, Optional, Set
+from fastapi import WebSocket
+from .config import WS_SEND_QUEUE_SIZE, WS_MAX_CONNECTIONS
+
+# Token deltas can be dropped under backpressure: the matching *_complete
+# event carries the full text
+DELTA_EVENTS = ("stage1_delta", "stage3_delta")
+
+_sessions: Set["Session"] = set()
+
+_stats = {
+    "opened": 0,
+    "rejected": 0,
+    "messages_received": 0,
+    "events_sent": 0,
+    "deltas_dropped": 0,
+    "events_dropped": 0,
+    "runs_started": 0,
+    "runs_cancelled": 0,
+}
+
+
+class Session:
+    """
+    One WebSocket connection and the council runs it started.
+
+    Events go through a bounded outbox drained by a single sender task, so a
+    slow client never makes the server buffer without limit: when the outbox
+    is full, deltas are dropped and other events wait for room, which slows
+    down that connection's runs only. Once the connection is closing nothing
+    waits any more: events that do not fit are dropped.
+    """
+
+    def __init__(self, websocket: WebSocket, queue_size: int = WS_SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.runs: Dict[str, asyncio.Task] = {}
+        self.closed = False
+
+    async def send(self, event: Dict[str, Any]):
+        """Queue an event for the client."""
+        if self.closed or event.get("type") in DELTA_EVENTS:
+            self.offer(event)
+            return
+        await self.outbox.put(event)
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """
+        Queue an event without waiting, e.g. from a run that is being cancelled.
+
+        Returns:
+            False if the outbox was full and the event was dropped
+        """
+        try:
+            self.outbox.put_nowait(event)
+        except asyncio.QueueFull:
+            _stats["deltas_dropped" if event.get("type") in DELTA_EVENTS else "events_dropped"] += 1
+            return False
+        return True
+
+    async def pump(self):
+        """Send queued events until the connection closes."""
+        while True:
+            event = await self.outbox.get()
+            await self.websocket.send_json(event)
+            _stats["events_sent"] += 1
+
+    def start_run(self, run_id: str, run: Awaitable[None]):
+        """Run a council in the background under a run id the client can cancel."""
+        task = asyncio.create_task(run)
+        self.runs[run_id] = task
+        task.add_done_callback(lambda _: self.runs.pop(run_id, None))
+        _stats["runs_started"] += 1
+
+    def cancel_run(self, run_id: str) -> bool:
+        """Cancel a run; False if it is not running."""
+        task = self.runs.get(run_id)
+        if task is None:
+            return False
+        task.cancel()
+        _stats["runs_cancelled"] += 1
+        return True
+
+    def close(self):
+        """Cancel every run of the connection."""
+        self.closed = True
+        for task in list(self.runs.values()):
+            task.cancel()
+
+
+def open_session(websocket: WebSocket) -> Optional[Session]:
+    """
+    Register a new connection.
+
+    Returns:
+        The session, or None if WS_MAX_CONNECTIONS are already open
+    """
+    if len(_sessions) >= WS_MAX_CONNECTIONS:
+        _stats["rejected"] += 1
+        return None
+    session = Session(websocket)
+    _sessions.add(session)
+    _stats["opened"] += 1
+    return session
+
+
+def close_session(session: Session):
+    """Unregister a connection and cancel its runs."""
+    session.close()
+    _sessions.discard(session)
+
+
+def message_received():
+    _stats["messages_received"] += 1
+
+
+def get_session_stats() -> Dict[str, Any]:
+    """WebSocket connection counters for metrics."""
+    return {
+        "open": len(_sessions),
+        "max_connections": WS_MAX_CONNECTIONS,
+        "active_runs": sum(len(session.runs) for session in _sessions),
+        "queued_events": sum(session.outbox.qsize() for session in _sessions),
+        **_stats,
+    }
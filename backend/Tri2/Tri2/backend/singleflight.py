@@ -0,0 +1,73 @@
+"""Single-flight coalescing of identical in-flight work."""
+
+import asyncio
+import copy
+from typing import Dict, Any, Callable, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time; concurrent callers with the same
+    key wait for that call and each receive their own copy of its result.
+
+    The shared call keeps running as long as at least one caller is waiting,
+    and is cancelled when the last waiter goes away.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: Dict[str, asyncio.Task] = {}
+        self.waiters: Dict[asyncio.Task, int] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn` for `key`, or join the call already in flight for it.
+
+        Args:
+            key: Identity of the work; equal keys must produce equal results
+            fn: Zero-argument coroutine function doing the work
+
+        Returns:
+            A deep copy of the result, so callers may mutate it freely
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.stats["calls"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        self.waiters[task] = self.waiters.get(task, 0) + 1
+        try:
+            # Shield so one caller's cancellation does not cancel the others' result
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._leave(task) == 0 and not task.done():
+                task.cancel()
+            raise
+        except BaseException:
+            self._leave(task)
+            raise
+        self._leave(task)
+        return copy.deepcopy(result)
+
+    def _leave(self, task: asyncio.Task) -> int:
+        """Drop one waiter from `task` and return how many remain."""
+        remaining = self.waiters[task] - 1
+        if remaining:
+            self.waiters[task] = remaining
+        else:
+            del self.waiters[task]
+        return remaining
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"in_flight": len(self.calls), **self.stats}
@@ -1,110 +1,934 @@
-"""JSON-based storage for conversations."""
+"""Conversation storage behind a pluggable backend (SQLite or JSON files)."""
 
+import bisect
+import copy
 import json
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
 from pathlib import Path
-from .config import DATA_DIR
+from .config import (
+    DATA_DIR,
+    JSONL_DATA_DIR,
+    STORAGE_BACKEND,
+    STORAGE_CACHE_MAX_BYTES,
+    STORAGE_CACHE_MAX_ENTRIES,
+    BLOB_STORE_ENABLED,
+    BLOB_MIN_BYTES,
+    SEARCH_ENABLED,
+)
+from .blobstore import BLOB_REF, blob_store, resolve_blobs
 
 
-def ensure_data_dir():
-    """Ensure the data directory exists."""
-    Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
+class ConflictError(Exception):
+    """A compare-and-swap write found the conversation at a different version."""
 
+    def __init__(self, conversation_id: str, expected: int, actual: int):
+        super().__init__(
+            f"Conversation {conversation_id} is at version {actual}, expected {expected}"
+        )
+        self.conversation_id = conversation_id
+        self.expected = expected
+        self.actual = actual
 
-def get_conversation_path(conversation_id: str) -> str:
-    """Get the file path for a conversation."""
-    return os.path.join(DATA_DIR, f"{conversation_id}.json")
 
+class StorageBackend:
+    """
+    Interface implemented by every conversation store.
 
-def create_conversation(conversation_id: str) -> Dict[str, Any]:
+    Conversations carry a 'version' that every write increments by one, so
+    writers can detect concurrent changes (see apply_writes).
     """
-    Create a new conversation.
 
-    Args:
-        conversation_id: Unique identifier for the conversation
+    def create_conversation(self, conversation_id: str) -> Dict[str, Any]:
+        raise NotImplementedError
 
-    Returns:
-        New conversation dict
-    """
-    ensure_data_dir()
+    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_conversation(self, conversation: Dict[str, Any]):
+        raise NotImplementedError
+
+    def list_conversations(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def add_user_message(self, conversation_id: str, content: str):
+        raise NotImplementedError
+
+    def add_assistant_message(
+        self,
+        conversation_id: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any]
+    ):
+        raise NotImplementedError
+
+    def update_conversation_title(self, conversation_id: str, title: str):
+        raise NotImplementedError
 
-    conversation = {
+    def iter_messages(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        conversation = self.get_conversation(conversation_id)
+        if conversation is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+        yield from conversation["messages"]
+
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """List-view fields of one conversation, or None if it does not exist."""
+        conversation = self.get_conversation(conversation_id)
+        return conversation_metadata(conversation) if conversation is not None else None
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        start: int,
+        stop: int,
+        stages: Tuple[int, ...] = (1, 2, 3)
+    ) -> List[Dict[str, Any]]:
+        """
+        Messages [start, stop) of a conversation, in chronological order.
+
+        `stages` is a hint: backends that can skip loading other stages do so,
+        others may return them anyway.
+        """
+        return [
+            message for index, message in enumerate(self.iter_messages(conversation_id))
+            if start <= index < stop
+        ]
+
+    def apply_writes(
+        self,
+        conversation_id: str,
+        writes: List[Tuple[str, tuple]],
+        updated: Optional[Dict[str, Any]] = None,
+        expected_version: Optional[int] = None
+    ):
+        """
+        Apply a batch of queued writes to one conversation, in order.
+
+        Args:
+            conversation_id: Conversation identifier
+            writes: (method name, positional args) pairs, e.g.
+                ("add_user_message", (content,)); backends may combine them
+            updated: The conversation with `writes` already applied, when the
+                caller has it (and has checked expected_version); backends that
+                rewrite whole conversations use it instead of reloading
+            expected_version: Only apply the batch if the conversation is
+                currently at this version (compare-and-swap)
+
+        Raises:
+            ValueError: if the conversation does not exist
+            ConflictError: if expected_version does not match
+        """
+        if expected_version is not None and updated is None:
+            current = self.get_conversation(conversation_id)
+            if current is None:
+                raise ValueError(f"Conversation {conversation_id} not found")
+            check_version(current, expected_version)
+        for method, args in writes:
+            getattr(self, method)(conversation_id, *args)
+
+
+def new_conversation(conversation_id: str) -> Dict[str, Any]:
+    """Build the dict for a new, empty conversation."""
+    return {
         "id": conversation_id,
         "created_at": datetime.utcnow().isoformat(),
         "title": "New Conversation",
-        "messages": []
+        "messages": [],
+        "version": 0
     }
 
-    # Save to file
-    path = get_conversation_path(conversation_id)
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
 
-    return conversation
+def check_version(conversation: Dict[str, Any], expected_version: Optional[int]):
+    """
+    Raises:
+        ConflictError: if expected_version is set and differs from the conversation's version
+    """
+    actual = conversation.get("version", 0)
+    if expected_version is not None and actual != expected_version:
+        raise ConflictError(conversation["id"], expected_version, actual)
+
+
+def apply_write(conversation: Dict[str, Any], method: str, args: tuple):
+    """Apply one storage write (see StorageBackend.apply_writes) to a conversation dict."""
+    conversation["version"] = conversation.get("version", 0) + 1
+    if method == "add_user_message":
+        conversation["messages"].append({
+            "role": "user",
+            "content": args[0]
+        })
+    elif method == "add_assistant_message":
+        stage1, stage2, stage3 = args
+        conversation["messages"].append({
+            "role": "assistant",
+            "stage1": stage1,
+            "stage2": stage2,
+            "stage3": stage3
+        })
+    elif method == "update_conversation_title":
+        conversation["title"] = args[0]
+    else:
+        raise ValueError(f"Unknown storage write: {method}")
 
 
-def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
+def append_line(path: str, line: str, durable: bool = False):
     """
-    Load a conversation from storage.
+    Append one newline-terminated line to a log file.
+
+    A torn tail left by a crash mid-write is truncated first, so the new line
+    never gets glued onto a partial record.
+
+    Args:
+        path: Log file path
+        line: Line to append, without the trailing newline
+        durable: fsync before returning
+    """
+    with open(path, 'ab+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                f.seek(0)
+                f.truncate(f.read().rfind(b"\n") + 1)
+        f.write(line.encode("utf-8") + b"\n")
+        f.flush()
+        if durable:
+            os.fsync(f.fileno())
+
+
+def read_lines(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the JSON records of a log file, skipping a torn final line."""
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def conversation_metadata(conversation: Dict[str, Any]) -> Dict[str, Any]:
+    """The list-view fields of a conversation."""
+    return {
+        "id": conversation["id"],
+        "created_at": conversation["created_at"],
+        "title": conversation.get("title", "New Conversation"),
+        "message_count": len(conversation["messages"])
+    }
+
+
+class JSONStorage(StorageBackend):
+    """
+    One JSON file per conversation, rewritten on every change.
+
+    Listing is served from a metadata index (INDEX_FILENAME in the data
+    directory): an append-only log of metadata records written on every save,
+    where the last record for an id wins. It is rebuilt from the conversation
+    files when missing; delete it to resync after editing files by hand.
+    """
+
+    INDEX_FILENAME = ".index.jsonl"
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self.index: Optional[Dict[str, Dict[str, Any]]] = None
+        # (created_at, id) pairs in ascending order, for cursor pagination
+        self.order: List[tuple] = []
+        self.index_records = 0
+        # The index is shared by all conversations, which are written from a thread pool
+        self.index_lock = threading.RLock()
+
+    def ensure_data_dir(self):
+        """Ensure the data directory exists."""
+        Path(self.data_dir).mkdir(parents=True, exist_ok=True)
+
+    def get_conversation_path(self, conversation_id: str) -> str:
+        """Get the file path for a conversation."""
+        return os.path.join(self.data_dir, f"{conversation_id}.json")
+
+    def create_conversation(self, conversation_id: str) -> Dict[str, Any]:
+        conversation = new_conversation(conversation_id)
+        self.save_conversation(conversation)
+        return conversation
+
+    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        path = self.get_conversation_path(conversation_id)
+
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def save_conversation(self, conversation: Dict[str, Any]):
+        self.ensure_data_dir()
+
+        path = self.get_conversation_path(conversation['id'])
+        with open(path, 'w') as f:
+            json.dump(conversation, f, indent=2)
+
+        self._index_update(conversation_metadata(conversation))
+
+    def _index_path(self) -> str:
+        return os.path.join(self.data_dir, self.INDEX_FILENAME)
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        with self.index_lock:
+            if self.index is not None:
+                return self.index
+
+            self.ensure_data_dir()
+            index: Dict[str, Dict[str, Any]] = {}
+            path = self._index_path()
+            if os.path.exists(path):
+                records = 0
+                for record in read_lines(path):
+                    index[record["id"]] = record
+                    records += 1
+                self.index_records = records
+            else:
+                # First run: scan the conversation files once, then keep the index current
+                for metadata in self._scan_metadata():
+                    index[metadata["id"]] = metadata
+
+            self.index = index
+            self.order = sorted((meta["created_at"], meta["id"]) for meta in index.values())
+            if not os.path.exists(path):
+                self._compact_index()
+            return index
+
+    def _scan_metadata(self) -> Iterator[Dict[str, Any]]:
+        for filename in os.listdir(self.data_dir):
+            if filename.endswith('.json'):
+                with open(os.path.join(self.data_dir, filename), 'r') as f:
+                    yield conversation_metadata(json.load(f))
+
+    def _index_update(self, metadata: Dict[str, Any]):
+        with self.index_lock:
+            index = self._load_index()
+            previous = index.get(metadata["id"])
+            if previous == metadata:
+                return
+            if previous is None:
+                bisect.insort(self.order, (metadata["created_at"], metadata["id"]))
+            index[metadata["id"]] = metadata
+
+            append_line(self._index_path(), json.dumps(metadata))
+            self.index_records += 1
+
+            # Rewrite once superseded records dominate the log
+            if self.index_records > 2 * len(index) + 100:
+                self._compact_index()
+
+    def _compact_index(self):
+        path = self._index_path()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for _, conversation_id in self.order:
+                f.write(json.dumps(self.index[conversation_id]) + "\n")
+        os.replace(tmp_path, path)
+        self.index_records = len(self.order)
+
+    def list_conversations(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self.index_lock:
+            index = self._load_index()
+
+            end = len(self.order)
+            if before is not None:
+                if before not in index:
+                    raise ValueError(f"Conversation {before} not found")
+                end = bisect.bisect_left(self.order, (index[before]["created_at"], before))
+            start = 0 if limit is None else max(0, end - limit)
+
+            # Newest first
+            return [dict(index[conversation_id]) for _, conversation_id in reversed(self.order[start:end])]
+
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self.index_lock:
+            metadata = self._load_index().get(conversation_id)
+            return dict(metadata) if metadata is not None else None
+
+    def apply_writes(
+        self,
+        conversation_id: str,
+        writes: List[Tuple[str, tuple]],
+        updated: Optional[Dict[str, Any]] = None,
+        expected_version: Optional[int] = None
+    ):
+        if updated is None:
+            # Load and rewrite the file once for the whole batch
+            updated = self.get_conversation(conversation_id)
+            if updated is None:
+                raise ValueError(f"Conversation {conversation_id} not found")
+            check_version(updated, expected_version)
+            for method, args in writes:
+                apply_write(updated, method, args)
+
+        self.save_conversation(updated)
+
+    def add_user_message(self, conversation_id: str, content: str):
+        self.apply_writes(conversation_id, [("add_user_message", (content,))])
+
+    def add_assistant_message(
+        self,
+        conversation_id: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any]
+    ):
+        self.apply_writes(conversation_id, [("add_assistant_message", (stage1, stage2, stage3))])
+
+    def update_conversation_title(self, conversation_id: str, title: str):
+        self.apply_writes(conversation_id, [("update_conversation_title", (title,))])
+
+
+def _one_more_message(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {"message_count": metadata["message_count"] + 1}
+
+
+class JSONLStorage(JSONStorage):
+    """
+    One append-only log per conversation.
+
+    Each <id>.jsonl file holds a header record (id, created_at, title, version)
+    followed by one record per message or title change, so a turn costs one
+    appended line instead of a rewrite of the whole history. Every record after
+    the header is one write, so it also bumps the version. Appends are fsynced and a
+    torn final line is ignored on read. Title records supersede earlier ones;
+    once they make up COMPACT_DEAD_RATIO of the log's lines, the title write
+    that pushed it over compacts the file.
+
+    Appends, the index updates that go with them and compaction rewrites of a
+    conversation all hold its log lock, so none of them sees or leaves a
+    stale state for the others.
+    """
+
+    COMPACT_MIN_SUPERSEDED = 4
+    COMPACT_DEAD_RATIO = 0.25
+    LOCK_STRIPES = 64
+
+    def __init__(self, data_dir: str = JSONL_DATA_DIR):
+        super().__init__(data_dir)
+        self.log_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def _log_lock(self, conversation_id: str) -> threading.Lock:
+        """The lock serializing writes to one conversation's log (shared by a stripe of conversations)."""
+        return self.log_locks[hash(conversation_id) % len(self.log_locks)]
+
+    def get_conversation_path(self, conversation_id: str) -> str:
+        return os.path.join(self.data_dir, f"{conversation_id}.jsonl")
+
+    def _read(self, path: str) -> tuple:
+        """Replay a log into (conversation dict, number of superseded records)."""
+        conversation = None
+        superseded = 0
+        for record in read_lines(path):
+            kind = record.get("type")
+            if kind == "header":
+                conversation = {
+                    "id": record["id"],
+                    "created_at": record["created_at"],
+                    "title": record["title"],
+                    "messages": [],
+                    "version": record.get("version", 0)
+                }
+            elif kind == "message":
+                conversation["messages"].append(record["message"])
+                conversation["version"] += 1
+            elif kind == "title":
+                conversation["title"] = record["title"]
+                conversation["version"] += 1
+                superseded += 1
+        return conversation, superseded
+
+    def _scan_metadata(self) -> Iterator[Dict[str, Any]]:
+        for filename in os.listdir(self.data_dir):
+            if filename.endswith('.jsonl') and not filename.startswith('.'):
+                conversation, _ = self._read(os.path.join(self.data_dir, filename))
+                if conversation is not None:
+                    yield conversation_metadata(conversation)
+
+    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        path = self.get_conversation_path(conversation_id)
+        if not os.path.exists(path):
+            return None
+
+        conversation, _ = self._read(path)
+        return conversation
+
+    def iter_messages(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        path = self.get_conversation_path(conversation_id)
+        if not os.path.exists(path):
+            raise ValueError(f"Conversation {conversation_id} not found")
+        for record in read_lines(path):
+            if record.get("type") == "message":
+                yield record["message"]
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        start: int,
+        stop: int,
+        stages: Tuple[int, ...] = (1, 2, 3)
+    ) -> List[Dict[str, Any]]:
+        messages = []
+        for index, message in enumerate(self.iter_messages(conversation_id)):
+            if index >= stop:
+                break
+            if index >= start:
+                messages.append(message)
+        return messages
+
+    def _write_log(self, conversation: Dict[str, Any]):
+        """Write a compacted log (header plus messages) and swap it in atomically."""
+        path = self.get_conversation_path(conversation["id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({
+                "type": "header",
+                "id": conversation["id"],
+                "created_at": conversation["created_at"],
+                "title": conversation.get("title", "New Conversation"),
+                # Replaying the message records below adds one each
+                "version": conversation.get("version", 0) - len(conversation["messages"])
+            }) + "\n")
+            for message in conversation["messages"]:
+                f.write(json.dumps({"type": "message", "message": message}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def save_conversation(self, conversation: Dict[str, Any]):
+        self.ensure_data_dir()
+        with self._log_lock(conversation["id"]):
+            self._write_log(conversation)
+            self._index_update(conversation_metadata(conversation))
+
+    def _append(
+        self,
+        conversation_id: str,
+        record: Dict[str, Any],
+        changes: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ):
+        """
+        Append a record and update the conversation's index metadata.
+
+        Args:
+            conversation_id: Conversation to append to
+            record: Log record to append
+            changes: Function from the current index metadata to its updated fields
+        """
+        with self._log_lock(conversation_id):
+            metadata = self._load_index().get(conversation_id)
+            path = self.get_conversation_path(conversation_id)
+            if metadata is None or not os.path.exists(path):
+                raise ValueError(f"Conversation {conversation_id} not found")
+            append_line(path, json.dumps(record), durable=True)
+            self._index_update({**metadata, **changes(metadata)})
+
+    def _compact(self, conversation_id: str):
+        """Rewrite a log without its superseded records once they make up enough of it."""
+        with self._log_lock(conversation_id):
+            conversation, superseded = self._read(self.get_conversation_path(conversation_id))
+            lines = 1 + len(conversation["messages"]) + superseded
+            if superseded >= self.COMPACT_MIN_SUPERSEDED and superseded >= self.COMPACT_DEAD_RATIO * lines:
+                self._write_log(conversation)
+
+    def add_user_message(self, conversation_id: str, content: str):
+        message = {"role": "user", "content": content}
+        self._append(conversation_id, {"type": "message", "message": message}, _one_more_message)
+
+    def add_assistant_message(
+        self,
+        conversation_id: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any]
+    ):
+        message = {
+            "role": "assistant",
+            "stage1": stage1,
+            "stage2": stage2,
+            "stage3": stage3
+        }
+        self._append(conversation_id, {"type": "message", "message": message}, _one_more_message)
+
+    def update_conversation_title(self, conversation_id: str, title: str):
+        self._append(conversation_id, {"type": "title", "title": title}, lambda metadata: {"title": title})
+        self._compact(conversation_id)
+
+    # Appends are already cheap, so apply batched writes one by one
+    apply_writes = StorageBackend.apply_writes
+
+
+class CachedStorage(StorageBackend):
+    """
+    Write-through LRU of parsed conversations in front of another backend.
+
+    Reads of cached conversations skip the backend entirely; writes go to the
+    backend first and are then applied to the cached copy, so the two never
+    disagree. Size is accounted as the JSON-encoded bytes of each conversation
+    and bounded by both max_bytes and max_entries. Callers always get copies.
+    """
+
+    def __init__(self, inner: StorageBackend, max_bytes: int, max_entries: int):
+        self.inner = inner
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self.bytes = 0
+        # Storage calls run on a thread pool
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _remember(self, conversation: Dict[str, Any], size: int):
+        with self.lock:
+            previous = self.entries.pop(conversation["id"], None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            if size > self.max_bytes:
+                return
+            self.entries[conversation["id"]] = (conversation, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or len(self.entries) > self.max_entries:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats["evictions"] += 1
+
+    def _cached(self, conversation_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        with self.lock:
+            entry = self.entries.get(conversation_id)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(conversation_id)
+            self.stats["hits"] += 1
+            return entry
+
+    def _load(self, conversation_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        entry = self._cached(conversation_id)
+        if entry is not None:
+            return entry
+        conversation = self.inner.get_conversation(conversation_id)
+        if conversation is None:
+            return None
+        entry = (conversation, len(json.dumps(conversation)))
+        self._remember(*entry)
+        return entry
+
+    def create_conversation(self, conversation_id: str) -> Dict[str, Any]:
+        conversation = self.inner.create_conversation(conversation_id)
+        self._remember(copy.deepcopy(conversation), len(json.dumps(conversation)))
+        return conversation
+
+    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._load(conversation_id)
+        return copy.deepcopy(entry[0]) if entry is not None else None
+
+    def save_conversation(self, conversation: Dict[str, Any]):
+        self.inner.save_conversation(conversation)
+        self._remember(copy.deepcopy(conversation), len(json.dumps(conversation)))
+
+    def list_conversations(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.inner.list_conversations(limit, before)
+
+    def iter_messages(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        entry = self._cached(conversation_id)
+        if entry is None:
+            return self.inner.iter_messages(conversation_id)
+        return iter(copy.deepcopy(entry[0]["messages"]))
+
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._cached(conversation_id)
+        if entry is None:
+            return self.inner.get_metadata(conversation_id)
+        return conversation_metadata(entry[0])
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        start: int,
+        stop: int,
+        stages: Tuple[int, ...] = (1, 2, 3)
+    ) -> List[Dict[str, Any]]:
+        entry = self._cached(conversation_id)
+        if entry is None:
+            return self.inner.get_messages(conversation_id, start, stop, stages)
+        return copy.deepcopy(entry[0]["messages"][start:stop])
+
+    def apply_writes(
+        self,
+        conversation_id: str,
+        writes: List[Tuple[str, tuple]],
+        updated: Optional[Dict[str, Any]] = None,
+        expected_version: Optional[int] = None
+    ):
+        entry = self._load(conversation_id)
+        if entry is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+        current, size = entry
+        check_version(current, expected_version)
+
+        # Shallow copy: existing messages are shared, only the new ones are added
+        updated = {**current, "messages": list(current["messages"])}
+        for method, args in writes:
+            apply_write(updated, method, copy.deepcopy(args))
+        if "version" not in current:
+            # Written before conversations were versioned: measure once in full
+            size = len(json.dumps(updated))
+        else:
+            added = updated["messages"][len(current["messages"]):]
+            # +2 for the ", " separating list items, except before the first one
+            size += sum(len(json.dumps(message)) + 2 for message in added)
+            if added and not current["messages"]:
+                size -= 2
+            size += len(json.dumps(updated["title"])) - len(json.dumps(current["title"]))
+            size += len(str(updated["version"])) - len(str(current["version"]))
+
+        self.inner.apply_writes(conversation_id, writes, updated)
+        self._remember(updated, size)
+
+    def add_user_message(self, conversation_id: str, content: str):
+        self.apply_writes(conversation_id, [("add_user_message", (content,))])
+
+    def add_assistant_message(
+        self,
+        conversation_id: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any]
+    ):
+        self.apply_writes(conversation_id, [("add_assistant_message", (stage1, stage2, stage3))])
+
+    def update_conversation_title(self, conversation_id: str, title: str):
+        self.apply_writes(conversation_id, [("update_conversation_title", (title,))])
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+class BlobStorage(StorageBackend):
+    """
+    Moves large stage texts into the blob store before they reach another backend.
+
+    Stage entries keep their shape, but 'response' and 'ranking' strings of at
+    least min_bytes become {"$blob": <sha256>} references to a compressed,
+    deduplicated blob. Reads return the references untouched; resolve_blobs()
+    expands them only when the stage details are actually needed.
+    """
+
+    BLOB_FIELDS = ("response", "ranking")
+
+    def __init__(self, inner: StorageBackend, min_bytes: int):
+        self.inner = inner
+        self.min_bytes = min_bytes
+
+    def _externalize_entry(self, entry: Any) -> Any:
+        if not isinstance(entry, dict):
+            return entry
+        externalized = dict(entry)
+        for field in self.BLOB_FIELDS:
+            text = entry.get(field)
+            if isinstance(text, str) and len(text.encode("utf-8")) >= self.min_bytes:
+                externalized[field] = {BLOB_REF: blob_store.put(text)}
+        return externalized
+
+    def _externalize_stage(self, stage: Any) -> Any:
+        if isinstance(stage, list):
+            return [self._externalize_entry(entry) for entry in stage]
+        return self._externalize_entry(stage)
+
+    def _externalize_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        if message.get("role") != "assistant":
+            return message
+        return {
+            key: self._externalize_stage(value) if key in ("stage1", "stage2", "stage3") else value
+            for key, value in message.items()
+        }
+
+    def create_conversation(self, conversation_id: str) -> Dict[str, Any]:
+        return self.inner.create_conversation(conversation_id)
+
+    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return self.inner.get_conversation(conversation_id)
+
+    def save_conversation(self, conversation: Dict[str, Any]):
+        self.inner.save_conversation({
+            **conversation,
+            "messages": [self._externalize_message(message) for message in conversation["messages"]]
+        })
+
+    def list_conversations(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.inner.list_conversations(limit, before)
+
+    def iter_messages(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        return self.inner.iter_messages(conversation_id)
+
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return self.inner.get_metadata(conversation_id)
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        start: int,
+        stop: int,
+        stages: Tuple[int, ...] = (1, 2, 3)
+    ) -> List[Dict[str, Any]]:
+        return self.inner.get_messages(conversation_id, start, stop, stages)
+
+    def apply_writes(
+        self,
+        conversation_id: str,
+        writes: List[Tuple[str, tuple]],
+        updated: Optional[Dict[str, Any]] = None,
+        expected_version: Optional[int] = None
+    ):
+        externalized = [
+            (method, tuple(self._externalize_stage(stage) for stage in args))
+            if method == "add_assistant_message" else (method, args)
+            for method, args in writes
+        ]
+        if updated is not None:
+            updated = {
+                **updated,
+                "messages": [self._externalize_message(message) for message in updated["messages"]]
+            }
+        self.inner.apply_writes(conversation_id, externalized, updated, expected_version)
+
+    def add_user_message(self, conversation_id: str, content: str):
+        self.apply_writes(conversation_id, [("add_user_message", (content,))])
+
+    def add_assistant_message(
+        self,
+        conversation_id: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any]
+    ):
+        self.apply_writes(conversation_id, [("add_assistant_message", (stage1, stage2, stage3))])
+
+    def update_conversation_title(self, conversation_id: str, title: str):
+        self.apply_writes(conversation_id, [("update_conversation_title", (title,))])
+
+
+_backend: Optional[StorageBackend] = None
+# First calls come from several storage threads at once
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StorageBackend:
+    """Get (or create) the storage backend selected by STORAGE_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if STORAGE_BACKEND == "json":
+                backend = JSONStorage()
+            elif STORAGE_BACKEND == "jsonl":
+                backend = JSONLStorage()
+            elif STORAGE_BACKEND == "sqlite":
+                from .storage_sqlite import SQLiteStorage
+                backend = SQLiteStorage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+            # The cache holds blob references, not the full texts
+            if STORAGE_CACHE_MAX_BYTES > 0 and STORAGE_CACHE_MAX_ENTRIES > 0:
+                backend = CachedStorage(backend, STORAGE_CACHE_MAX_BYTES, STORAGE_CACHE_MAX_ENTRIES)
+            if BLOB_STORE_ENABLED:
+                backend = BlobStorage(backend, BLOB_MIN_BYTES)
+
+            # Outermost, so the search index sees full texts rather than blob references
+            if SEARCH_ENABLED:
+                from .search import SearchIndexedStorage, get_search_index
+                index = get_search_index()
+                if index is not None:
+                    if index.is_new:
+                        count = index.rebuild(backend)
+                        if count:
+                            print(f"Indexed {count} existing conversations for search")
+                    backend = SearchIndexedStorage(backend, index)
+            _backend = backend
+        return _backend
+
+
+def get_storage_cache_stats() -> Optional[Dict[str, Any]]:
+    """Conversation cache counters for metrics, or None when the cache is disabled."""
+    backend = get_backend()
+    while not isinstance(backend, CachedStorage):
+        backend = getattr(backend, "inner", None)
+        if backend is None:
+            return None
+    return backend.snapshot()
+
+
+def create_conversation(conversation_id: str) -> Dict[str, Any]:
+    """
+    Create a new conversation.
 
     Args:
         conversation_id: Unique identifier for the conversation
 
     Returns:
-        Conversation dict or None if not found
+        New conversation dict
     """
-    path = get_conversation_path(conversation_id)
+    return get_backend().create_conversation(conversation_id)
 
-    if not os.path.exists(path):
-        return None
 
-    with open(path, 'r') as f:
-        return json.load(f)
+def get_conversation(conversation_id: str, resolve: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Load a conversation from storage.
+
+    Args:
+        conversation_id: Unique identifier for the conversation
+        resolve: Expand blob references into the stage texts; without it, large
+            texts stay as {"$blob": digest} and nothing is decompressed
+
+    Returns:
+        Conversation dict or None if not found
+    """
+    conversation = get_backend().get_conversation(conversation_id)
+    if conversation is not None and resolve:
+        conversation = resolve_blobs(conversation)
+    return conversation
 
 
 def save_conversation(conversation: Dict[str, Any]):
     """
-    Save a conversation to storage.
+    Save a conversation to storage, replacing any stored copy.
 
     Args:
         conversation: Conversation dict to save
     """
-    ensure_data_dir()
+    get_backend().save_conversation(conversation)
 
-    path = get_conversation_path(conversation['id'])
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
 
-
-def list_conversations() -> List[Dict[str, Any]]:
-    """
-    List all conversations (metadata only).
-
-    Returns:
-        List of conversation metadata dicts
+def list_conversations(limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    ensure_data_dir()
+    List conversations (metadata only), newest first.
 
-    conversations = []
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith('.json'):
-            path = os.path.join(DATA_DIR, filename)
-            with open(path, 'r') as f:
-                data = json.load(f)
-                # Return metadata only
-                conversations.append({
-                    "id": data["id"],
-                    "created_at": data["created_at"],
-                    "title": data.get("title", "New Conversation"),
-                    "message_count": len(data["messages"])
-                })
+    Args:
+        limit: Maximum number of conversations to return (all if None)
+        before: Cursor; only return conversations older than this conversation id
 
-    # Sort by creation time, newest first
-    conversations.sort(key=lambda x: x["created_at"], reverse=True)
+    Returns:
+        List of conversation metadata dicts, newest first
 
-    return conversations
+    Raises:
+        ValueError: if `before` is not a known conversation
+    """
+    return get_backend().list_conversations(limit, before)
 
 
 def add_user_message(conversation_id: str, content: str):
@@ -114,17 +938,11 @@ def add_user_message(conversation_id: str, content: str):
     Args:
         conversation_id: Conversation identifier
         content: User message content
-    """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
-    conversation["messages"].append({
-        "role": "user",
-        "content": content
-    })
 
-    save_conversation(conversation)
+    Raises:
+        ValueError: if the conversation does not exist
+    """
+    get_backend().add_user_message(conversation_id, content)
 
 
 def add_assistant_message(
@@ -141,19 +959,81 @@ def add_assistant_message(
         stage1: List of individual model responses
         stage2: List of model rankings
         stage3: Final synthesized response
+
+    Raises:
+        ValueError: if the conversation does not exist
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    get_backend().add_assistant_message(conversation_id, stage1, stage2, stage3)
 
-    conversation["messages"].append({
-        "role": "assistant",
-        "stage1": stage1,
-        "stage2": stage2,
-        "stage3": stage3
-    })
 
-    save_conversation(conversation)
+def iter_messages(conversation_id: str, resolve: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the messages of a conversation in order.
+
+    Args:
+        conversation_id: Conversation identifier
+        resolve: Expand blob references one message at a time as it is yielded
+
+    Returns:
+        Iterator over message dicts
+
+    Raises:
+        ValueError: if the conversation does not exist
+    """
+    messages = get_backend().iter_messages(conversation_id)
+    return (resolve_blobs(message) for message in messages) if resolve else messages
+
+
+# Projectable message fields; 'role' is always included
+MESSAGE_FIELDS = ("content", "stage1", "stage2", "stage3")
+
+
+def get_message_page(
+    conversation_id: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None
+) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """
+    Load one page of a conversation's messages without loading the whole conversation
+    (where the backend allows it).
+
+    Args:
+        conversation_id: Conversation identifier
+        offset: Number of newest messages to skip
+        limit: Maximum number of messages (all remaining if None)
+        fields: Subset of MESSAGE_FIELDS to include (all if None)
+
+    Returns:
+        Tuple of (conversation metadata, messages newest first, each with its
+        chronological 'index'), or None if the conversation does not exist.
+        Blob references are left unresolved.
+
+    Raises:
+        ValueError: on an unknown field
+    """
+    fields = list(MESSAGE_FIELDS) if fields is None else fields
+    unknown = set(fields) - set(MESSAGE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown message fields: {', '.join(sorted(unknown))}")
+
+    backend = get_backend()
+    metadata = backend.get_metadata(conversation_id)
+    if metadata is None:
+        return None
+
+    stop = max(0, metadata["message_count"] - offset)
+    start = 0 if limit is None else max(0, stop - limit)
+    stages = tuple(stage for stage in (1, 2, 3) if f"stage{stage}" in fields)
+    messages = backend.get_messages(conversation_id, start, stop, stages)
+
+    page = []
+    for index, message in zip(range(start, stop), messages):
+        projected = {"index": index, "role": message["role"]}
+        projected.update((field, message[field]) for field in fields if field in message)
+        page.append(projected)
+    page.reverse()
+    return metadata, page
 
 
 def update_conversation_title(conversation_id: str, title: str):
@@ -163,10 +1043,8 @@ def update_conversation_title(conversation_id: str, title: str):
     Args:
         conversation_id: Conversation identifier
         title: New title for the conversation
-    """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
 
-    conversation["title"] = title
-    save_conversation(conversation)
+    Raises:
+        ValueError: if the conversation does not exist
+    """
+    get_backend().update_conversation_title(conversation_id, title)
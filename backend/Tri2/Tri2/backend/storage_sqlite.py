@@ -0,0 +1,340 @@
+"""SQLite (WAL) conversation storage."""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from .config import DATA_DIR, SQLITE_PATH
+from .storage import StorageBackend, ConflictError, new_conversation
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    title TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_created_at ON conversations(created_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    PRIMARY KEY (conversation_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
+
+CREATE TABLE IF NOT EXISTS stages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, seq, stage),
+    FOREIGN KEY (conversation_id, seq) REFERENCES messages(conversation_id, seq) ON DELETE CASCADE
+);
+"""
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Conversations in a single SQLite database in WAL mode.
+
+    Appending a message inserts one row (plus one row per stage for assistant
+    messages) instead of rewriting the whole conversation. Each thread gets
+    its own connection; writes run in short IMMEDIATE transactions.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH, migrate_from: Optional[str] = DATA_DIR):
+        self.path = path
+        self.local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        is_new = not os.path.exists(path)
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(conversations)")}
+        if "version" not in columns:
+            # Databases created before conversations were versioned
+            conn.execute("ALTER TABLE conversations ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+        # One-shot import of the JSON store the first time the database is created
+        if is_new and migrate_from and os.path.isdir(migrate_from):
+            migrated = self.migrate_from_json(migrate_from)
+            if migrated:
+                print(f"Migrated {migrated} conversations from {migrate_from} to {path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _next_seq(self, conn: sqlite3.Connection, conversation_id: str) -> int:
+        row = conn.execute(
+            "SELECT message_count FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+        return row["message_count"]
+
+    def _insert_message(self, conn: sqlite3.Connection, conversation_id: str, seq: int, message: Dict[str, Any]):
+        conn.execute(
+            "INSERT INTO messages (conversation_id, seq, role, content) VALUES (?, ?, ?, ?)",
+            (conversation_id, seq, message["role"], message.get("content")),
+        )
+        for stage in (1, 2, 3):
+            key = f"stage{stage}"
+            if key in message:
+                conn.execute(
+                    "INSERT INTO stages (conversation_id, seq, stage, data) VALUES (?, ?, ?, ?)",
+                    (conversation_id, seq, stage, json.dumps(message[key])),
+                )
+
+    def _append(self, conn: sqlite3.Connection, conversation_id: str, message: Dict[str, Any]):
+        seq = self._next_seq(conn, conversation_id)
+        self._insert_message(conn, conversation_id, seq, message)
+        conn.execute(
+            "UPDATE conversations SET message_count = ? WHERE id = ?",
+            (seq + 1, conversation_id),
+        )
+
+    def create_conversation(self, conversation_id: str) -> Dict[str, Any]:
+        conversation = new_conversation(conversation_id)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO conversations (id, created_at, title) VALUES (?, ?, ?)",
+                (conversation["id"], conversation["created_at"], conversation["title"]),
+            )
+        return conversation
+
+    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT id, created_at, title, version FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        return {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "title": row["title"],
+            "messages": self._load_messages(conn, conversation_id),
+            "version": row["version"],
+        }
+
+    def _load_messages(
+        self,
+        conn: sqlite3.Connection,
+        conversation_id: str,
+        start: int = 0,
+        stop: int = -1,
+        stages: Tuple[int, ...] = (1, 2, 3)
+    ) -> List[Dict[str, Any]]:
+        """Messages with seq in [start, stop) (stop -1 means to the end), with only the given stages."""
+        stop = stop if stop >= 0 else 2 ** 62
+        stage_data: Dict[int, Dict[str, Any]] = {}
+        if stages:
+            placeholders = ", ".join("?" for _ in stages)
+            for stage in conn.execute(
+                "SELECT seq, stage, data FROM stages WHERE conversation_id = ? AND seq >= ? AND seq < ? "
+                f"AND stage IN ({placeholders})",
+                (conversation_id, start, stop, *stages),
+            ):
+                stage_data.setdefault(stage["seq"], {})[f"stage{stage['stage']}"] = json.loads(stage["data"])
+
+        messages = []
+        for message in conn.execute(
+            "SELECT seq, role, content FROM messages WHERE conversation_id = ? AND seq >= ? AND seq < ? "
+            "ORDER BY seq",
+            (conversation_id, start, stop),
+        ):
+            if message["role"] == "assistant":
+                messages.append({"role": "assistant", **stage_data.get(message["seq"], {})})
+            else:
+                messages.append({"role": message["role"], "content": message["content"]})
+        return messages
+
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT id, created_at, title, message_count FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        start: int,
+        stop: int,
+        stages: Tuple[int, ...] = (1, 2, 3)
+    ) -> List[Dict[str, Any]]:
+        return self._load_messages(self._connect(), conversation_id, start, stop, stages)
+
+    def save_conversation(self, conversation: Dict[str, Any]):
+        with self._transaction() as conn:
+            self._replace(conn, conversation)
+
+    def _replace(self, conn: sqlite3.Connection, conversation: Dict[str, Any]):
+        conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation["id"],))
+        conn.execute(
+            "INSERT OR REPLACE INTO conversations (id, created_at, title, message_count, version) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                conversation["id"],
+                conversation["created_at"],
+                conversation.get("title", "New Conversation"),
+                len(conversation["messages"]),
+                conversation.get("version", 0),
+            ),
+        )
+        for seq, message in enumerate(conversation["messages"]):
+            self._insert_message(conn, conversation["id"], seq, message)
+
+    def list_conversations(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        where = ""
+        params: list = []
+        if before is not None:
+            cursor = conn.execute(
+                "SELECT created_at FROM conversations WHERE id = ?", (before,)
+            ).fetchone()
+            if cursor is None:
+                raise ValueError(f"Conversation {before} not found")
+            where = "WHERE (created_at, id) < (?, ?)"
+            params = [cursor["created_at"], before]
+
+        rows = conn.execute(
+            f"SELECT id, created_at, title, message_count FROM conversations {where} "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (*params, -1 if limit is None else limit),
+        )
+        return [dict(row) for row in rows]
+
+    def apply_writes(
+        self,
+        conversation_id: str,
+        writes: List[Tuple[str, tuple]],
+        updated: Optional[Dict[str, Any]] = None,
+        expected_version: Optional[int] = None
+    ):
+        # One transaction (and one commit) for the whole batch
+        with self._transaction() as conn:
+            if expected_version is not None:
+                row = conn.execute(
+                    "SELECT version FROM conversations WHERE id = ?", (conversation_id,)
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"Conversation {conversation_id} not found")
+                if row["version"] != expected_version:
+                    raise ConflictError(conversation_id, expected_version, row["version"])
+
+            for method, args in writes:
+                if method == "add_user_message":
+                    self._append(conn, conversation_id, {"role": "user", "content": args[0]})
+                elif method == "add_assistant_message":
+                    stage1, stage2, stage3 = args
+                    self._append(conn, conversation_id, {
+                        "role": "assistant",
+                        "stage1": stage1,
+                        "stage2": stage2,
+                        "stage3": stage3
+                    })
+                elif method == "update_conversation_title":
+                    changed = conn.execute(
+                        "UPDATE conversations SET title = ? WHERE id = ?", (args[0], conversation_id)
+                    ).rowcount
+                    if not changed:
+                        raise ValueError(f"Conversation {conversation_id} not found")
+                else:
+                    raise ValueError(f"Unknown storage write: {method}")
+
+            conn.execute(
+                "UPDATE conversations SET version = version + ? WHERE id = ?",
+                (len(writes), conversation_id),
+            )
+
+    def add_user_message(self, conversation_id: str, content: str):
+        self.apply_writes(conversation_id, [("add_user_message", (content,))])
+
+    def add_assistant_message(
+        self,
+        conversation_id: str,
+        stage1: List[Dict[str, Any]],
+        stage2: List[Dict[str, Any]],
+        stage3: Dict[str, Any]
+    ):
+        self.apply_writes(conversation_id, [("add_assistant_message", (stage1, stage2, stage3))])
+
+    def update_conversation_title(self, conversation_id: str, title: str):
+        self.apply_writes(conversation_id, [("update_conversation_title", (title,))])
+
+    def migrate_from_json(self, json_dir: str) -> int:
+        """
+        Import every conversation file from a JSON storage directory.
+
+        Conversations already present in the database are left untouched, so
+        running the migration twice is harmless.
+
+        Args:
+            json_dir: Directory containing <conversation_id>.json files
+
+        Returns:
+            Number of conversations imported
+        """
+        migrated = 0
+        for filename in sorted(os.listdir(json_dir)):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(json_dir, filename)
+            try:
+                with open(path, 'r') as f:
+                    conversation = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Skipping unreadable conversation file {path}: {e}")
+                continue
+            if not isinstance(conversation, dict) or not all(
+                key in conversation for key in ("id", "created_at", "messages")
+            ):
+                print(f"WARNING: Skipping malformed conversation file {path}")
+                continue
+
+            with self._transaction() as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM conversations WHERE id = ?", (conversation["id"],)
+                ).fetchone()
+                if exists:
+                    continue
+                self._replace(conn, conversation)
+            migrated += 1
+        return migrated
+
+
+if __name__ == "__main__":
+    # Usage: python -m backend.storage_sqlite [json_dir] [sqlite_path]
+    source = sys.argv[1] if len(sys.argv) > 1 else DATA_DIR
+    target = sys.argv[2] if len(sys.argv) > 2 else SQLITE_PATH
+    count = SQLiteStorage(target, migrate_from=None).migrate_from_json(source)
+    print(f"Migrated {count} conversations from {source} to {target}")
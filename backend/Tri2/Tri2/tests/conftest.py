@@ -0,0 +1,16 @@
+"""Shared test setup: run against throwaway data files and no real providers."""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Before backend.config is imported: keep every data file in a scratch
+# directory and make sure no test reaches a real provider
+_data_dir = tempfile.mkdtemp(prefix="llm-council-tests-")
+os.chdir(_data_dir)
+os.environ.setdefault("OPENROUTER_API_KEY", "test-key")
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("SEMANTIC_CACHE_PATH", "")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,42 @@
+"""Write-behind storage: the answer of a council run is never dropped silently."""
+
+import asyncio
+import uuid
+
+import pytest
+
+from backend import async_storage, storage
+
+
+def test_failed_assistant_message_is_raised(monkeypatch):
+    conversation_id = str(uuid.uuid4())
+    backend = storage.get_backend()
+    apply_writes = backend.apply_writes
+
+    def failing_apply_writes(conversation_id, writes, updated=None, expected_version=None):
+        if any(method == "add_assistant_message" for method, _ in writes):
+            raise OSError("disk full")
+        return apply_writes(conversation_id, writes, updated, expected_version)
+
+    async def scenario():
+        await async_storage.create_conversation(conversation_id)
+        monkeypatch.setattr(backend, "apply_writes", failing_apply_writes)
+        await async_storage.add_user_message(conversation_id, "hi")
+        with pytest.raises(OSError):
+            await async_storage.add_assistant_message(conversation_id, [], [], {"model": "m", "response": "r"})
+
+    asyncio.run(scenario())
+
+
+def test_assistant_message_is_applied_on_return():
+    conversation_id = str(uuid.uuid4())
+
+    async def scenario():
+        await async_storage.create_conversation(conversation_id)
+        await async_storage.add_user_message(conversation_id, "hi")
+        await async_storage.add_assistant_message(conversation_id, [], [], {"model": "m", "response": "r"})
+        assert not async_storage._pending.get(conversation_id)
+        conversation = storage.get_backend().get_conversation(conversation_id)
+        assert [message["role"] for message in conversation["messages"]] == ["user", "assistant"]
+
+    asyncio.run(scenario())
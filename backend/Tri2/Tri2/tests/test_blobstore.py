@@ -0,0 +1,89 @@
+"""Compressed, content-addressed stage texts and their references in conversations."""
+
+import pytest
+
+from backend import blobstore, storage
+from backend.blobstore import BLOB_REF, BlobStore, resolve_blobs
+from backend.storage import BlobStorage, JSONStorage
+
+TEXT = "The council agrees: Paris is the capital of France. " * 50 + "Ünïcode ✓"
+
+codecs = pytest.mark.parametrize("compression, extension", [
+    pytest.param(
+        "zstd", "zst",
+        marks=pytest.mark.skipif(blobstore.zstandard is None, reason="zstandard is not installed"),
+    ),
+    ("gzip", "gz"),
+])
+
+
+@codecs
+def test_round_trip(tmp_path, compression, extension):
+    store = BlobStore(str(tmp_path), compression)
+    digest = store.put(TEXT)
+
+    assert store.get(digest) == TEXT
+    path = tmp_path / digest[:2] / f"{digest}.{extension}"
+    assert path.exists()
+    assert path.stat().st_size < len(TEXT.encode("utf-8")) / 5
+
+
+@codecs
+def test_identical_texts_are_stored_once(tmp_path, compression, extension):
+    store = BlobStore(str(tmp_path), compression)
+    assert store.put(TEXT) == store.put(TEXT)
+    assert store.stats["deduplicated"] == 1
+    assert len(list(tmp_path.rglob(f"*.{extension}"))) == 1
+
+
+def test_older_codec_stays_readable(tmp_path):
+    digest = BlobStore(str(tmp_path), "gzip").put(TEXT)
+    assert BlobStore(str(tmp_path), "zstd").get(digest) == TEXT
+
+
+def test_missing_blob_raises(tmp_path):
+    with pytest.raises(KeyError):
+        BlobStore(str(tmp_path), "gzip").get("0" * 64)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / "blobs"), "gzip")
+    monkeypatch.setattr(blobstore, "blob_store", store)
+    monkeypatch.setattr(storage, "blob_store", store)
+    return store
+
+
+def test_resolve_blobs_expands_nested_references(store):
+    digest = store.put(TEXT)
+    value = {
+        "stage1": [{"model": "m", "response": {BLOB_REF: digest}}],
+        "stage3": {"model": "m", "response": "short"},
+        "other": {BLOB_REF: digest, "extra": 1},
+    }
+    assert resolve_blobs(value) == {
+        "stage1": [{"model": "m", "response": TEXT}],
+        "stage3": {"model": "m", "response": "short"},
+        "other": {BLOB_REF: digest, "extra": 1},
+    }
+
+
+def test_large_stage_texts_become_references(store, tmp_path):
+    backend = BlobStorage(JSONStorage(str(tmp_path / "conversations")), min_bytes=100)
+    backend.create_conversation("c1")
+    backend.add_user_message("c1", TEXT)
+    stage1 = [{"model": "a", "response": TEXT}, {"model": "b", "response": "short"}]
+    stage2 = [{"model": "a", "ranking": TEXT, "parsed_ranking": ["Response A"]}]
+    stage3 = {"model": "chair", "response": TEXT}
+    backend.add_assistant_message("c1", stage1, stage2, stage3)
+
+    user, assistant = backend.get_conversation("c1")["messages"]
+    # Only assistant stage texts are moved out
+    assert user["content"] == TEXT
+    # Three identical texts, one blob
+    assert len(list(store.directory.rglob("*.gz"))) == 1
+    digest = store.put(TEXT)
+    assert assistant["stage1"][0]["response"] == {BLOB_REF: digest}
+    assert assistant["stage1"][1]["response"] == "short"
+    assert assistant["stage2"][0]["parsed_ranking"] == ["Response A"]
+    assert resolve_blobs(assistant) == {"role": "assistant", "stage1": stage1, "stage2": stage2, "stage3": stage3}
@@ -0,0 +1,95 @@
+"""Exact-match response cache: LRU order, expiry, the disk tier and query_model hits."""
+
+import asyncio
+
+from backend import cache, openrouter
+from backend.cache import ResponseCache, cache_key
+
+
+def test_least_recently_used_entry_is_evicted():
+    responses = ResponseCache(max_entries=2, ttl=60)
+    responses.set("a", {"content": "A"})
+    responses.set("b", {"content": "B"})
+    assert responses.get("a") == {"content": "A"}
+
+    responses.set("c", {"content": "C"})
+    assert responses.get("b") is None
+    assert responses.get("a") == {"content": "A"}
+    assert responses.get("c") == {"content": "C"}
+    assert responses.stats["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    responses = ResponseCache(max_entries=10, ttl=60)
+    responses.set("a", {"content": "A"})
+
+    now[0] += 59
+    assert responses.get("a") == {"content": "A"}
+    now[0] += 2
+    assert responses.get("a") is None
+    assert responses.stats["expirations"] == 1
+    assert not responses.entries
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    ResponseCache(max_entries=10, ttl=60, disk_dir=str(tmp_path)).set("a" * 64, {"content": "A"})
+
+    restarted = ResponseCache(max_entries=10, ttl=60, disk_dir=str(tmp_path))
+    assert restarted.get("a" * 64) == {"content": "A"}
+    assert restarted.stats["disk_hits"] == 1
+    assert restarted.get("a" * 64) == {"content": "A"}
+    assert restarted.stats["memory_hits"] == 1
+
+
+def test_values_are_copies():
+    responses = ResponseCache(max_entries=10, ttl=60)
+    value = {"content": "A", "usage": {"total_tokens": 3}}
+    responses.set("a", value)
+    value["usage"]["total_tokens"] = 99
+    responses.get("a")["usage"]["total_tokens"] = 42
+    assert responses.get("a") == {"content": "A", "usage": {"total_tokens": 3}}
+
+
+def test_key_depends_on_every_input():
+    messages = [{"role": "user", "content": "hi"}]
+    key = cache_key("m", messages, {"max_tokens": 10})
+    assert key == cache_key("m", [{"content": "hi", "role": "user"}], {"max_tokens": 10})
+    assert key != cache_key("other", messages, {"max_tokens": 10})
+    assert key != cache_key("m", [{"role": "user", "content": "hi!"}], {"max_tokens": 10})
+    assert key != cache_key("m", messages, {"max_tokens": 11})
+
+
+def test_excluded_models_are_not_cacheable(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_EXCLUDE_MODELS", {"test/volatile"})
+    assert cache.is_cacheable("test/stable")
+    assert not cache.is_cacheable("test/volatile")
+
+    monkeypatch.setattr(cache, "CACHE_ENABLED", False)
+    assert not cache.is_cacheable("test/stable")
+
+
+def test_query_model_answers_repeats_from_cache(monkeypatch):
+    monkeypatch.setattr(openrouter, "response_cache", ResponseCache(max_entries=10, ttl=60))
+    monkeypatch.setattr(openrouter, "is_cacheable", lambda model: model != "test/uncached")
+    calls = []
+
+    async def query_openrouter_model(model, messages, timeout, max_tokens):
+        calls.append(model)
+        return {"content": f"answer {len(calls)}"}
+
+    monkeypatch.setattr(openrouter, "query_openrouter_model", query_openrouter_model)
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def scenario():
+        first = await openrouter.query_model("test/cached", messages)
+        second = await openrouter.query_model("test/cached", messages)
+        assert first == second == {"content": "answer 1"}
+        assert await openrouter.query_model("test/cached", messages, max_tokens=5) == {"content": "answer 2"}
+
+        await openrouter.query_model("test/uncached", messages)
+        await openrouter.query_model("test/uncached", messages)
+        assert calls.count("test/uncached") == 2
+
+    asyncio.run(scenario())
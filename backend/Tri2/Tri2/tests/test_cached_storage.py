@@ -0,0 +1,85 @@
+"""Write-through conversation cache: byte accounting, LRU eviction and copies."""
+
+import json
+
+import pytest
+
+from backend.storage import CachedStorage, ConflictError, JSONStorage
+
+
+def _stored_bytes(cached: CachedStorage) -> int:
+    return sum(len(json.dumps(conversation)) for conversation, _ in cached.entries.values())
+
+
+@pytest.fixture
+def inner(tmp_path):
+    return JSONStorage(str(tmp_path))
+
+
+def test_bytes_track_the_encoded_conversations(inner):
+    cached = CachedStorage(inner, max_bytes=1 << 20, max_entries=10)
+    cached.create_conversation("c1")
+    assert cached.bytes == _stored_bytes(cached)
+
+    cached.add_user_message("c1", "first question")
+    cached.add_assistant_message("c1", [{"model": "m", "response": "r"}], [], {"model": "m", "response": "é"})
+    cached.update_conversation_title("c1", "A longer title than before")
+    for i in range(10):
+        cached.add_user_message("c1", f"question {i}")
+    assert cached.get_conversation("c1")["version"] == 13
+    assert cached.bytes == _stored_bytes(cached)
+
+    # A fresh read of the same conversation measures the same size
+    reread = CachedStorage(inner, max_bytes=1 << 20, max_entries=10)
+    reread.get_conversation("c1")
+    assert reread.bytes == cached.bytes
+
+
+def test_least_recently_used_is_evicted_by_bytes(inner):
+    for conversation_id in ("a", "b", "c"):
+        inner.create_conversation(conversation_id)
+    size = len(json.dumps(inner.get_conversation("a")))
+    cached = CachedStorage(inner, max_bytes=2 * size, max_entries=10)
+
+    cached.get_conversation("a")
+    cached.get_conversation("b")
+    cached.get_conversation("a")
+    cached.get_conversation("c")
+    assert list(cached.entries) == ["a", "c"]
+    assert cached.stats["evictions"] == 1
+
+    # Growing a conversation past the budget pushes out the others
+    cached.add_user_message("a", "x" * (size // 2))
+    assert list(cached.entries) == ["a"]
+    assert cached.bytes == _stored_bytes(cached)
+
+
+def test_entry_limit_and_oversized_conversations(inner):
+    cached = CachedStorage(inner, max_bytes=1 << 20, max_entries=2)
+    for conversation_id in ("a", "b", "c"):
+        cached.create_conversation(conversation_id)
+    assert list(cached.entries) == ["b", "c"]
+
+    tiny = CachedStorage(inner, max_bytes=10, max_entries=2)
+    assert tiny.get_conversation("a")["id"] == "a"
+    assert not tiny.entries and tiny.bytes == 0
+
+
+def test_reads_are_copies_and_writes_reach_the_backend(inner):
+    cached = CachedStorage(inner, max_bytes=1 << 20, max_entries=10)
+    cached.create_conversation("c1")
+    cached.get_conversation("c1")["messages"].append({"role": "user", "content": "stray"})
+    assert cached.get_conversation("c1")["messages"] == []
+
+    cached.add_user_message("c1", "hi")
+    assert inner.get_conversation("c1")["messages"] == [{"role": "user", "content": "hi"}]
+    assert cached.stats["hits"] >= 2
+
+
+def test_stale_version_is_refused_from_the_cache(inner):
+    cached = CachedStorage(inner, max_bytes=1 << 20, max_entries=10)
+    cached.create_conversation("c1")
+    cached.add_user_message("c1", "hi")
+    with pytest.raises(ConflictError):
+        cached.apply_writes("c1", [("add_user_message", ("again",))], expected_version=0)
+    assert len(inner.get_conversation("c1")["messages"]) == 1
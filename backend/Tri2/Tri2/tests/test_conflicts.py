@@ -0,0 +1,76 @@
+"""Compare-and-swap writes: stale versions are refused, and user messages retry."""
+
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import async_storage, main
+from backend.storage import ConflictError
+
+
+def _conversation() -> str:
+    conversation_id = str(uuid.uuid4())
+    asyncio.run(async_storage.create_conversation(conversation_id))
+    return conversation_id
+
+
+def test_stale_version_is_refused():
+    conversation_id = _conversation()
+
+    async def scenario():
+        conversation = await async_storage.get_conversation(conversation_id, resolve=False)
+        await async_storage.update_conversation_title(conversation_id, "Changed")
+        with pytest.raises(ConflictError):
+            await async_storage.add_user_message(
+                conversation_id, "hi", expected_version=conversation["version"]
+            )
+        await async_storage.flush()
+
+    asyncio.run(scenario())
+
+
+def test_user_message_retries_after_concurrent_write(monkeypatch):
+    conversation_id = _conversation()
+    add_user_message = async_storage.add_user_message
+    attempts = []
+
+    async def racing_add_user_message(conversation_id, content, expected_version=None):
+        attempts.append(expected_version)
+        if len(attempts) == 1:
+            # A finishing run's title lands between the read and the write
+            await async_storage.update_conversation_title(conversation_id, "From another run")
+            await async_storage.flush()
+        await add_user_message(conversation_id, content, expected_version=expected_version)
+
+    monkeypatch.setattr(async_storage, "add_user_message", racing_add_user_message)
+
+    async def scenario():
+        assert await main._add_user_message(conversation_id, "hi") is True
+        conversation = await async_storage.get_conversation(conversation_id)
+        assert [message["content"] for message in conversation["messages"]] == ["hi"]
+        assert conversation["title"] == "From another run"
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2 and attempts[0] != attempts[1]
+
+
+def test_persistent_conflict_is_409(monkeypatch):
+    conversation_id = _conversation()
+
+    async def always_conflicts(conversation_id, content, expected_version=None):
+        raise ConflictError(conversation_id, expected_version, expected_version + 1)
+
+    monkeypatch.setattr(async_storage, "add_user_message", always_conflicts)
+    # The app's shutdown would stop the storage thread pool the other tests share
+    monkeypatch.setattr(async_storage, "close", async_storage.flush)
+
+    with TestClient(main.app) as client:
+        response = client.post(
+            f"/api/conversations/{conversation_id}/message/stream",
+            json={"content": "hi"},
+            headers={"Accept": "text/event-stream"},
+        )
+    assert response.status_code == 409
+    assert main.scheduler.running == 0
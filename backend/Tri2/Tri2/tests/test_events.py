@@ -0,0 +1,87 @@
+"""Event bus: overlapping runs of one conversation keep their events apart."""
+
+import asyncio
+
+import pytest
+
+from backend.events import InProcessEventBus, SQLiteEventBus
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def bus(request, tmp_path):
+    if request.param == "memory":
+        return InProcessEventBus(buffer_size=16, ttl=60)
+    return SQLiteEventBus(path=str(tmp_path / "events.db"), poll_interval=0.01, buffer_size=16, ttl=60)
+
+
+async def _collect(events):
+    return [event async for _, event in events]
+
+
+def test_overlapping_runs_stay_separate(bus):
+    async def scenario():
+        first = await bus.start("conv")
+        first_events = bus.subscribe("conv", run_id=first)
+        await bus.publish(first, {"type": "stage1_start", "run": 1})
+
+        # A second run of the same conversation starts before the first ends
+        second = await bus.start("conv")
+        assert second != first
+        second_events = bus.subscribe("conv", run_id=second)
+        await bus.publish(second, {"type": "stage1_start", "run": 2})
+        await bus.publish(first, {"type": "complete", "run": 1})
+        await bus.finish(first)
+        await bus.publish(second, {"type": "complete", "run": 2})
+        await bus.finish(second)
+
+        first_seen, second_seen = await asyncio.wait_for(
+            asyncio.gather(_collect(first_events), _collect(second_events)), 5
+        )
+        assert [event["run"] for event in first_seen] == [1, 1]
+        assert [event["run"] for event in second_seen] == [2, 2]
+
+        # Without a run id, a subscriber follows the latest run
+        latest = await asyncio.wait_for(_collect(bus.subscribe("conv")), 5)
+        assert [event["run"] for event in latest] == [2, 2]
+        assert await bus.has_job("conv")
+        assert not await bus.has_job("other")
+
+    asyncio.run(scenario())
+
+
+def test_resume_after_last_event_id(bus):
+    async def scenario():
+        run_id = await bus.start("conv")
+        for index in range(3):
+            await bus.publish(run_id, {"type": "stage1_delta", "index": index})
+        await bus.publish(run_id, {"type": "complete"})
+        await bus.finish(run_id)
+
+        seen = [(seq, event) async for seq, event in bus.subscribe("conv")]
+        resumed = [event async for _, event in bus.subscribe("conv", after=seen[1][0])]
+        assert resumed == [event for _, event in seen[2:]]
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_finish_between_reads_keeps_terminal_event(tmp_path):
+    bus = SQLiteEventBus(path=str(tmp_path / "events.db"), poll_interval=0.01, buffer_size=16, ttl=60)
+    status = bus._status
+    raced = []
+
+    def status_after_publisher_finishes(run_id):
+        # The publisher writes its terminal event and finishes while the subscriber is mid-read
+        if not raced:
+            raced.append(run_id)
+            bus._publish(run_id, {"type": "complete"})
+            bus._finish(run_id)
+        return status(run_id)
+
+    bus._status = status_after_publisher_finishes
+
+    async def scenario():
+        run_id = await bus.start("conv")
+        seen = await asyncio.wait_for(_collect(bus.subscribe("conv", run_id=run_id)), 5)
+        assert [event["type"] for event in seen] == ["complete"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+"""Hedged requests: latency is tracked per kind of call."""
+
+import asyncio
+
+from backend import hedging
+
+
+def test_short_calls_do_not_trigger_hedging_of_long_ones(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(hedging, "_latencies", hedging.LatencyTracker(10))
+    called = []
+
+    async def fake_query_model(model, messages, timeout):
+        called.append(model)
+        await asyncio.sleep(0.2 if messages[0]["content"] == "long" else 0.001)
+        return {"content": model}
+
+    monkeypatch.setattr(hedging, "query_model", fake_query_model)
+
+    async def scenario():
+        for _ in range(5):
+            await hedging.query_model_hedged(
+                "chair", [{"role": "user", "content": "short"}], backup_model="backup", kind="title"
+            )
+        called.clear()
+
+        response = await hedging.query_model_hedged(
+            "chair", [{"role": "user", "content": "long"}], backup_model="backup", kind="synthesis"
+        )
+        assert response["model"] == "chair"
+        assert called == ["chair"]
+
+    asyncio.run(scenario())
+
+
+def _enable_hedging(monkeypatch, min_samples=3):
+    monkeypatch.setattr(hedging, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", min_samples)
+    tracker = hedging.LatencyTracker(10)
+    monkeypatch.setattr(hedging, "_latencies", tracker)
+    return tracker
+
+
+def test_raising_primary_fails_over(monkeypatch):
+    tracker = _enable_hedging(monkeypatch, min_samples=1)
+    tracker.record("chair:query", 0.01)
+
+    async def fake_query_model(model, messages, timeout):
+        if model == "chair":
+            raise RuntimeError("provider bug")
+        return {"content": "backup answer"}
+
+    monkeypatch.setattr(hedging, "query_model", fake_query_model)
+
+    response = asyncio.run(
+        hedging.query_model_hedged("chair", [{"role": "user", "content": "q"}], backup_model="backup")
+    )
+    assert response == {"content": "backup answer", "model": "backup"}
+
+
+def test_losing_stream_keeps_its_time_to_first_token(monkeypatch):
+    tracker = _enable_hedging(monkeypatch)
+    for _ in range(3):
+        tracker.record("chair:ttft", 0.01)
+
+    async def fake_stream(model, messages, timeout):
+        await asyncio.sleep(1.0 if model == "chair" else 0.01)
+        yield {"type": "delta", "content": model}
+        yield {"type": "done", "content": model}
+
+    monkeypatch.setattr(hedging, "query_model_stream", fake_stream)
+
+    async def ignore(text):
+        pass
+
+    response = asyncio.run(hedging.collect_model_stream_hedged(
+        "chair", [{"role": "user", "content": "q"}], ignore, backup_model="backup"
+    ))
+    assert response["model"] == "backup"
+    # The slow primary's abandoned attempt is a sample too, not just its fast past
+    assert len(tracker.samples["chair:ttft"]) == 4
+    assert tracker.samples["chair:ttft"][-1] > 0.01
@@ -0,0 +1,62 @@
+"""/api/ask payloads: display padding never reaches the saved conversation."""
+
+import asyncio
+
+from backend import async_storage, main
+
+
+def test_missing_agent_placeholder_is_not_saved():
+    stage1 = [{"model": "a/one", "response": "Four."}]
+    stage2 = [{"model": "a/one", "ranking": "FINAL RANKING:\n1. Response A", "parsed_ranking": ["Response A"]}]
+    stage3 = {"model": "c/chair", "response": "The answer is four."}
+    metadata = {"aggregate_rankings": [{"model": "a/one", "average_rank": 1.0, "rankings_count": 1}]}
+    request = main.AskRequest(question="What is 2+2?", user_id="user-1")
+
+    async def scenario():
+        payload = await main._ask_payload(request, stage1, stage2, stage3, metadata)
+        assert payload["agent_a"]["answer"] == "Four."
+        assert "failed to respond" in payload["agent_b"]["answer"]
+
+        history = await async_storage.get_history("user-1", limit=1)
+        conversation = await async_storage.get_conversation(history[0]["conversation_id"])
+        assert conversation["messages"][1]["stage1"] == stage1
+
+    asyncio.run(scenario())
+    assert len(stage1) == 1
+
+
+def test_disconnect_while_saving_keeps_the_turn(monkeypatch):
+    stage1 = [{"model": "a/one", "response": "Four."}, {"model": "b/two", "response": "4"}]
+    stage3 = {"model": "c/chair", "response": "The answer is four."}
+
+    async def finished_council(question, emit):
+        await emit({"type": "stage3_complete", "data": stage3})
+        return stage1, [], stage3, {"aggregate_rankings": []}
+
+    saving = asyncio.Event()
+    add_assistant_message = async_storage.add_assistant_message
+
+    async def slow_add_assistant_message(*args, **kwargs):
+        saving.set()
+        await asyncio.sleep(0.1)
+        await add_assistant_message(*args, **kwargs)
+
+    monkeypatch.setattr(main, "_run_council_stages", finished_council)
+    monkeypatch.setattr(async_storage, "add_assistant_message", slow_add_assistant_message)
+
+    async def scenario():
+        response = await main.ask_question_stream(main.AskRequest(question="Disconnect test?", user_id="user-2"))
+        body = response.body_iterator
+        await body.__anext__()
+        await saving.wait()
+
+        # The client leaves while the turn is being saved
+        await body.aclose()
+        await asyncio.sleep(0.3)
+
+        history = await async_storage.get_history("user-2", limit=1)
+        assert [item["question"] for item in history] == ["Disconnect test?"]
+        conversation = await async_storage.get_conversation(history[0]["conversation_id"])
+        assert [message["role"] for message in conversation["messages"]] == ["user", "assistant"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,102 @@
+"""Message pages: newest first, offset from the end, and field projection."""
+
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import async_storage, main, storage
+from backend.storage import CachedStorage, JSONStorage, JSONLStorage
+from backend.storage_sqlite import SQLiteStorage
+
+LONG = "A detailed final answer. " * 40
+
+
+def _fill(backend, conversation_id: str, turns: int):
+    backend.create_conversation(conversation_id)
+    for turn in range(turns):
+        backend.add_user_message(conversation_id, f"question {turn}")
+        backend.add_assistant_message(
+            conversation_id,
+            [{"model": "m", "response": f"draft {turn}"}],
+            [{"model": "m", "ranking": f"ranking {turn}", "parsed_ranking": []}],
+            {"model": "chair", "response": f"answer {turn}"},
+        )
+
+
+@pytest.fixture(params=["json", "jsonl", "sqlite", "cached"])
+def backend(request, tmp_path, monkeypatch):
+    if request.param == "json":
+        backend = JSONStorage(str(tmp_path))
+    elif request.param == "jsonl":
+        backend = JSONLStorage(str(tmp_path))
+    elif request.param == "sqlite":
+        backend = SQLiteStorage(str(tmp_path / "council.db"), migrate_from=None)
+    else:
+        backend = CachedStorage(JSONLStorage(str(tmp_path)), max_bytes=1 << 20, max_entries=10)
+    _fill(backend, "c1", 3)
+    monkeypatch.setattr(storage, "_backend", backend)
+    return backend
+
+
+def test_get_messages_slices_chronologically(backend):
+    messages = backend.get_messages("c1", 1, 4)
+    assert [m["role"] for m in messages] == ["assistant", "user", "assistant"]
+    assert messages[0]["stage3"] == {"model": "chair", "response": "answer 0"}
+    assert messages[1] == {"role": "user", "content": "question 1"}
+    assert len(backend.get_messages("c1", 4, 100)) == 2
+
+
+def test_page_is_newest_first_with_indexes(backend):
+    metadata, page = storage.get_message_page("c1", offset=1, limit=3)
+    assert metadata["message_count"] == 6
+    assert [m["index"] for m in page] == [4, 3, 2]
+    assert page[0] == {"index": 4, "role": "user", "content": "question 2"}
+
+    _, rest = storage.get_message_page("c1", offset=4)
+    assert [m["index"] for m in rest] == [1, 0]
+    _, beyond = storage.get_message_page("c1", offset=10, limit=3)
+    assert beyond == []
+
+
+def test_page_projects_fields(backend):
+    _, page = storage.get_message_page("c1", limit=2, fields=["content", "stage3"])
+    assert page == [
+        {"index": 5, "role": "assistant", "stage3": {"model": "chair", "response": "answer 2"}},
+        {"index": 4, "role": "user", "content": "question 2"},
+    ]
+
+    with pytest.raises(ValueError):
+        storage.get_message_page("c1", fields=["stage4"])
+    assert storage.get_message_page("missing") is None
+
+
+def test_endpoint_streams_a_page_with_blobs_resolved():
+    conversation_id = str(uuid.uuid4())
+
+    async def fill():
+        await async_storage.create_conversation(conversation_id)
+        await async_storage.add_user_message(conversation_id, "question")
+        await async_storage.add_assistant_message(
+            conversation_id, [{"model": "m", "response": LONG}], [], {"model": "chair", "response": LONG}
+        )
+        await async_storage.flush()
+
+    asyncio.run(fill())
+    client = TestClient(main.app)
+
+    response = client.get(f"/api/conversations/{conversation_id}", params={"limit": 1, "fields": "stage3"})
+    assert response.status_code == 200
+    page = json.loads(response.text)
+    assert page["id"] == conversation_id
+    assert page["offset"] == 0 and page["limit"] == 1
+    assert page["messages"] == [{"index": 1, "role": "assistant", "stage3": {"model": "chair", "response": LONG}}]
+
+    # No paging parameters: the whole conversation
+    whole = client.get(f"/api/conversations/{conversation_id}").json()
+    assert whole["messages"][1]["stage1"][0]["response"] == LONG
+
+    assert client.get(f"/api/conversations/{conversation_id}", params={"fields": "bogus"}).status_code == 400
+    assert client.get("/api/conversations/missing", params={"limit": 1}).status_code == 404
@@ -0,0 +1,86 @@
+"""Conversation listing: newest first, cursor pages, and the X-Next-Cursor header."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import async_storage, main
+from backend.storage import JSONStorage, JSONLStorage
+from backend.storage_sqlite import SQLiteStorage
+
+# Two conversations share a timestamp so pages must break ties on id
+CREATED = {
+    "a": "2024-01-01T00:00:00",
+    "b": "2024-01-02T00:00:00",
+    "c": "2024-01-02T00:00:00",
+    "d": "2024-01-03T00:00:00",
+    "e": "2024-01-04T00:00:00",
+}
+
+
+@pytest.fixture(params=["json", "jsonl", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "json":
+        backend = JSONStorage(str(tmp_path))
+    elif request.param == "jsonl":
+        backend = JSONLStorage(str(tmp_path))
+    else:
+        backend = SQLiteStorage(str(tmp_path / "council.db"), migrate_from=None)
+    for conversation_id, created_at in CREATED.items():
+        backend.save_conversation({
+            "id": conversation_id,
+            "created_at": created_at,
+            "title": conversation_id.upper(),
+            "messages": [{"role": "user", "content": "hi"}],
+        })
+    return backend
+
+
+def test_listing_is_newest_first(storage):
+    conversations = storage.list_conversations()
+    assert [c["id"] for c in conversations] == ["e", "d", "c", "b", "a"]
+    assert conversations[0] == {"id": "e", "created_at": CREATED["e"], "title": "E", "message_count": 1}
+
+
+def test_cursor_pages_cover_everything_once(storage):
+    assert [c["id"] for c in storage.list_conversations(limit=2)] == ["e", "d"]
+    assert [c["id"] for c in storage.list_conversations(limit=2, before="d")] == ["c", "b"]
+    assert [c["id"] for c in storage.list_conversations(limit=2, before="b")] == ["a"]
+    assert storage.list_conversations(limit=2, before="a") == []
+
+
+def test_unknown_cursor_is_rejected(storage):
+    with pytest.raises(ValueError):
+        storage.list_conversations(limit=2, before="missing")
+
+
+def test_title_change_is_listed(storage):
+    storage.apply_writes("c", [("update_conversation_title", ("Renamed",))])
+    assert [c["title"] for c in storage.list_conversations(limit=1, before="d")] == ["Renamed"]
+
+
+def test_endpoint_pages_with_next_cursor_header():
+    for _ in range(5):
+        asyncio.run(main.create_conversation(main.CreateConversationRequest()))
+    client = TestClient(main.app)
+    everything = [c["id"] for c in client.get("/api/conversations").json()]
+    assert "X-Next-Cursor" not in client.get("/api/conversations").headers
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/api/conversations", params=params)
+        assert response.status_code == 200
+        page = [c["id"] for c in response.json()]
+        assert len(page) <= 2
+        seen += page
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        assert cursor == page[-1]
+        params = {"limit": 2, "before": cursor}
+    assert seen == everything
+
+    assert client.get("/api/conversations", params={"before": "missing"}).status_code == 400
+    asyncio.run(async_storage.flush())
@@ -0,0 +1,35 @@
+"""Connection pool stats survive changes to httpx internals."""
+
+import asyncio
+
+import httpx
+
+from backend import openrouter
+
+
+def test_pool_stats_without_pool_internals(monkeypatch):
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+        monkeypatch.setattr(openrouter, "_http_client", client)
+        try:
+            stats = openrouter.get_pool_stats()
+        finally:
+            await client.aclose()
+        assert stats["initialized"] is True
+        assert "connections" not in stats
+
+    asyncio.run(scenario())
+
+
+def test_pool_stats_with_real_pool(monkeypatch):
+    async def scenario():
+        client = httpx.AsyncClient()
+        monkeypatch.setattr(openrouter, "_http_client", client)
+        try:
+            stats = openrouter.get_pool_stats()
+        finally:
+            await client.aclose()
+        assert stats["connections"] == 0
+        assert stats["queued_requests"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,108 @@
+"""Token buckets and the AIMD concurrency limiter behind provider calls."""
+
+import asyncio
+
+from backend.ratelimit import AdaptiveConcurrencyLimiter, ProviderLimiter, TokenBucket
+
+
+def test_bucket_admits_a_burst_then_waits_for_refill():
+    async def scenario():
+        # 10 tokens a second, at most 2 at once
+        bucket = TokenBucket(600, capacity=2)
+        assert await bucket.acquire() == 0.0
+        assert await bucket.acquire() == 0.0
+        waited = await bucket.acquire()
+        assert 0.05 < waited < 0.5
+
+    asyncio.run(scenario())
+
+
+def test_bucket_clamps_oversized_requests_and_carries_debt():
+    async def scenario():
+        bucket = TokenBucket(600, capacity=2)
+        # Larger than the bucket: admitted once full rather than never
+        assert await bucket.acquire(50) == 0.0
+
+        # Actual usage above the estimate leaves the balance negative
+        bucket.adjust(1)
+        assert bucket.tokens < 0
+        waited = await bucket.acquire()
+        assert waited > 0.1
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limit_queues_extra_callers():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial=1, min_limit=1, max_limit=4)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        await limiter.release(0.1, rate_limited=False, failed=False)
+        await asyncio.wait_for(waiter, 1)
+        assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_limit_grows_additively_and_halves_on_429():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial=4, min_limit=1, max_limit=32)
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(0.1, rate_limited=False, failed=False)
+        # About one slot per round of successes
+        assert 4.9 < limiter.limit < 5.0
+
+        await limiter.acquire()
+        await limiter.release(0.1, rate_limited=True, failed=True)
+        assert 2.4 < limiter.limit < 2.5
+
+        for _ in range(5):
+            await limiter.acquire()
+            await limiter.release(0.1, rate_limited=True, failed=True)
+        assert limiter.limit == 1
+
+    asyncio.run(scenario())
+
+
+def test_slow_responses_shrink_the_limit():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial=8, min_limit=1, max_limit=32)
+        await limiter.acquire()
+        await limiter.release(0.1, rate_limited=False, failed=False)
+        before = limiter.limit
+
+        await limiter.acquire()
+        await limiter.release(1.0, rate_limited=False, failed=False)
+        assert limiter.limit == before * 0.5
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_calls_do_not_adapt_the_limit():
+    async def scenario():
+        limiter = ProviderLimiter("test-provider", "test-model")
+        limit = limiter.concurrency.limit
+
+        async def abandoned():
+            async with limiter.acquire():
+                await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(abandoned())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert limiter.concurrency.in_flight == 0
+        assert limiter.concurrency.limit == limit
+        assert limiter.stats["cancelled"] == 1
+
+        async with limiter.acquire() as permit:
+            permit.rate_limited = True
+        assert limiter.stats["rate_limited"] == 1
+
+    asyncio.run(scenario())
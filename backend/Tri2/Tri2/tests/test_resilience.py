@@ -0,0 +1,64 @@
+"""Provider error classification: what is retried and what counts against a model."""
+
+import asyncio
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from backend import openrouter
+from backend.council import collect_model_stream
+from backend.openrouter import _gemini_error
+from backend.resilience import CircuitBreaker, get_breaker
+
+
+@pytest.mark.parametrize("error, retryable, unhealthy", [
+    (asyncio.TimeoutError(), True, True),
+    (ConnectionResetError("reset"), True, True),
+    (google_exceptions.RetryError("deadline", None), True, True),
+    (google_exceptions.ResourceExhausted("quota"), True, True),
+    (google_exceptions.ServiceUnavailable("down"), True, True),
+    (google_exceptions.PermissionDenied("bad key"), False, True),
+    (google_exceptions.InvalidArgument("bad prompt"), False, False),
+    (ValueError("response blocked by safety filters"), False, False),
+    (AttributeError("SDK bug"), False, False),
+])
+def test_gemini_error_classification(error, retryable, unhealthy):
+    provider_error = _gemini_error(error)
+    assert provider_error.retryable is retryable
+    assert provider_error.model_unhealthy is unhealthy
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    async def stream_openrouter_model(model, messages, timeout, max_tokens):
+        yield {"type": "delta", "content": "Hel"}
+        yield {"type": "delta", "content": "lo"}
+        yield {"type": "done", "model": model, "content": "Hello", "finish_reason": "stop", "usage": None}
+
+    monkeypatch.setattr(openrouter, "stream_openrouter_model", stream_openrouter_model)
+    monkeypatch.setattr(openrouter, "is_cacheable", lambda model: False)
+
+
+async def _ignore(text):
+    pass
+
+
+def test_streamed_success_resets_failures(fake_stream):
+    breaker = get_breaker("test/streamed-closed")
+    breaker.consecutive_failures = 2
+
+    response = asyncio.run(
+        collect_model_stream("test/streamed-closed", [{"role": "user", "content": "hi"}], _ignore)
+    )
+    assert response["content"] == "Hello"
+    assert breaker.consecutive_failures == 0
+    assert breaker.stats["successes"] == 1
+
+
+def test_streamed_probe_closes_circuit(fake_stream):
+    breaker = get_breaker("test/streamed-probe")
+    breaker.state = CircuitBreaker.HALF_OPEN
+
+    asyncio.run(collect_model_stream("test/streamed-probe", [{"role": "user", "content": "hi"}], _ignore))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert not breaker.probe_in_flight
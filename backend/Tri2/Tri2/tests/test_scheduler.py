@@ -0,0 +1,138 @@
+"""Council scheduler: every path out of a run hands its worker back."""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend import main
+from backend.scheduler import CouncilScheduler, Overloaded
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = CouncilScheduler(workers=1, queue_size=4, batch_queue_size=1, max_wait=5)
+    monkeypatch.setattr(main, "scheduler", scheduler)
+    return scheduler
+
+
+async def _never_ends(question, emit):
+    await emit({"type": "stage1_start"})
+    await asyncio.Event().wait()
+
+
+def test_run_error_releases(scheduler):
+    async def failing():
+        raise RuntimeError("provider down")
+
+    async def scenario():
+        started = await scheduler.acquire()
+        with pytest.raises(RuntimeError):
+            await scheduler.run_in_slot(started, failing())
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("accept", [None, "text/event-stream"])
+def test_send_message_stream_missing_conversation_releases(scheduler, accept):
+    async def scenario():
+        request = main.SendMessageRequest(content="hi")
+        with pytest.raises(HTTPException) as error:
+            await main.send_message_stream("missing", request, accept=accept)
+        assert error.value.status_code == 404
+        assert scheduler.running == 0
+        assert scheduler.avg_run_seconds == pytest.approx(20.0)
+
+    asyncio.run(scenario())
+
+
+def test_send_message_stream_setup_failure_releases(scheduler, monkeypatch):
+    async def broken_start(job_id):
+        raise RuntimeError("event bus unavailable")
+
+    async def added(conversation_id, content):
+        return True
+
+    monkeypatch.setattr(main, "_add_user_message", added)
+    monkeypatch.setattr(main.event_bus, "start", broken_start)
+
+    async def scenario():
+        request = main.SendMessageRequest(content="hi")
+        with pytest.raises(RuntimeError):
+            await main.send_message_stream("conv", request, accept="text/event-stream")
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_queue(scheduler):
+    async def scenario():
+        started = await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0.01)
+        assert scheduler.queued[0] == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.queued[0] == 0
+
+        # The worker goes back to the pool, not to the abandoned waiter
+        scheduler.release(started)
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_run_releases(scheduler):
+    async def scenario():
+        started = await scheduler.acquire()
+        task = asyncio.create_task(scheduler.run_in_slot(started, asyncio.Event().wait()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_refused(scheduler):
+    async def scenario():
+        started = await scheduler.acquire()
+        waiters = [asyncio.create_task(scheduler.acquire()) for _ in range(scheduler.queue_size)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as error:
+            await scheduler.acquire()
+        assert error.value.status_code == 503
+        assert error.value.retry_after >= 1
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        scheduler.release(started)
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_ask_stream_disconnect_releases(scheduler, monkeypatch):
+    monkeypatch.setattr(main, "_run_council_stages", _never_ends)
+
+    async def scenario():
+        response = await main.ask_question_stream(main.AskRequest(question="hi"))
+        body = response.body_iterator
+        first = await asyncio.wait_for(body.__anext__(), 5)
+        assert "stage1_start" in first
+        assert scheduler.running == 1
+
+        # The client goes away mid-run
+        await body.aclose()
+        for _ in range(100):
+            if scheduler.running == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,123 @@
+"""Full-text search: query building, ranking, paging, indexing on write and rebuilds."""
+
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import async_storage, blobstore, main, storage
+from backend.blobstore import BlobStore
+from backend.search import SearchIndex, SearchIndexedStorage, build_match_query
+from backend.storage import BlobStorage, JSONStorage
+
+
+def _answer(text: str) -> tuple:
+    return [], [], {"model": "chair", "response": text}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SearchIndex(str(tmp_path / "search.db"))
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / "blobs"), "gzip")
+    monkeypatch.setattr(blobstore, "blob_store", store)
+    monkeypatch.setattr(storage, "blob_store", store)
+    return BlobStorage(JSONStorage(str(tmp_path / "conversations")), min_bytes=64)
+
+
+@pytest.mark.parametrize("query, match", [
+    ("capital of France", '"capital" "of" "France"*'),
+    ('NEAR(" OR title:x', '"NEAR" "OR" "title" "x"*'),
+    ("  ?! ", None),
+])
+def test_user_input_is_quoted(query, match):
+    assert build_match_query(query) == match
+
+
+def test_hits_are_ranked_stemmed_and_highlighted(index):
+    index.add("c1", [("question", "How do I run a marathon?"), ("answer", "Train slowly.")])
+    index.add("c2", [("answer", "Running a marathon: marathon pacing, marathon nutrition.")])
+    index.add("c3", [("question", "Best pasta recipe")])
+    # Unrelated rows, so matching terms are rare enough to score
+    for i in range(10):
+        index.add(f"other{i}", [("question", f"weather forecast {i}")])
+
+    hits, has_more = index.search("marathon")
+    assert [hit["conversation_id"] for hit in hits] == ["c2", "c1"]
+    assert not has_more
+    assert "<mark>marathon</mark>" in hits[0]["snippet"]
+    assert hits[0]["score"] > hits[1]["score"] > 0
+
+    # Porter stemming and prefix matching on the last word
+    assert {hit["conversation_id"] for hit in index.search("runs")[0]} == {"c1", "c2"}
+    assert [hit["conversation_id"] for hit in index.search("pasta reci")[0]] == ["c3"]
+    assert index.search("marathon pasta") == ([], False)
+    assert index.search('"') == ([], False)
+
+
+def test_pages_report_whether_more_hits_exist(index):
+    for i in range(5):
+        index.add(f"c{i}", [("question", f"question {i} about search")])
+    first, more = index.search("search", 0, 2)
+    second, _ = index.search("search", 2, 2)
+    last, no_more = index.search("search", 4, 2)
+    assert more and not no_more
+    ids = [hit["conversation_id"] for hit in first + second + last]
+    assert sorted(ids) == [f"c{i}" for i in range(5)]
+
+
+def test_writes_are_indexed_with_full_answer_texts(index, backend):
+    indexed = SearchIndexedStorage(backend, index)
+    indexed.create_conversation("c1")
+    indexed.add_user_message("c1", "Why is the sky blue?")
+    indexed.add_assistant_message("c1", *_answer("Rayleigh scattering " + "of sunlight " * 20))
+    indexed.update_conversation_title("c1", "Sky")
+
+    # The stored answer is a blob reference, the index has its text
+    stored = backend.get_conversation("c1")["messages"][1]["stage3"]["response"]
+    assert isinstance(stored, dict)
+    assert [(hit["conversation_id"], hit["kind"]) for hit in index.search("rayleigh")[0]] == [("c1", "answer")]
+    assert [hit["kind"] for hit in index.search("sky")[0]] == ["question"]
+
+    # Saving the whole conversation replaces its entries
+    conversation = indexed.get_conversation("c1")
+    conversation["messages"] = conversation["messages"][:1]
+    indexed.save_conversation(conversation)
+    assert index.search("rayleigh") == ([], False)
+    assert len(index.search("sky")[0]) == 1
+
+
+def test_rebuild_indexes_existing_conversations(index, backend):
+    backend.create_conversation("c1")
+    backend.add_user_message("c1", "Tell me about volcanoes")
+    backend.add_assistant_message("c1", *_answer("Volcanoes erupt magma. " * 10))
+    backend.create_conversation("c2")
+    index.add("stale", [("question", "volcanoes from a deleted conversation")])
+
+    assert index.rebuild(backend) == 2
+    hits, _ = index.search("volcanoes")
+    assert sorted((hit["conversation_id"], hit["kind"]) for hit in hits) == [("c1", "answer"), ("c1", "question")]
+
+
+def test_endpoint_returns_titled_hits():
+    conversation_id = str(uuid.uuid4())
+    word = "zx" + uuid.uuid4().hex[:8]
+
+    async def fill():
+        await async_storage.create_conversation(conversation_id)
+        await async_storage.add_user_message(conversation_id, f"What does {word} mean?")
+        await async_storage.update_conversation_title(conversation_id, "Glossary")
+
+    asyncio.run(fill())
+    client = TestClient(main.app)
+
+    response = client.get("/api/search", params={"q": word})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["has_more"] is False
+    assert [(hit["conversation_id"], hit["title"]) for hit in body["results"]] == [(conversation_id, "Glossary")]
+    assert client.get("/api/search", params={"q": ""}).status_code == 422
@@ -0,0 +1,92 @@
+"""Semantic cache: near-duplicates hit, questions that only look alike miss."""
+
+import asyncio
+
+import pytest
+
+from backend import semantic_cache as semantic_cache_module
+from backend.semantic_cache import SemanticCache
+
+QUESTIONS = [
+    "What is the capital of France?",
+    "How do I reverse a list in Python?",
+    "Is Python faster than Java?",
+    "Should I use recursion for tree traversal?",
+    "What are the health benefits of green tea?",
+    "How does garbage collection work in Java?",
+]
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache(capacity=64, dim=1024, threshold=0.9)
+    for question in QUESTIONS:
+        cache.store(question, {"answer": question})
+    return cache
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("  what is the CAPITAL of france?? ", "What is the capital of France?"),
+    ("what's the capital of France", "What is the capital of France?"),
+    ("How does garbage collection work in Java", "How does garbage collection work in Java?"),
+])
+def test_near_duplicates_hit(cache, question, expected):
+    match = cache.lookup(question)
+    assert match is not None
+    entry, similarity = match
+    assert entry["question"] == expected
+    assert entry["result"] == {"answer": expected}
+    assert similarity >= cache.threshold
+
+
+@pytest.mark.parametrize("question", [
+    "What is the capital of Germany?",
+    "How do I reverse a string in Python?",
+    "Is Java faster than Python?",
+    "Should I not use recursion for tree traversal?",
+    "What are the health risks of green tea?",
+    "How does garbage collection work in Go?",
+    "What is the?",
+    "Explain the capital of France",
+    "Describe the health benefits of green tea",
+])
+def test_adversarial_pairs_miss(cache, question):
+    assert cache.lookup(question) is None
+
+
+def test_hits_are_copies(cache):
+    entry, _ = cache.lookup("What is the capital of France?")
+    entry["result"]["answer"] = "changed"
+    assert cache.lookup("What is the capital of France?")[0]["result"] == {"answer": QUESTIONS[0]}
+
+
+def test_snapshot_is_written_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(semantic_cache_module, "SEMANTIC_CACHE_SNAPSHOT_EVERY", 2)
+    cache = SemanticCache(capacity=8, dim=256, threshold=0.9, path=str(tmp_path))
+
+    async def scenario():
+        cache.store(QUESTIONS[0], {"answer": 1})
+        cache.store(QUESTIONS[1], {"answer": 2})
+        assert cache.saving is not None
+        await cache.flush()
+
+    asyncio.run(scenario())
+
+    restored = SemanticCache(capacity=8, dim=256, threshold=0.9, path=str(tmp_path))
+    restored.load()
+    assert restored.lookup(QUESTIONS[1])[0]["result"] == {"answer": 2}
+
+
+def test_snapshot_from_another_council_is_ignored(tmp_path):
+    old = SemanticCache(capacity=8, dim=256, threshold=0.9, path=str(tmp_path), fingerprint="old-council")
+    old.store(QUESTIONS[0], {"answer": "from the old council"})
+    old.save()
+
+    restored = SemanticCache(capacity=8, dim=256, threshold=0.9, path=str(tmp_path), fingerprint="new-council")
+    restored.load()
+    assert restored.size == 0
+    assert restored.lookup(QUESTIONS[0]) is None
+
+    same = SemanticCache(capacity=8, dim=256, threshold=0.9, path=str(tmp_path), fingerprint="old-council")
+    same.load()
+    assert same.lookup(QUESTIONS[0])[0]["result"] == {"answer": "from the old council"}
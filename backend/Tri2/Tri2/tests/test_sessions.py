@@ -0,0 +1,84 @@
+"""WebSocket sessions: a stalled client never pins a council worker."""
+
+import asyncio
+
+from fastapi import WebSocketDisconnect
+
+from backend import main, sessions
+from backend.scheduler import CouncilScheduler
+
+
+class StalledWebSocket:
+    """A client that sends scripted messages but never reads what it is sent."""
+
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def receive_json(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_json(self, event):
+        await asyncio.Event().wait()
+
+
+async def _wait_until(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_offer_drops_when_full():
+    async def scenario():
+        session = sessions.Session(StalledWebSocket(), queue_size=1)
+        assert session.offer({"type": "stage1_complete"})
+        assert not session.offer({"type": "cancelled"})
+
+        # Once closing, send() drops instead of waiting for room
+        session.close()
+        await asyncio.wait_for(session.send({"type": "error"}), 1)
+        assert session.outbox.qsize() == 1
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_with_full_outbox_releases_worker(monkeypatch):
+    scheduler = CouncilScheduler(workers=1, queue_size=4, batch_queue_size=1, max_wait=5)
+    monkeypatch.setattr(main, "scheduler", scheduler)
+
+    async def flood(question, emit):
+        # More events than the outbox holds, then a run that never ends
+        for _ in range(sessions.WS_SEND_QUEUE_SIZE + 10):
+            await emit({"type": "stage1_complete", "data": []})
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(main, "_run_council_stages", flood)
+
+    async def scenario():
+        websocket = StalledWebSocket()
+        connection = asyncio.create_task(main.council_session(websocket))
+        await websocket.incoming.put({"type": "ask", "question": "hi", "id": "r1"})
+
+        # The run holds the only worker and is stuck on the full outbox
+        await _wait_until(lambda: scheduler.running == 1)
+        await asyncio.sleep(0.1)
+        assert scheduler.running == 1
+
+        await websocket.incoming.put(None)
+        await asyncio.wait_for(connection, 5)
+        await _wait_until(lambda: scheduler.running == 0)
+
+        # The worker is free for the next run
+        started = await asyncio.wait_for(scheduler.acquire(), 1)
+        scheduler.release(started)
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+"""Single-flight: callers share one call, its result and its failure."""
+
+import asyncio
+
+import pytest
+
+from backend.singleflight import SingleFlight
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def succeeding():
+        calls.append(1)
+        return {"answer": 42}
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+        assert len(calls) == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.snapshot() == {"in_flight": 0, "calls": 1, "coalesced": 2}
+        assert not flight.waiters
+
+        # The failure is not remembered: the next call runs again
+        assert await flight.do("key", succeeding) == {"answer": 42}
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_results_are_copies():
+    flight = SingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return {"items": [1]}
+
+    async def scenario():
+        first, second = await asyncio.gather(flight.do("key", compute), flight.do("key", compute))
+        first["items"].append(2)
+        assert second == {"items": [1]}
+
+    asyncio.run(scenario())
+
+
+def test_one_cancelled_waiter_leaves_the_call_running():
+    flight = SingleFlight("test")
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+            return "done"
+
+        cancelled = asyncio.create_task(flight.do("key", slow))
+        kept = asyncio.create_task(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        gate.set()
+        assert await kept == "done"
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+"""JSONL storage: concurrent writers never lose a message or a count."""
+
+import threading
+
+from backend.storage import JSONLStorage
+
+MESSAGES = 200
+TITLES = 200
+
+
+def _run_concurrently(*targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_appends_titles_and_compaction(tmp_path):
+    backend = JSONLStorage(str(tmp_path))
+    backend.create_conversation("conv")
+    stop = threading.Event()
+
+    def read_continuously():
+        while not stop.is_set():
+            assert backend.get_conversation("conv") is not None
+
+    def add_messages():
+        for index in range(MESSAGES):
+            backend.add_user_message("conv", f"message {index}")
+
+    def update_titles():
+        for index in range(TITLES):
+            backend.update_conversation_title("conv", f"title {index}")
+        stop.set()
+
+    _run_concurrently(read_continuously, add_messages, update_titles)
+
+    conversation = backend.get_conversation("conv")
+    assert [message["content"] for message in conversation["messages"]] == [f"message {i}" for i in range(MESSAGES)]
+    assert conversation["title"] == f"title {TITLES - 1}"
+    assert conversation["version"] == MESSAGES + TITLES
+
+    # The index agrees with the log, also once reopened
+    for reader in (backend, JSONLStorage(str(tmp_path))):
+        metadata = reader.get_metadata("conv")
+        assert metadata["message_count"] == MESSAGES
+        assert metadata["title"] == f"title {TITLES - 1}"
+
+    # Superseded title records were compacted away
+    lines = (tmp_path / "conv.jsonl").read_text().splitlines()
+    assert len(lines) < 1 + MESSAGES + TITLES
+
+
+def test_renaming_a_normal_conversation_compacts(tmp_path):
+    backend = JSONLStorage(str(tmp_path))
+    backend.create_conversation("conv")
+    for index in range(6):
+        backend.add_user_message("conv", f"message {index}")
+    for index in range(JSONLStorage.COMPACT_MIN_SUPERSEDED):
+        backend.update_conversation_title("conv", f"title {index}")
+
+    lines = (tmp_path / "conv.jsonl").read_text().splitlines()
+    assert len(lines) == 1 + 6
+    conversation = backend.get_conversation("conv")
+    assert conversation["title"] == f"title {JSONLStorage.COMPACT_MIN_SUPERSEDED - 1}"
+    assert conversation["version"] == 6 + JSONLStorage.COMPACT_MIN_SUPERSEDED
+
+
+def test_backend_is_built_once_under_concurrent_first_use(monkeypatch):
+    from backend import storage
+
+    monkeypatch.setattr(storage, "_backend", None)
+    backends = []
+    start = threading.Barrier(8)
+
+    def first_use():
+        start.wait()
+        backends.append(storage.get_backend())
+
+    _run_concurrently(*[first_use] * 8)
+    assert len({id(backend) for backend in backends}) == 1
@@ -0,0 +1,68 @@
+"""SQLite storage: the one-shot JSON migration and compare-and-swap writes."""
+
+import json
+
+import pytest
+
+from backend.storage import ConflictError
+from backend.storage_sqlite import SQLiteStorage
+
+
+def _conversation(conversation_id: str) -> dict:
+    return {
+        "id": conversation_id,
+        "created_at": "2024-01-01T00:00:00",
+        "title": f"Title {conversation_id}",
+        "messages": [
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "stage1": [], "stage2": [], "stage3": {"response": "hello"}},
+        ],
+    }
+
+
+def test_migration_skips_malformed_files(tmp_path):
+    json_dir = tmp_path / "conversations"
+    json_dir.mkdir()
+    (json_dir / "good.json").write_text(json.dumps(_conversation("good")))
+    (json_dir / "no-id.json").write_text(json.dumps({"title": "orphan", "messages": []}))
+    (json_dir / "broken.json").write_text("{not json")
+    (json_dir / "list.json").write_text("[]")
+
+    storage = SQLiteStorage(str(tmp_path / "council.db"), migrate_from=str(json_dir))
+
+    assert [c["id"] for c in storage.list_conversations()] == ["good"]
+    conversation = storage.get_conversation("good")
+    assert conversation["title"] == "Title good"
+    assert conversation["messages"][0] == {"role": "user", "content": "hi"}
+    assert conversation["messages"][1]["stage3"] == {"response": "hello"}
+
+
+def test_migration_runs_once(tmp_path):
+    json_dir = tmp_path / "conversations"
+    json_dir.mkdir()
+    (json_dir / "good.json").write_text(json.dumps(_conversation("good")))
+    storage = SQLiteStorage(str(tmp_path / "council.db"), migrate_from=str(json_dir))
+    storage.update_conversation_title("good", "Renamed")
+
+    assert storage.migrate_from_json(str(json_dir)) == 0
+    assert storage.get_conversation("good")["title"] == "Renamed"
+
+
+def test_stale_version_is_refused(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "council.db"), migrate_from=None)
+    storage.create_conversation("c1")
+    version = storage.get_conversation("c1")["version"]
+
+    storage.apply_writes("c1", [("add_user_message", ("first",))], expected_version=version)
+    with pytest.raises(ConflictError):
+        storage.apply_writes("c1", [("add_user_message", ("second",))], expected_version=version)
+
+    conversation = storage.get_conversation("c1")
+    assert conversation["version"] == version + 1
+    assert [m["content"] for m in conversation["messages"]] == ["first"]
+
+
+def test_title_update_on_missing_conversation(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "council.db"), migrate_from=None)
+    with pytest.raises(ValueError):
+        storage.update_conversation_title("missing", "Title")
@@ -0,0 +1,131 @@
+"""Token streaming: SSE parsing, retries before the first delta and cached replays."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from backend import openrouter, resilience
+from backend.cache import ResponseCache, cache_key
+from backend.resilience import ProviderError, get_breaker
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _sse(*events) -> bytes:
+    lines = [": OPENROUTER PROCESSING", ""]
+    for event in events:
+        lines += [f"data: {json.dumps(event)}", ""]
+    lines += ["data: [DONE]", ""]
+    return "\n".join(lines).encode()
+
+
+def _delta(text: str, finish_reason=None) -> dict:
+    return {"choices": [{"delta": {"content": text}, "finish_reason": finish_reason}]}
+
+
+HELLO = _sse(
+    _delta("Hel"),
+    _delta("lo", finish_reason="stop"),
+    {"choices": [], "usage": {"total_tokens": 7}},
+)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Serve queued (status, body) responses to OpenRouter calls, in order."""
+    responses = []
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        status, body = responses.pop(0)
+        return httpx.Response(status, content=body, headers={"content-type": "text/event-stream"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def get_http_client():
+        return client
+
+    monkeypatch.setattr(openrouter, "get_http_client", get_http_client)
+    monkeypatch.setattr(openrouter, "response_cache", ResponseCache(max_entries=10, ttl=60))
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(resilience, "RETRY_MAX_DELAY", 0.01)
+    return responses, requests
+
+
+async def _collect(model: str):
+    return [record async for record in openrouter.query_model_stream(model, MESSAGES)]
+
+
+def test_deltas_then_one_done_record(provider):
+    responses, requests = provider
+    responses.append((200, HELLO))
+
+    records = asyncio.run(_collect("test/stream-ok"))
+    assert records == [
+        {"type": "delta", "content": "Hel"},
+        {"type": "delta", "content": "lo"},
+        {
+            "type": "done",
+            "model": "test/stream-ok",
+            "content": "Hello",
+            "finish_reason": "stop",
+            "usage": {"total_tokens": 7},
+        },
+    ]
+    assert requests[0]["stream"] is True
+
+
+def test_failure_before_first_delta_is_retried(provider):
+    responses, requests = provider
+    responses += [(503, b'{"error": {"message": "overloaded"}}'), (200, HELLO)]
+
+    records = asyncio.run(_collect("test/stream-retry"))
+    assert len(requests) == 2
+    assert records[-1]["type"] == "done" and records[-1]["content"] == "Hello"
+
+
+def test_failure_after_a_delta_ends_the_stream(provider):
+    responses, requests = provider
+    responses.append((200, _sse(_delta("Hel"), {"error": {"message": "upstream reset", "code": 502}})))
+    breaker = get_breaker("test/stream-broken")
+
+    records = asyncio.run(_collect("test/stream-broken"))
+    assert len(requests) == 1
+    assert records == [
+        {"type": "delta", "content": "Hel"},
+        {"type": "error", "model": "test/stream-broken", "error": "upstream reset"},
+    ]
+    assert breaker.consecutive_failures == 1
+
+
+def test_single_attempt_raises_provider_errors(provider):
+    responses, _ = provider
+    responses.append((200, b"data: {not json\n\n"))
+
+    async def scenario():
+        with pytest.raises(ProviderError):
+            async for _ in openrouter.stream_openrouter_model("test/stream-malformed", MESSAGES):
+                pass
+
+    asyncio.run(scenario())
+
+
+def test_completed_streams_are_replayed_from_cache(provider, monkeypatch):
+    responses, requests = provider
+    monkeypatch.setattr(openrouter, "is_cacheable", lambda model: True)
+    responses.append((200, HELLO))
+
+    asyncio.run(_collect("test/stream-cached"))
+    replayed = asyncio.run(_collect("test/stream-cached"))
+    assert len(requests) == 1
+    assert replayed == [
+        {"type": "delta", "content": "Hello"},
+        {"type": "done", "model": "test/stream-cached", "content": "Hello", "finish_reason": "cached", "usage": None},
+    ]
+    # Shared with query_model
+    assert openrouter.response_cache.get(cache_key("test/stream-cached", MESSAGES, {"max_tokens": None})) == {
+        "content": "Hello"
+    }